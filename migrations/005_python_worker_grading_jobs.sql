@@ -0,0 +1,19 @@
+-- Python Worker 비동기 채점 작업 (POST /grade async=true, GET /grade/jobs/<jobId>)
+-- 작업 상태는 homework_submissions, 페이지별 결과는 homework_gradings에 저장
+
+-- homework_submissions: 작업 상태와 전체 채점 요약
+ALTER TABLE homework_submissions ADD COLUMN status TEXT;  -- queued, processing, graded, failed
+ALTER TABLE homework_submissions ADD COLUMN gradingResult TEXT;  -- JSON 형태로 저장 (전체 요약)
+
+-- homework_gradings: 페이지 번호와 페이지 결과
+ALTER TABLE homework_gradings ADD COLUMN pageIndex INTEGER;
+ALTER TABLE homework_gradings ADD COLUMN result TEXT;  -- JSON 형태로 저장 (페이지 결과)
+
+-- 작업 조회는 학생 범위로만 (id + userId)
+CREATE INDEX IF NOT EXISTS idx_homework_gradings_submission_page ON homework_gradings(submissionId, pageIndex);
+
+-- 002_attendance_homework_system.sql로 만든 DB에는 아래 컬럼도 필요 (004로 만든 DB에는 이미 있음)
+-- ALTER TABLE homework_submissions ADD COLUMN userName TEXT;
+-- ALTER TABLE homework_submissions ADD COLUMN pageCount INTEGER DEFAULT 1;
+-- ALTER TABLE homework_submissions ADD COLUMN score INTEGER DEFAULT 0;
+-- ALTER TABLE homework_submissions ADD COLUMN gradedAt TEXT;
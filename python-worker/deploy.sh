@@ -44,7 +44,9 @@ METADATA_EOF
 DEPLOY_RESPONSE=$(curl -s -X PUT "https://api.cloudflare.com/client/v4/accounts/$ACCOUNT_ID/workers/scripts/$WORKER_NAME" \
   -H "Authorization: Bearer $API_TOKEN" \
   -F "metadata=@metadata.json;type=application/json" \
-  -F "worker.py=@worker.py;type=application/python")
+  -F "worker.py=@worker.py;type=application/python" \
+  -F "subject_model_data.py=@subject_model_data.py;type=application/python" \
+  -F "requirements.txt=@requirements.txt;type=text/x-python-requirement")
 
 echo "Deploy Response: $DEPLOY_RESPONSE"
 
@@ -0,0 +1,104 @@
+r"""
+과목 분류 모델 데이터 (train_subject_model.py가 생성, 직접 고치지 마세요)
+zlib + base64: 헤더 JSON \0 n-gram 목록(\x1f 구분) \0 int8 가중치 (n-gram × 과목)
+"""
+SUBJECT_MODEL_DATA = (
+    'eNrtWQl01NW5t7Wv1WpBsT5RgXsJW0KSyT/7AmFYE0jC6oJ7nSRDZprJTN7MxJjTt6BGD0/oKbQiAQNiBUGLGtn3JARQCIQly2Qm'
+    'C5ugZCay2NceT0/t+33fvSHCUctre9q+1nPm/7v//12++93v3m+785Owp6xuj93lDEuTcVEyLM9h8XisHnw9GmZ1FjjsHlsYqgtd'
+    'bqvFSW9FFi/XuLw2q5tePHl2qzPPGvY43p0FbksRjQWp+Me599MTbBY30UswDO5tcVjxZZiM+DgjNiUxJS41JSE1MSk+Fa25dgtP'
+    'HR1rSkyOj4tPSEmKT042YuNT0YrKpNiUpNTkuPjklISklNTkWFWZEBcXl5wcnxiXmGykxsZzZWIqPpKTY1OT4uJiU1Piv3Q4cei1'
+    'FhVb3RZviZvYiiUWbW67s9BSQN9xzLOlqNjBMkmIT6Ahbovdac0f50VNWJwRlxQda0THpoT9xw3SLkWZFMCnrMLjBUohc13C4hEm'
+    'efqFnwtZKixeYch0YXULaXei2i5k6LUq0b14qRReKSKlIWQkfvQqZNeGnWgRVxVSgGRX1VwpXC5RahWuQrwUYiJhGKgD4eD8TWmC'
+    'QDIK42kh8bjLhAPTdW2dixpwaqJHlFrAH6Yi/vCoNylC5ZV4RaOcI7wuxYqwOzEB3q1gwQV2DZGOx+oU0gYqZejvEiVOAeJ4ITJ2'
+    'YSkuFqElC0FOSAf6gQZWvHwjqHQvXilCGxZKLB5z2aRw42fXvaUAn6Hl5ZIZxgtWvxK9dcEMqW/VKr0uTG8VhR5hgfQtTwkbHi8k'
+    'Xoi9wDLtQCmMIrAM6dPa7CLfA6HgE1/p+NGbF+JbsxCbI3LdwlIk8rGsfEjBIjxWNNuF2yWCPysHk7qglaGQWCkWVrVbRNMWutEd'
+    'GwpxQ+QebCzEEJy/ysSAbVm3NbRiNaZSpRcb4PUIK35WIQvAunB6BbbPI/OJn3mYuVhYy4TFCY7zsWce2uVVmMcqHNTNIFo7BXpJ'
+    'OikyNK+CSl14sCx0Dy1foAvJw+m7QAqHS4AJWlE+BOWF8MCvGgmBxRgCv9DL2DGHBfvqFl3raXyIpgd0L6kQVxXYTwJwKovKRLDq'
+    'pa7dW0PzK0URJK1eQxWrxJUmXQetKRVem6ANgEKEnl0ndCGDGzZir4Uu7A7RtWld9+IKXdDYPEitGKcLNQzUKjX54GuV9CpiPPgZ'
+    'Aj8jRtgxU6ndK+iAEVEHNhZ7EFq8ILhmhcATWj5Xf9Gb1A0WrDvfLWxW7A3oGBE46pHgmsTxwk+Fx8a6h3ZSvFWgt3yu7Fr/nJAl'
+    'sAtzoDRuYcXWeV0eHPcC4bDSPnuEp8yJR3jsHmH3mDFFCbSkQLhwpJ3YH7RaPXZhdVjR24ZPL3h1CxeGkObQvttwdGwuLzTZKopi'
+    '8IPwQ8uqhEspm3CVQLDgDkuGnEpxyuxPQWHJXEULN2jRg8MD0yeKbS48ogSqKFEW4PDjKQDf+SVunJdiYYQ2zqO9r+yqKhe6oDos'
+    'mMAAB6oWG04ADkPrN/IJpVIJlWS2BpbIZIg8EiDJFurQvfQl0VO89TzUAsKW2LEYsm2lUhTAvuGxOiAaaEshFgK9RAHT4sThiYId'
+    'hNzsOMImXnroBT6tz1bhRVxVgN1XFnb/7L9hS4Uqemr0Jyx1JA69U7gxHaRvheTtMCd2TOcFedpr+TRLOvgGzqsqUL0WZNik41Xo'
+    'T1UQcRdslNWZD1MFLYEJsrKSb4YN61pfJWyGS+BnM6DsmAN7bRdOK47SVuJIEvtuGFsn6cnyCsko8mGVcXI8ZqzgF1WkEqogTStx'
+    '4CSJcMxlEpIL8jTknSDGp2ALYbdh4ayQIxlWDBRkn8lNSDr0Jtg+h4Mm0pR5mXBzDocw8kRRaPlO7HleEb+JPI2QHTNWIqAw3EUG'
+    'F8P8LCax45M+JH/JUPlWqA4cWR7eK57BISZ2I7BMN9tYMrDllV0biR/1qQqqySVZ0ApoJXAw+VgYTlSRBSJBAyt4aPkuYcWipYcV'
+    'WTgxD1qDz7NzgXoaBsxnKSyCjTVW1C2BdgNEIaRaCktWCpWBRSdnCwVzwIc77LnCDg8hi9h2kp9SJR81QaLBQVRmlRcAm8sS1boD'
+    'lgjI9ugCa1sqgqt3shGj7tACLHQpjYaVL7aIPHg4PLlWPUSyacTScJoKYDmg33DFrkIKAvLBJQwNJGKBj7e5SrF6jHuW9i0Pq4Bb'
+    'twv8qAH+jhhXBbT1xZfYBerq0HPPsEuBFyJ/IXXJgoW3C1Xu1OdMvTHrVMrQknUwmAh1IG9Iy4JFmGW4sNmJxgK27uUrlbFHGdz8'
+    'DAhgo1dB7elMcInFB59dC9Ll3YsqIRxdgc5CFTwGaoAe8AcL6cjxOzjWn2T/QU30DGOJElGSIPtIJi70BKqQmpjUfIGIsHp5e0jk'
+    'Jjauko4IgNXFEAUOmGkvzBJsBSx5AcVaRrTIpzALKiSxb1B01xxszxwhy8hRvS2KcFKLirRvI3O5kOStSwEBhxbT0eJS8Lv8wgfp'
+    'Kq8PpxrU2Emrkh1299JKnoW+8Y6lY7hBJ3YeBw89ZS6CHTALu6/EBreBg+8iyYS2Veg9IZ9KcVmw6k0Bww0VFGgkkcmeT+5ONao7'
+    'nQKWGB1sRQCDaXekPtfqk6Qve1p65mSSFJNISCvPBn9pIT8iYeBJvWEZyAZJzTAOG6zWkirSPVVINkDl3MK1VCW7qpYiqCuCaSkS'
+    'TtjwAjYf1LcAgSsMLcSAADaCwnKSnpIav3NJ9nwOm6xVIh/7SUKCTLBdOFjPq5hZ7x1Xdm2tgjrpwgzfa4H62dh1rCIpPM9xMUo9'
+    'XIRWLibt6n5lXvBdyPHdnVdV4AO8vDJPfOGd+imxYxl03Mj3suAo6pGYMVqSOBGTQ/Vs0H6DHRcJhI6/tYyC0zLEnMUCxRzEKA5Y'
+    'j3yJV3hUWMZo/LCuCHpE6MVN5LZVgRkNkyiDpYVntpRCrKVkPsxsRMzszyht0IX05LE10dEv8YiH5KMKtZ2gLK4qaDo+dZhDqyKO'
+    'J0xZ9zJ4DwJaBn+oSjLBXFIAEc5OQ1goSobk87HhighCCTKkc80MkkNmAFTFSsG+BTEVQjIElRADKVNoHkxFxTOsY6pkb8W6tYgj'
+    'WFWQKXwaMoMAi5DVULZAale3hUFQicVD5ph98U5KfjaipKVzqQpiB3QKTfjBYyOYkTAU8FVsoVWJU5SPJa4NLqJsSL3obzgDUSI5'
+    'SUQYgeiCgigK8+ctDa2sZDmD+6fpZdFWBuLfYGFV7mCDSiWJBDkR3F0p3KoFBz8fDmUOxGP3mvCNKExq00VnVxUq/CcrqaspDqJk'
+    'oes9FTdQSEiBGeSC8FUHh2Sp2Y4jjFYNEokahrCeQ27UEly5muRHvCpiQlcaRWyHdGUR68KVKtFDfjEFqPwutSQE76rUH6BEglxA'
+    'UdbrOzk0YAsyx60SgDegkG/spHxNFSpfUDW6HUrJbMFirtsq+QA/t1yKcFWh69Uxf2654D4qyyFNIocXzq6qijmsoKRUVaAj3RIY'
+    'HBJjhgh+5Tf0pCkI6ARr0oqRCCbFTg5TUHQ5RxYiIDShRDJZDCtX6EKU48XGFoliyg6kS+TBEhThcaGfpZgOAE6rXaAnZ44wHmzK'
+    'sW8cByzgXJi/+I2bOQIoRLyCsMVC8Rp5nq4q8kdbEO0h1MPOdFcsFnaE03SBAANBe+W2UxyYh4wOaRZ4Qhdy8XZkHaoHjclDvldm'
+    '1W1kD1S9igXK+aZiDrIXkHEge9eUo9kOlEIzETdGYUUI6N0c/iAwJ2XGitFn2wJuR1LkEqqFz87L6tgUI3vq6U9dVRQapduFC2mY'
+    'G0mdCaGmNnLsgjSQVq9ahGQaIBnJSWHTnqadhkEwJElduLEhLoTtVqRtVpfw4LHKPNgS7A0MChERBkyWYeZ8kz3zkoXKqvMmSJVr'
+    'YXsoqqAE0ZKL4IuCwlzEjwgKEYyQxeXD9WIF2A8+y8e2+7nFZA/Ztocq1kJknHWgj27lCEsNQUi1ju80lH3n8OzlRXy3YxQWCEWU'
+    'HJ1uDC6sYCtP9oHOom6VelrIVR8c1V9qCkIxITVxHWCu0v3BzAs/5/CVqbPNC9JVm1HIcRlxTq+8FqEXAO56RumVqHWqlWuroq4A'
+    '5vXYKrzqQqW5HNWoXlI3q3FSV5s59VYrRInu+pP6pHNkZOgqk1A9yB7qvqU4/K4SOjHQZhcOhavUKfDz4shCPpLdvzY3MAU40IQU'
+    '5XKwDqMJ1Qdn6lsqkwIbYejdokCKomC7F6Fp94KXOCRf+QzSTIofYASVRd7KaQgOctf6Xbpd6k9JsTKqhBpNdpOGqa4qhQ+tWCc0'
+    'KT3FVZXgmceRAXUjbdGvhXTHtGFlcOUqzYqeiHjjBAnZkgvZBLEtmBHVmy+luD99cPSp2Cp1Su5ncAO0jAZakDM5OQTYqE4Xl8JL'
+    '2TEyqny6d6xCpIHkF1UwhWVQ6lxoZEkBEieHsMFYwkYUoHQWglqhyEWsVYIkuxB+lC4/S9EVgSuctwtj8GpFB1nsRlbkhkXLReAN'
+    'TUSQ4LDSzWM0wk4vDBdeDTxoLrIL/EopV0CoDr4RicEZWxCd2ixO2ALkDnSZuHZrcP48XXTtoChbZaTY9dUCFeyVQyvKg+sXc9CF'
+    '2JrUC+qiTueacjr1PYO51gRHshIU+bKPb9/WbvtCf768pebQ/JV8pBVlGfwFhP6Lyp5aCv6v1GiKzOqaFXyJqIgyn6yMqiDe0cLU'
+    'aBypKjOvdH1FuV6TJiOuNGKMYkQqe0hXeWqAWhsHKWQfqlbz1QYNNqlraEiIlqVEwZGD5k1/ahlZEfS4ihFLwfu8Us7RCin9z8qp'
+    'D0hThaQWjnIMoVuk6sR2A616DJMQHiNKqErY3O4FC9lqhSo2MLnyVWR9ZI/lW/YmAjcYOmjTQm3+OGh6eZHQDfyuhkndi0LJDWzM'
+    'lpfD2QRfW67NIOuNZPuueyoitGxlHsk3qUmFHqk4VPQUg6Knn+JVtXHMTosAEAPL3uQ3WjSo8LdJNZENcuP8R1PQDg1AvsEJkg1p'
+    'RYkotNI1XiklK1EUkO2iOE0XwW3lyoZwiUS9PFiFXqrkznT3h1bB9eqdeqrxbA45M+QiSnRtXhDFkR9eOMF6facKA5G8bdgKNihf'
+    '1x+wr3wqllewmURPXWAA0ZFC08EYTuTA1Bu7emqjdLXU0whukzrj4+CTVkb2R5HW0bHasyrlnaMk0VegySgG2ENfNS8fLb4r4DmZ'
+    'd6ldBbkXg10HQpH1a7GN78FkIptzFwqvxcHxMCXoqiBzD/vN46W20TQMo2CnLIKHKhJCV3MyQTacLT/HAYqimk5VFUt2Zuxw2Ioj'
+    'lEK+Jiwej7B4EXviDFiRDXmRwjrpggtJutf+FFJKr/DijLhdTgjEQWEufFuUuAJ095JLc/dMrN4szjLhLJO6BqFRLhsrupZDi9TV'
+    'VjPiYKceTX/qmVElkVnZ1AUdZQoIildWcjqpSnUxBllzFGKDuZYG4lD0k2X0P8tCuqmQuswtgQ9AjAeC3RVbOSTsXry2p1SXARV8'
+    '50shX2hZla5hpaejRhnKXN2g/gkjN79SaTf83DJWPtXKfc2CJjB4OkMowjwV514L6PJE//OGeTGczZQq6OBR0iP1rFJVcDfR866H'
+    'GnxBRt3pasqg9eq1S6FWqJZEqyBd1oWaSWqvYmKzXTVXF5KdKllrGVpSTn+KhV6aSxHj82tVLEuXj8+vJcdjhN6CQvGOPjeXTMsS'
+    'ut6cx4aNC+KCB6oBiL8URSJC6zCIgu5DBNk/wD5xNcfU9B8h3ZC+BPFjsmjNjOipU3TUzPNX8eWeiXoxY9yHrfdzc5VLVaUapS5G'
+    'ynsY5tG6J73lI+qQnmKBn1fOEcUIVexej5gDZS1A/iFzLSIX73lu9KAUB3FkMXrjuxSBgxValY9kAr3c8GR5yJOK0c0VQRae/xRB'
+    'uhBuo92iv7iQstEOuCLI8PC1kiqIswj+00L3oP4itJSuhHRHRY/+UbnSRuZWqgpojvrPMpyvGagnqFED6nk7yaeAH/7vhLqpiaTo'
+    'Ga+7K6/LnoWdrVQHk+8RymGSVKOuLV/FzqjXoXHcp25KKMRSN6ImRHaI5gSMT66VjI1blLghGHXRovwLuQzJCQGWGsWSUB8UZESx'
+    'LskvuB8auEgxTQZZuRFJvoLuL/gd69JuhT5p2bKnmeIoutwBAyxr7smSVH84EWPdczeG3qATvORtnJ63+Z9TXaomzMDAZplslwUp'
+    'Bt0baZeiJITSDWPrxLpxCnB4WFtCyyipM4poZZTZF1tw1mAJy2DCyhCM0/9yCKXnL6f4zWOTIg/Zq9UrbFYr0vjSG5znuz5se6wp'
+    'vWGf7fSZjt883Dz6yH57MHi2vRemHjl6MHvW9GP1e9I2jHl7RM6RRw/WNgb/61zHzGMzDtUVBEPnOhgag6GyjvcOTD83Y8zWURvu'
+    'bQz957mOXc2FRxN6oTEUOufshfuam4/EL8tMfztxRmPThH35qOvohXG7IreKe3Y9tOXeMdsTIn7VFPr3jzq/DPJD3ec6njh79sRn'
+    'TT/pprqffNSZF+r+qKMXMo4dP5STnrpj070KUgCVUzaNHUatnebqQdsic+kttqn5yOysxvsO703aFr4haWJ99v4T3PDY2ZtO+l7b'
+    'NiMiOm1H+qa7Hz59Z0fj9JaJR9+/vz2q5bClG12G+2zHD0xrzjz6Pn8yvJGxO+uW5Lb2i4NTtqdvHBS3Ob0qsvnpTz7u/AJ0f/Kx'
+    'PWFLyntRKdvTRv4qrbGpYcYbGdVZtzaXfvLxia8Ec13/+I0/wtjOr4QHTw5qO57T0nI0ZWrLxGMfTG3xHUtqOHfzqdwXvzOq37CH'
+    '8ebLoQbqfIJh6Cvilv7UOpRhWqv5+IHmp6ihcsCtdz9BXa6Bwa/cc4tM3LZ9pGkqdc7GHClYUfEJhqHp79YPm9LcMun95hJ03p2Z'
+    'e+yDsU1NDVPGEVxDKovG3pDyncoRDPFPthx9nyEGDfcp2DFyU3KWz3cs2diasiE6cUf65oEpdX13p4zclTPoHQNdZvFEj3/yFdB/'
+    '9PeXf9eMTZ4y/ECgv4jxWY59cFdM9bbx8dtjNsUsS44072/5pOT8CYZZJ4YGjt01+ubK72nA2BGt/sYHZp74duDTFu+F8yceI6JZ'
+    'rROOHxjT/NARjPWeP9kLiY/TEnaO3BI7o3Ok/2iL5wI1XDhv/TK4/8y/djY/9gkT/aMwuDL81tuGrhx+23cx1nmSYVdLS3YOw2Tf'
+    'pOMHqn1PHBvFkOmbfOyD0c0tR6dU+350PJXhUVA5yUCT5/fCkY+KTv9ucisIMAzJCd9WFQeJTx+wbOTNd42w+BsPXgNDXut7+4Dd'
+    'Lb7MaWErZJ9+tX7LqIMtF9ygTDC5dWLjgd2zWo5mTT8BGdxtmr69asTr/e/4fsJjvmMfRD4JAo8QG73QcuHC+by/Kdw8pibzvfFH'
+    'P62PWZW5a3hs4q646HeHvjbk9psisfszY3ZFbol7GP1OfiUQldy/BoQ/GWiqX1trmiL2BJ5sMsK3j9oYE/Z63z6D0Oo42QuDsTN3'
+    '+C782/mTDKZd5i0iozWj8SBDgq/1eM6Q3VHbRn39soat/X3/gRNbW4+n+YovEClwcA1Ut+Ycz74Gav1PNCbF0xwMxr7ba9KmnhgZ'
+    'ODr9tIAVJQj75W397vFdKO46ydAncl/OZgYikHUNPES8XAM1/ozGqTWt/gfTqn2tmVm+Cxe7LL0waMWAPvek7I0csqnWP6lpWs6J'
+    'yMAxNPz4ZM2j/gkHI975bMAPTX5/41TfBVfXKYZY7HTOnsC4pukMN8YvG9yXYSzIH4jyB5qmzQblk/8n8LkugvwVmND82yNh4zFR'
+    '2o1xoLxnXOCh+gn+zMaDvotOdPlauKezs3XW/xw4kDq2pnV245gvg+rW1mkTHsS8p/4cMGO7zVH+R5vqm+tnfTw8evOnw2+MwFGJ'
+    'H7p6cL/v+JzoktGW3nxIvDq0b9/bsvbEbkjA5AdHVkdti/NdvGg7FZZZs31A2M705HcG70rbYjDcOvrNfp/7LhbRYgBjWv2TDzxw'
+    'EaSuA4asvuPO2xMfgN1gqEtvb5kWVxuzY8g4f2ZTva+IpMuAzk/Ez0aXXlidvDshrtY/u2lUwoN+kvPFglPitQF974wOPNJU3wtD'
+    'a8N3JMfODjQdXGOqSUwa0ziq4aPr5W9o9YRtg9P9/syDJxKa79s/rDp6e8LwmqjtiRkdqb4GBvH6iDv+pdVxKXjqT4WLl4KPRwce'
+    'bq434ySmJfrvbzpY689pyhheE709Hq0Fp/66MDYA2df6A9PG7Bnf9sCh1ouO4GmG9/pM3ptwP9g9db1w96sD+w6o9c+aUs8wbPcY'
+    'U1Xt/YGM+qwzsrOZARNNT28tvIQ5/hzAbI+BctNoBnNgclM9w9DqsduH1E4JzMBnoCklPTClqR6d55z+C0JtYGZWff9XZd97zYGM'
+    '5kN72trGTNnTNnvsodF+LPWtiLpxEXsy22ZCkoXE6VfAfVjCnwB7HmibWN8LA2sSdySsqUkzjO2/Pj45eWRbe0vW6EBWc33rj0lM'
+    '1wAIPMowsDZmZxJD/7RvvXVj3ew286FeQBfr6euAqedv/TAwFUnI74c/3OFrMGL37h6QDLGPuyV82MD5Lw4fEP29gXtidiYytF76'
+    'MTggmEXruA5IbTQ3fHRL+NBB8xkm/KHjhw0Ma0enxr/HkBSY0VwfUZNorN8TaJsyrhfq2jJbMhjwmWVmAGtZ9eEPtbccbrWTJGe2'
+    'NaczrB2dEr++F+raJ8w8fNerYX37D6ypSYoe8PqQ229tvXQp//RXwlj/sN/UpwbaMuuTMFE9cTB2QE1tcvQQiDh2T05b83iGn94R'
+    'HXXTkHF1wzfMvAQOrhf8l2yhL8Btr0b2vSusJmlHdL9Xh/Qd0DGtqSGuri27ZXwvYLbsQ3VtM1rS/bbLGHY17H2gPf3wpFNR7cd7'
+    'IXrf/sQ7ho6p2yUY6tras0cRgdG9cMdKcdvA5LaclkN7Ox7wxc+4BFLXwN77MnyH/ZcKQmeugUHmPaYNDHVT2rMPp7ZNaUG/y6GH'
+    '/o5hdHu7+XAvQCSTxiW2tU8+VJfTPvnwsNEQUyr0LQ2dLWf+keHG4b++fDkxB4rzZWDgqByua2/PSVGAujEMfdLN1ZunQZJn/t9C'
+    'cjvOaXidEbsxqT275XBqJtb72clHAp8y+C/PwfH+WgjfG5mwKQZyOXwdsC4ytTo2pn2mr4EhKRuz9UJCTg/4L18Ozf4GrguS2rN8'
+    'hxn2Tu3IOBzd3pHTcA2g35Nn/uFhL2RgVpCd42tgiOzo8E1kGLE3dvfwve2Tp+DodWQ37GweP+ljhqkQ4pm/FaS2fGZ8ENv02yOJ'
+    'E8582Hn3+NPR7Y29ELhsDZ15Z1xEbfiAkw+1HUvE2hqOdwUf+XxvxxSs8goE8kHqnwQgtQf/OWDf2M5pR1I7JrY2TP5B8Gz7kX0T'
+    'wr81Yp+peoTRMc3XMLAuJX7ThLNhJ1r67UuvicKIH535Bv5SMKITst83vjPnyL6Ozpz438WsufMeo3nC5f2ybm/8sBxS3b9juP2X'
+    'I/r9MC4HGQvDH0a+PrD/uuSE6pGBy/ndHzIcDwYf/nzA3uSETfumTWo9whDXkd3awGDq6Gw1B/I+Redv4K8Nlz/tvv8b+Bo4Pez7'
+    '3d/eN6mzdSxDRrDP2faMYPDs54Cb2g2c3TEHT5tmNTGs25dqDMOwJz78e4K3E9Jqhu/vHJd9lMF82tTRxBDViRX1ed+8Z+S5QTd0'
+    '99mX2Zl5pDHY59z0xh+Ezk03oJxHvhL2d07yj8mGhD78MvhfvcNRYQ=='
+)
@@ -0,0 +1,52 @@
+"""
+check_english_grammar 마이크로벤치마크
+
+영어 학습지 문항(be동사 빈칸, 보기 고르기, 문장 바꿔 쓰기, 영작)을 16 / 64 / 128문항으로 늘려
+페이지 1회 판정 시간을 잽니다. (pytest 수집 대상 아님)
+
+    python3 tests/bench_grammar.py
+"""
+import timeit
+
+from pyodide_stubs import install_pyodide_stubs
+
+install_pyodide_stubs()
+
+import worker  # noqa: E402
+
+ITEMS = [
+    '다음 빈칸에 알맞은 be동사를 쓰시오. Tom ( ) a student. → is',
+    '다음 빈칸에 알맞은 be동사를 쓰시오. They ( ) happy yesterday. → was',
+    'Choose the correct word. She (go / goes) to school every day. → go',
+    'Choose the correct word. My brothers (play / plays) soccer. → play',
+    '다음 문장을 과거형으로 바꾸시오. I play soccer with my friends. → I played soccer with my friends.',
+    '다음 문장을 과거형으로 바꾸시오. He goes to the park. → He go to the park yesterday.',
+    '어법상 틀린 것을 고르시오. ① He have a dog. ② They are happy. ③ I was tired. 답: ①',
+    '어법상 틀린 것을 고르시오. ① She is kind. ② We was late. ③ It is cold. 답: 1',
+    'Translate into English: 나는 어제 도서관에 갔다. → I went to the library yesterday.',
+    '영작하시오. → She can plays the piano and she have a apple.',
+    '( ) you happy? → Are',
+    'Write: → I enjoy to swim in the sea.',
+    'Write: → There is three books on the desk.',
+    'Write: → This is the most biggest house and an hour passed.',
+    'Write: → I have went to a university.',
+    'Make it work. → He and I are friends.',
+]
+
+
+def build_page(count: int) -> str:
+    return 'Unit 3 Grammar\n' + '\n'.join(f'{number}. {ITEMS[(number - 1) % len(ITEMS)]}'
+                                          for number in range(1, count + 1))
+
+
+def main():
+    for count in (16, 64, 128):
+        page = build_page(count)
+        number = max(10, 800 // count)
+        elapsed = min(timeit.repeat(lambda: worker.check_english_grammar(page), number=number, repeat=5)) / number
+        verdicts = worker.check_english_grammar(page) or {}
+        print(f'{count} items ({len(page.encode()) / 1024:.1f}KB, {len(verdicts)} verdicts): {elapsed * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+calculate_math_simple 마이크로벤치마크
+
+기존 연산자별 4회 정규식 스캔(calculate_math_simple_baseline)과 현재 단일 스캔 평가기를
+같은 페이지에 돌려 1회당 시간을 비교합니다. (pytest 수집 대상 아님)
+
+    python3 tests/bench_math.py
+"""
+import re
+import timeit
+
+from pyodide_stubs import install_pyodide_stubs
+
+install_pyodide_stubs()
+
+import worker  # noqa: E402
+
+BASELINE_PATTERNS = [
+    (re.compile(r'(\d+)\s*\+\s*(\d+)\s*=\s*(\d+)'), lambda a, b: a + b),
+    (re.compile(r'(\d+)\s*-\s*(\d+)\s*=\s*(\d+)'), lambda a, b: a - b),
+    (re.compile(r'(\d+)\s*×\s*(\d+)\s*=\s*(\d+)'), lambda a, b: a * b),
+    (re.compile(r'(\d+)\s*÷\s*(\d+)\s*=\s*(\d+)'), lambda a, b: a // b if b != 0 else 0),
+]
+
+
+def calculate_math_simple_baseline(text):
+    """
+    변경 전 구현: 연산자마다 텍스트 전체를 한 번씩 스캔
+    """
+    calculations = {}
+    for pattern, operate in BASELINE_PATTERNS:
+        for match in pattern.finditer(text):
+            a, b, student = (int(group) for group in match.groups())
+            correct = operate(a, b)
+            calculations[match.group()] = {
+                'studentAnswer': student,
+                'correctAnswer': correct,
+                'isCorrect': student == correct
+            }
+    return calculations if calculations else None
+
+
+def build_pages():
+    operators = ['+', '-', '×', '÷']
+    lines = []
+    for number in range(1, 201):
+        a, b = number + 7, number % 9 + 1
+        operator = operators[number % 4]
+        answer = {'+': a + b, '-': a - b, '×': a * b, '÷': a // b}[operator]
+        lines.append(f'{number}. {a} {operator} {b} = {answer}')
+        if number % 10 == 0:
+            lines.append('다음 문제를 풀고 답을 쓰시오. 계산 과정도 함께 적으세요.')
+    return {
+        '200 equations + prose': '\n'.join(lines),
+        'three-line page': '1. 3 + 4 = 7\n2. 12 - 5 = 8\n3. 6 × 7 = 42',
+    }
+
+
+def measure(function, text, number):
+    return min(timeit.repeat(lambda: function(text), number=number, repeat=5)) / number
+
+
+def main():
+    for name, text in build_pages().items():
+        number = 200 if len(text) > 1000 else 20000
+        baseline = measure(calculate_math_simple_baseline, text, number)
+        current = measure(worker.calculate_math_simple, text, number)
+        found = len(worker.calculate_math_simple(text) or {})
+        print(f'{name} ({len(text)} chars, {found} equations): '
+              f'baseline {baseline * 1e6:.1f} us, current {current * 1e6:.1f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+classify_subject_keywords 마이크로벤치마크
+
+키워드마다 텍스트를 다시 훑는 방식(classify_subject_per_keyword)과 현재 단일 정규식 분류를
+같은 페이지에 돌려 1회당 시간을 비교합니다. (pytest 수집 대상 아님)
+
+    python3 tests/bench_subject.py
+"""
+import re
+import timeit
+from collections import Counter
+
+from pyodide_stubs import install_pyodide_stubs
+
+install_pyodide_stubs()
+
+import worker  # noqa: E402
+
+WORD = re.compile(r'[a-z]+')
+PATTERNS = [(re.compile(pattern), subject, weight)
+            for subject, patterns in worker.SUBJECT_PATTERNS.items() for pattern, weight in patterns.items()]
+
+
+def classify_subject_per_keyword(text: str) -> dict:
+    """
+    비교 대상: 한글 키워드마다 str.count, 기호 패턴마다 findall (텍스트를 키워드 수만큼 훑음)
+    """
+    text = (text or '').lower()
+    words = Counter(WORD.findall(text))
+    scores = {subject: 0 for subject in worker.SUBJECT_KEYWORDS}
+    for subject, keywords in worker.SUBJECT_KEYWORDS.items():
+        for keyword, weight in keywords.items():
+            count = words[keyword] if keyword.isascii() else text.count(keyword)
+            if count:
+                scores[subject] += weight * min(count, worker.SUBJECT_MAX_HITS)
+    for pattern, subject, weight in PATTERNS:
+        count = len(pattern.findall(text))
+        if count:
+            scores[subject] += weight * min(count, worker.SUBJECT_MAX_HITS)
+    return scores
+
+
+PAGES = {
+    'korean science page': '과학 3단원 학습지\n이름: 김철수 2024-03-05\n'
+                           + '\n'.join(f'{n}. 광합성에 필요한 물질과 세포의 역할을 쓰시오. 답: 이산화탄소' for n in range(1, 21)),
+    'english passage': 'Unit 5 Reading\n' + ' '.join(
+        'The students were reading a long story about a village where people have lived for years and you are '
+        'asked to summarize what happened there.' for _ in range(30)),
+    'math worksheet': '연산 학습지\n' + '\n'.join(f'{n}. {n + 3} × {n % 7 + 2} = {(n + 3) * (n % 7 + 2)}'
+                                            for n in range(1, 41)),
+    'three-line page': '1. 방정식을 푸시오.\n2. 2x + 3 = 7\n3. x = 2',
+}
+
+
+def measure(function, text):
+    number = 2000 if len(text) < 500 else 300
+    return min(timeit.repeat(lambda: function(text), number=number, repeat=5)) / number
+
+
+def main():
+    for name, text in PAGES.items():
+        baseline = measure(classify_subject_per_keyword, text)
+        current = measure(worker.classify_subject_keywords, text)
+        print(f'{name} ({len(text)} chars): per-keyword {baseline * 1e6:.1f} us, '
+              f'single pass {current * 1e6:.1f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+"""
+worker.py 단위 테스트 공통 설정
+
+worker.py는 Pyodide의 js / pyodide.ffi 모듈을 import하므로, 로컬 CPython에서는
+이름만 있는 대체 모듈을 먼저 등록한 뒤 불러옵니다. (JS 객체를 실제로 쓰는 경로는 테스트하지 않음)
+"""
+import pytest
+
+from pyodide_stubs import install_pyodide_stubs
+
+install_pyodide_stubs()
+
+
+@pytest.fixture(scope='session')
+def worker():
+    import worker as module
+    return module
+
+
+class Env:
+    """
+    Worker env 바인딩 대신 쓰는 객체 (속성으로 환경 변수 지정)
+    """
+    
+    def __init__(self, **values):
+        self.__dict__.update(values)
+
+
+@pytest.fixture
+def env():
+    return Env
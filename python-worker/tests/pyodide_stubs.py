@@ -0,0 +1,27 @@
+"""
+로컬 CPython에서 worker.py를 불러오기 위한 js / pyodide.ffi 대체 모듈
+(테스트와 벤치마크 스크립트가 함께 사용, JS 객체를 실제로 쓰는 경로는 다루지 않음)
+"""
+import sys
+import types
+from pathlib import Path
+
+WORKER_DIR = Path(__file__).resolve().parent.parent
+
+
+def install_pyodide_stubs():
+    js = types.ModuleType('js')
+    for name in ('Response', 'fetch', 'Headers', 'TransformStream', 'TextEncoder', 'Blob', 'Object', 'Reflect',
+                 'crypto'):
+        setattr(js, name, None)
+    pyodide = types.ModuleType('pyodide')
+    ffi = types.ModuleType('pyodide.ffi')
+    ffi.jsnull = None
+    ffi.JsException = type('JsException', (Exception,), {})
+    ffi.to_js = lambda value, **kwargs: value
+    pyodide.ffi = ffi
+    sys.modules.setdefault('js', js)
+    sys.modules.setdefault('pyodide', pyodide)
+    sys.modules.setdefault('pyodide.ffi', ffi)
+    if str(WORKER_DIR) not in sys.path:
+        sys.path.insert(0, str(WORKER_DIR))
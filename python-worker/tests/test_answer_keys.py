@@ -0,0 +1,45 @@
+import pytest
+
+
+@pytest.mark.parametrize('student, item, expected', [
+    # 객관식: 번호 표기가 달라도 같은 답
+    ('③', {'answer': '3', 'type': 'choice'}, True),
+    ('(2)', {'answer': '2'}, True),
+    ('②', {'answer': '3', 'type': 'choice'}, False),
+    # 한글 자음 보기 (NFKC로 첫소리 자모가 되어도 객관식으로 판정)
+    ('ㄴ', {'answer': 'ㄴ'}, True),
+    ('(ㄷ)', {'answer': 'ㄴ'}, False),
+    # 수치: 같은 값이면 표기가 달라도 정답, 다르면 오답
+    ('1/2', {'answer': '0.5'}, True),
+    ('x = 3', {'answer': '3'}, True),
+    ('5 cm', {'answer': '5cm'}, True),
+    ('1300', {'answer': '1200원'}, False),
+    # 단위를 빠뜨렸거나 숫자 사이 공백이 있으면 LLM 판단
+    ('1200', {'answer': '1200원'}, None),
+    ('1 2', {'answer': '12'}, None),
+    # 단답형만 불일치를 오답 처리
+    ('서울 ', {'answer': '서울', 'type': 'short'}, True),
+    ('부산', {'answer': '서울', 'type': 'short'}, False),
+    ('부산', {'answer': '서울'}, None),
+    ('Seoul', {'answer': '서울', 'alternatives': ['seoul'], 'type': 'short'}, True),
+    # 서술형이나 답이 없으면 판정하지 않음
+    ('아무 답', {'answer': '1', 'type': 'free'}, None),
+    ('', {'answer': '1'}, None),
+])
+def test_check_answer(worker, student, item, expected):
+    assert worker.check_answer(student, item) is expected
+
+
+def test_check_answer_without_key_item(worker):
+    assert worker.check_answer('3', None) is None
+
+
+@pytest.mark.parametrize('answer, choice', [
+    ('ㄱ', '\u1100'),
+    ('(ㄴ)', '\u1102'),
+    ('ㅎ.', '\u1112'),
+    ('\u1102', '\u1102'),
+])
+def test_korean_consonant_answers_are_choices(worker, answer, choice):
+    assert worker.infer_answer_type(answer) == 'choice'
+    assert worker.choice_answer(answer) == choice
@@ -0,0 +1,49 @@
+import pytest
+
+
+@pytest.fixture
+def clock(worker, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(worker.time, 'time', lambda: now[0])
+    return now
+
+
+def test_breaker_opens_on_error_rate(worker, clock):
+    breaker = worker.CircuitBreaker('test', window=10, min_calls=4, error_rate=50, slow_call_ms=1000,
+                                    probe_interval_ms=5000)
+    for ok in (True, False, True):
+        breaker.record(ok, 10)
+    assert breaker.state == 'closed'
+    
+    breaker.record(False, 10)          # 4회 중 2회 실패 = 50%
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+    assert breaker.stats['rejected'] == 1
+
+
+def test_breaker_counts_slow_calls_as_failures(worker, clock):
+    breaker = worker.CircuitBreaker('test', window=10, min_calls=2, error_rate=100, slow_call_ms=1000)
+    breaker.record(True, 1500)
+    breaker.record(True, 2000)
+    assert breaker.state == 'open'
+    assert breaker.stats['slowCalls'] == 2
+
+
+def test_breaker_half_open_probe(worker, clock):
+    breaker = worker.CircuitBreaker('test', min_calls=1, error_rate=50, probe_interval_ms=5000)
+    breaker.record(False, 10)
+    assert breaker.state == 'open'
+    
+    clock[0] += 5
+    assert breaker.allow()             # 시험 호출 하나만
+    assert breaker.state == 'half_open'
+    assert not breaker.allow()
+    
+    breaker.record(False, 10)          # 시험 호출 실패 → 다시 open
+    assert breaker.state == 'open'
+    
+    clock[0] += 5
+    assert breaker.allow()
+    breaker.record(True, 10)           # 시험 호출 성공 → closed
+    assert breaker.state == 'closed'
+    assert breaker.allow()
@@ -0,0 +1,43 @@
+import pytest
+
+
+@pytest.mark.parametrize('sentence', [
+    'He and I are friends.',
+    'She and he like apples.',
+    'You or I am wrong.',
+])
+def test_coordinated_subject_is_not_flagged(worker, sentence):
+    assert worker.grammar_errors(sentence) == []
+
+
+@pytest.mark.parametrize('sentence, corrected', [
+    ('She go to school every day.', 'She goes to school every day.'),
+    ('He have a dog.', 'He has a dog.'),
+    ('I went home and she can plays the piano.', 'I went home and she can play the piano.'),
+])
+def test_subject_verb_errors_are_corrected(worker, sentence, corrected):
+    errors = worker.grammar_errors(sentence)
+    assert errors
+    assert worker.apply_corrections(sentence, errors) == corrected
+
+
+def test_identical_answer_lines_keep_one_verdict_per_question(worker):
+    text = ('1. 다음 문장을 바르게 고치시오.\n답: He like apples.\n'
+            '2. 다음 문장을 바르게 고치시오.\n답: He like apples.\n'
+            '3. Write: → He and I are friends.')
+    verdicts = worker.check_english_grammar(text)
+    
+    assert sorted(verdicts) == ['1번', '2번']
+    assert [verdicts[key]['questionNumber'] for key in ('1번', '2번')] == [1, 2]
+    assert all(verdict['isCorrect'] is False and verdict['line'] == '답: He like apples.'
+               for verdict in verdicts.values())
+
+
+def test_unnumbered_lines_are_keyed_by_position(worker):
+    verdicts = worker.check_english_grammar('Write: → She go to school.\nWrite: → She go to school.')
+    assert sorted(verdicts) == ['1번째 줄', '2번째 줄']
+
+
+def test_filter_calculation_matches_grammar_verdicts_by_line(worker):
+    verdicts = worker.check_english_grammar('1. Fix it.\n답: He like apples.\n2. Fix it.\n답: She go home.')
+    assert list(worker.filter_calculation(verdicts, '2. Fix it.\n답: She go home.')) == ['2번']
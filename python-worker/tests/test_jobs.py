@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def job_db(worker, monkeypatch):
+    statements = []
+    
+    async def d1_run(env, sql, *params):
+        statements.append((' '.join(sql.split()), params))
+    
+    async def save_job_page(job_id, user_id, model, page, env):
+        pass
+    
+    monkeypatch.setattr(worker, 'd1_run', d1_run)
+    monkeypatch.setattr(worker, 'save_job_page', save_job_page)
+    return statements
+
+
+def run_job(worker, monkeypatch, pages):
+    async def run_grading_pipeline(images, options, stage_concurrency, env, on_result=None):
+        for page in pages:
+            await on_result(page)
+        return []
+    
+    monkeypatch.setattr(worker, 'run_grading_pipeline', run_grading_pipeline)
+    asyncio.run(worker.run_grading_job('job-1', 7, [], {'model': 'gemini-2.5-flash'}, {}, None))
+
+
+def final_status(statements):
+    return next(sql.split("status = '")[1].split("'")[0] for sql, _ in reversed(statements) if 'status' in sql)
+
+
+def test_job_with_graded_pages_is_graded(worker, monkeypatch, job_db):
+    run_job(worker, monkeypatch, [
+        {'imageIndex': 0, 'grading': {'totalQuestions': 4, 'correctAnswers': 3}},
+        {'imageIndex': 1, 'error': 'OCR 실패'},
+    ])
+    assert final_status(job_db) == 'graded'
+    assert job_db[-1][1][0] == 75
+
+
+def test_job_without_any_result_fails(worker, monkeypatch, job_db):
+    run_job(worker, monkeypatch, [{'imageIndex': 0, 'error': 'OCR 실패'}, {'imageIndex': 1, 'error': 'OCR 실패'}])
+    assert final_status(job_db) == 'failed'
+    assert '모든 페이지 채점 실패' in job_db[-1][1][0]
+
+
+def test_job_deadline_is_separate_from_request_deadline(worker, env):
+    assert worker.get_job_deadline(None, env(GRADE_DEADLINE_MS='120000')) is None
+    assert worker.get_job_deadline(None, env(GRADE_JOB_DEADLINE_MS='600000')).remaining() > 599
+    assert worker.get_job_deadline(5000, env()).remaining() <= 5
@@ -0,0 +1,38 @@
+import pytest
+
+
+def test_calculate_math_simple_checks_each_equation(worker):
+    result = worker.calculate_math_simple('1. 3 + 4 × 2 = 11\n2. 1/2 + 1/3 = 5/6\n3. (2+3)^2 = 24\n4. 17 ÷ 5 = 3 … 2')
+    
+    assert result['3 + 4 × 2 = 11']['isCorrect'] is True
+    assert result['1/2 + 1/3 = 5/6'] == {'studentAnswer': '5/6', 'correctAnswer': '5/6', 'isCorrect': True}
+    assert result['(2+3)^2 = 24']['correctAnswer'] == 25
+    assert result['(2+3)^2 = 24']['isCorrect'] is False
+    assert result['17 ÷ 5 = 3 … 2']['isCorrect'] is True
+
+
+def test_calculate_math_simple_uses_exact_fractions(worker):
+    # 0.1 + 0.2는 부동소수점으로는 0.3이 아님
+    result = worker.calculate_math_simple('0.1 + 0.2 = 0.3')
+    assert result['0.1 + 0.2 = 0.3']['isCorrect'] is True
+
+
+def test_calculate_math_simple_full_width_and_unary_minus(worker):
+    result = worker.calculate_math_simple('１２ － -3 = 15')
+    assert list(result.values())[0]['isCorrect'] is True
+
+
+def test_calculate_math_simple_without_equations(worker):
+    assert worker.calculate_math_simple('오늘은 날씨가 좋다') is None
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('(1) 3+4=7 (2) 5+6=11', {'3+4=7': True, '5+6=11': True}),
+    ('3 + 4 = 7   5 + 6 = 12', {'3 + 4 = 7': True, '5 + 6 = 12': False}),
+    ('12 - 5 = 7  13 - 6 = 7', {'12 - 5 = 7': True, '13 - 6 = 7': True}),
+    ('12 - 5 = 7\t13 - 6 = 7', {'12 - 5 = 7': True, '13 - 6 = 7': True}),
+    ('1. 3+4=7 2. 5+6=11', {'3+4=7': True, '5+6=11': True}),
+])
+def test_calculate_math_simple_splits_equations_on_one_line(worker, text, expected):
+    result = worker.calculate_math_simple(text)
+    assert {key: value['isCorrect'] for key, value in result.items()} == expected
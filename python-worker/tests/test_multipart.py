@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+BOUNDARY = '----form-boundary'
+
+
+class Chunk:
+    def __init__(self, data):
+        self.done = data is None
+        self.value = self if data is not None else None
+        self.data = data
+    
+    def to_bytes(self):
+        return self.data
+
+
+class ChunkedStream:
+    """
+    요청 본문 ReadableStream 대신: 정해진 크기로 잘라서 하나씩 돌려줌
+    """
+    
+    def __init__(self, data: bytes, size: int):
+        self.chunks = [data[i:i + size] for i in range(0, len(data), size)]
+    
+    def getReader(self):
+        return self
+    
+    async def read(self):
+        return Chunk(self.chunks.pop(0) if self.chunks else None)
+
+
+def part(headers: str, data: bytes) -> bytes:
+    return f'--{BOUNDARY}\r\n{headers}\r\n\r\n'.encode() + data + b'\r\n'
+
+
+# 본문 안에 경계 문자열 일부("\r\n--")가 들어 있어도 파트가 끝나지 않아야 함
+IMAGE = bytes(range(256)) * 20 + b'\r\n--' + BOUNDARY[:6].encode() + bytes(range(100))
+BODY = (b'preamble\r\n'
+        + part('Content-Disposition: form-data; name="userId"', b'42')
+        + part('Content-Disposition: form-data; name="systemPrompt"', '채점해 주세요'.encode())
+        + part('Content-Disposition: form-data; name="images"; filename="a.jpg"\r\nContent-Type: image/jpeg', IMAGE)
+        + part('Content-Disposition: form-data; name="images"; filename="b.png"\r\nContent-Type: image/png', b'')
+        + f'--{BOUNDARY}--\r\n'.encode())
+
+
+async def read_all(worker, data: bytes, size: int) -> list:
+    reader = worker.MultipartReader(ChunkedStream(data, size), BOUNDARY)
+    parts = []
+    while (headers := await reader.next_part()) is not None:
+        body = b''.join([chunk async for chunk in reader.read_body()])
+        parts.append((worker.multipart_params(headers), headers.get('content-type'), body))
+    return parts
+
+
+@pytest.mark.parametrize('size', [1, 3, 7, len(BOUNDARY) + 4, 64, 1000, len(BODY)])
+def test_parts_are_the_same_for_every_chunk_size(worker, size):
+    parts = asyncio.run(read_all(worker, BODY, size))
+    
+    assert [params['name'] for params, _, _ in parts] == ['userId', 'systemPrompt', 'images', 'images']
+    assert parts[0][2] == b'42'
+    assert parts[1][2].decode('utf-8') == '채점해 주세요'
+    assert parts[2][0]['filename'] == 'a.jpg'
+    assert parts[2][1] == 'image/jpeg'
+    assert parts[2][2] == IMAGE
+    assert parts[3][2] == b''
+
+
+def test_unread_part_body_is_skipped(worker):
+    async def main():
+        reader = worker.MultipartReader(ChunkedStream(BODY, 5), BOUNDARY)
+        names = []
+        while (headers := await reader.next_part()) is not None:
+            names.append(worker.multipart_params(headers)['name'])
+        return names
+    
+    assert asyncio.run(main()) == ['userId', 'systemPrompt', 'images', 'images']
+
+
+def test_truncated_body_raises(worker):
+    truncated = BODY[:BODY.index(IMAGE) + 100]
+    with pytest.raises(ValueError):
+        asyncio.run(read_all(worker, truncated, 16))
+
+
+def test_image_part_detection(worker):
+    assert worker.is_image_part({'content-disposition': 'form-data; name="images"; filename="a.jpg"'})
+    assert worker.is_image_part({'content-disposition': 'form-data; name="page"', 'content-type': 'image/png'})
+    assert not worker.is_image_part({'content-disposition': 'form-data; name="userId"'})
+
+
+def test_multipart_fields_get_json_types(worker):
+    body = worker.normalize_grade_fields({
+        'userId': '42', 'async': 'false', 'ocrCache': 'on', 'temperature': '0.2', 'deadlineMs': '',
+        'concurrency': 'abc', 'stageConcurrency': '{"ocr": 2}', 'stream': 'true', 'worksheetId': '0012',
+    })
+    
+    assert body == {
+        'userId': '42', 'async': False, 'ocrCache': True, 'temperature': 0.2,
+        'stageConcurrency': {'ocr': 2}, 'stream': True, 'worksheetId': '0012',
+    }
+    assert worker.normalize_grade_fields({'stream': 'sse'}) == {'stream': 'sse'}
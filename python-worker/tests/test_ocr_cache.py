@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+
+class FakeCache:
+    def __init__(self, entries=None):
+        self.entries = dict(entries or {})
+
+    async def get(self, key):
+        return self.entries.get(key)
+
+    async def put(self, key, value, ttl=None):
+        self.entries[key] = value
+
+
+@pytest.fixture
+def ocr_env(worker, monkeypatch):
+    cache = FakeCache()
+    monkeypatch.setattr(worker, 'get_ocr_cache', lambda env: cache)
+    monkeypatch.setattr(worker, 'get_deepseek_api_key', lambda env: 'key')
+    monkeypatch.setattr(worker, 'record_image_stats', lambda *args: None)
+
+    async def preprocess_image(image, settings):
+        return image, {}
+
+    monkeypatch.setattr(worker, 'preprocess_image', preprocess_image)
+    return cache
+
+
+def run_ocr_stage(worker, env, page):
+    options = {'model': 'deepseek/deepseek-ocr-2', 'system_prompt': '', 'temperature': 0, 'ocr_cache': True}
+    stages = worker.build_grading_stages(options, {'ocr': 1, 'rag': 1, 'analyze': 1, 'grade': 1}, env)
+    return asyncio.run(stages[0].handler(page))
+
+
+def new_page(worker):
+    return {'imageIndex': 0, 'image': worker.PageImage(None, cache_id='etag-1')}
+
+
+def test_cache_key_depends_on_model(worker):
+    deepseek = worker.ocr_cache_key('etag:1', worker.DEEPSEEK_OCR_MODEL, None)
+    gemini = worker.ocr_cache_key('etag:1', worker.GEMINI_OCR_MODEL, None)
+    assert deepseek != gemini
+
+
+def test_fallback_result_is_stored_under_serving_model(worker, env, ocr_env, monkeypatch):
+    async def ocr_with_llm(image, model, system_prompt, env, hedge=False, deadline=None):
+        return '1. 답: 3', worker.GEMINI_OCR_MODEL
+
+    monkeypatch.setattr(worker, 'ocr_with_llm', ocr_with_llm)
+    page = run_ocr_stage(worker, env, new_page(worker))
+
+    assert page['ocrModel'] == worker.GEMINI_OCR_MODEL
+    assert list(ocr_env.entries) == [worker.ocr_cache_key('etag:etag-1', worker.GEMINI_OCR_MODEL, None)]
+
+    # 다음 요청은 DeepSeek 키로 조회하므로 Gemini 결과를 DeepSeek 결과로 재사용하지 않음
+    calls = []
+
+    async def ocr_again(image, model, system_prompt, env, hedge=False, deadline=None):
+        calls.append(model)
+        return '1. 답: 3', worker.DEEPSEEK_OCR_MODEL
+
+    monkeypatch.setattr(worker, 'ocr_with_llm', ocr_again)
+    page = run_ocr_stage(worker, env, new_page(worker))
+    assert calls and 'ocrCacheHit' not in page
+    assert worker.ocr_cache_key('etag:etag-1', worker.DEEPSEEK_OCR_MODEL, None) in ocr_env.entries
+
+
+def test_cache_hit_reports_model(worker, env, ocr_env):
+    ocr_env.entries[worker.ocr_cache_key('etag:etag-1', worker.DEEPSEEK_OCR_MODEL, None)] = '1. 답: 3'
+    page = run_ocr_stage(worker, env, new_page(worker))
+    assert page['ocrCacheHit'] and page['ocrModel'] == worker.DEEPSEEK_OCR_MODEL
+    assert 'ocrImageId' not in page
+
+
+def test_open_breaker_reports_gemini(worker, env, monkeypatch):
+    class OpenBreaker:
+        def allow(self):
+            return False
+
+    async def ocr_with_gemini(image, system_prompt, env, deadline=None):
+        return 'gemini text'
+
+    monkeypatch.setattr(worker, 'get_deepseek_api_key', lambda env: 'key')
+    monkeypatch.setattr(worker, 'get_circuit_breaker', lambda *args: OpenBreaker())
+    monkeypatch.setattr(worker, 'ocr_with_gemini', ocr_with_gemini)
+    result = asyncio.run(worker.ocr_with_llm(None, 'deepseek/deepseek-ocr-2', '', env))
+    assert result == ('gemini text', worker.GEMINI_OCR_MODEL)
@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_pages_pass_through_stages_in_order(worker):
+    calls = []
+    
+    def stage(name, delay):
+        async def handler(page):
+            # 뒤 페이지가 먼저 끝나도 단계 순서는 페이지마다 지켜져야 함
+            await asyncio.sleep(delay(page))
+            calls.append((page['imageIndex'], name))
+            page.setdefault('trace', []).append(name)
+            return page
+        return handler
+    
+    stages = [
+        worker.PipelineStage('ocr', stage('ocr', lambda page: 0.01 * (3 - page['imageIndex'])), concurrency=3),
+        worker.PipelineStage('grade', stage('grade', lambda page: 0), concurrency=2),
+    ]
+    results = run(worker.StagePipeline(stages).run([{'imageIndex': i} for i in range(3)]))
+    
+    assert sorted(page['imageIndex'] for page in results) == [0, 1, 2]
+    assert all(page['trace'] == ['ocr', 'grade'] for page in results)
+    # 가장 느린 0번 페이지는 OCR이 가장 늦게 끝남 (페이지끼리는 겹쳐서 진행)
+    assert [index for index, name in calls if name == 'ocr'] == [2, 1, 0]
+
+
+def test_failed_page_skips_later_stages_without_affecting_others(worker):
+    graded = []
+    
+    async def ocr(page):
+        if page['imageIndex'] == 1:
+            raise ValueError('읽을 수 없음')
+        page['ocrText'] = 'ok'
+        return page
+    
+    async def grade(page):
+        graded.append(page['imageIndex'])
+        return page
+    
+    stages = [worker.PipelineStage('ocr', ocr, concurrency=2), worker.PipelineStage('grade', grade)]
+    results = {page['imageIndex']: page for page in run(worker.StagePipeline(stages).run(
+        [{'imageIndex': i} for i in range(3)]))}
+    
+    assert sorted(graded) == [0, 2]
+    assert results[1]['error'] == '읽을 수 없음'
+    assert results[1]['failedStage'] == 'ocr'
+    assert 'error' not in results[0] and 'error' not in results[2]
+
+
+def test_admission_limits_pages_in_flight(worker):
+    in_flight = 0
+    peak = 0
+    
+    async def handler(page):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return page
+    
+    async def main():
+        admission = asyncio.Semaphore(2)
+        stages = [worker.PipelineStage('ocr', handler, concurrency=4)]
+        return await worker.StagePipeline(stages, admission=admission).run([{'imageIndex': i} for i in range(6)])
+    
+    assert len(run(main())) == 6
+    assert peak == 2
+
+
+
+@pytest.mark.parametrize('batch_size', [None, 2])
+def test_on_result_failure_stops_workers_and_returns_admission(worker, batch_size):
+    async def handler(page):
+        await asyncio.sleep(0.001)
+        return page
+    
+    async def on_result(page):
+        if page['imageIndex'] == 2:
+            raise ConnectionResetError('client gone')
+    
+    async def main():
+        admission = asyncio.Semaphore(4)
+        stages = [worker.PipelineStage('ocr', handler, concurrency=2, batch_size=batch_size),
+                  worker.PipelineStage('grade', handler, concurrency=2)]
+        with pytest.raises(ConnectionResetError):
+            await worker.StagePipeline(stages, admission=admission, on_result=on_result).run(
+                [{'imageIndex': i} for i in range(10)])
+        await asyncio.sleep(0.01)
+        # 파이프라인이 중단되면 자리를 모두 돌려주고 남은 작업자도 없어야 함
+        others = [task for task in asyncio.all_tasks() if task is not asyncio.current_task() and not task.done()]
+        return admission._value, admission.locked(), others
+    
+    assert run(main()) == (4, False, [])
+
+
+def test_async_iterator_input(worker):
+    async def pages():
+        for i in range(3):
+            await asyncio.sleep(0)
+            yield {'imageIndex': i}
+    
+    async def handler(page):
+        page['done'] = True
+        return page
+    
+    async def main():
+        stages = [worker.PipelineStage('ocr', handler)]
+        return await worker.StagePipeline(stages, admission=asyncio.Semaphore(1)).run(pages())
+    
+    results = run(main())
+    assert sorted(page['imageIndex'] for page in results) == [0, 1, 2]
+    assert all(page['done'] for page in results)
+
+
+def test_batch_stage_failure_marks_every_page_in_batch(worker):
+    async def ocr_batch(pages):
+        if any(page['imageIndex'] == 0 for page in pages):
+            raise RuntimeError('배치 실패')
+        return pages
+    
+    stages = [worker.PipelineStage('ocr', ocr_batch, batch_size=2)]
+    results = {page['imageIndex']: page for page in run(worker.StagePipeline(stages).run(
+        [{'imageIndex': i} for i in range(3)]))}
+    
+    assert results[0]['error'] == results[1]['error'] == '배치 실패'
+    assert 'error' not in results[2]
+
+
+def test_stage_concurrency_from_request_and_env(worker, env):
+    concurrency = worker.get_stage_concurrency({'ocr': '3'}, 2, env(GRADING_CONCURRENCY='5'))
+    assert concurrency == {'ocr': 3, 'rag': 2, 'analyze': 1, 'grade': 5}
+    # 잘못된 요청 값은 요청별 페이지 동시 처리 수로
+    assert worker.get_stage_concurrency({'grade': 'x'}, 2, env())['grade'] == 2
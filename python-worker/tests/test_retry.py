@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+
+def test_retry_delay_honours_retry_after(worker, env):
+    short = worker.ProviderError('gemini', 503, 'busy', retry_after=0.5)
+    assert worker.retry_delay(3, short, env()) == 0.5
+    
+    # 상한보다 긴 Retry-After는 줄여서 일찍 보내지 않고 재시도를 포기
+    long = worker.ProviderError('gemini', 429, 'rate limited', retry_after=3600)
+    assert worker.retry_delay(0, long, env()) is None
+    medium = worker.ProviderError('gemini', 429, 'rate limited', retry_after=3)
+    assert worker.retry_delay(0, medium, env()) == 3
+    assert worker.retry_delay(0, medium, env(RETRY_MAX_DELAY_MS='2000')) is None
+
+
+def test_retry_delay_backoff_stays_within_cap(worker, env):
+    config = env(RETRY_BASE_DELAY_MS='100', RETRY_MAX_DELAY_MS='1000')
+    error = worker.ProviderError('deepseek', 502, 'bad gateway')
+    for attempt in range(8):
+        delay = worker.retry_delay(attempt, error, config)
+        assert 0 <= delay <= min(1.0, 0.1 * 2 ** attempt)
+
+
+def test_parse_retry_after(worker):
+    assert worker.parse_retry_after('3') == 3.0
+    assert worker.parse_retry_after('-1') == 0.0
+    assert worker.parse_retry_after('soon') is None
+    assert worker.parse_retry_after(None) is None
+
+
+@pytest.mark.parametrize('error, retryable', [
+    (lambda w: w.ProviderError('gemini', 429, ''), True),
+    (lambda w: w.ProviderError('gemini', 503, ''), True),
+    (lambda w: w.ProviderError('gemini', 400, ''), False),
+    (lambda w: ConnectionResetError('reset'), True),
+    (lambda w: asyncio.TimeoutError(), True),
+    (lambda w: w.JsException('TypeError: Network connection lost.'), True),
+    (lambda w: w.JsException('SyntaxError: Unexpected token < in JSON'), False),
+    (lambda w: w.DeadlineExceeded('ocr'), False),
+    (lambda w: KeyError('choices'), False),
+    (lambda w: TypeError("'NoneType' object is not subscriptable"), False),
+    (lambda w: ValueError('bad json'), False),
+])
+def test_is_retryable(worker, error, retryable):
+    assert worker.is_retryable(error(worker)) is retryable
+
+
+def run_call(worker, monkeypatch, env, errors):
+    calls = []
+    
+    async def call():
+        calls.append(1)
+        error = errors[len(calls) - 1] if len(calls) <= len(errors) else None
+        if error:
+            raise error
+        return 'ok'
+    
+    async def call_with_breaker(run, breaker):
+        return await run()
+    
+    monkeypatch.setattr(worker, 'call_with_breaker', call_with_breaker)
+    return asyncio.run(worker.call_with_retry(call, None, None, env, '테스트')), len(calls)
+
+
+def test_call_with_retry_gives_up_when_retry_after_exceeds_cap(worker, monkeypatch, env):
+    error = worker.ProviderError('gemini', 429, 'rate limited', retry_after=60)
+    with pytest.raises(worker.ProviderError):
+        run_call(worker, monkeypatch, env(), [error])
+
+
+def test_call_with_retry_does_not_retry_malformed_response(worker, monkeypatch, env):
+    with pytest.raises(KeyError):
+        run_call(worker, monkeypatch, env(), [KeyError('choices')])
+
+
+def test_call_with_retry_recovers_from_transient_error(worker, monkeypatch, env):
+    error = worker.ProviderError('gemini', 503, 'busy', retry_after=0)
+    assert run_call(worker, monkeypatch, env(), [error]) == ('ok', 2)
@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+
+class FakeWriter:
+    def __init__(self, fail_after):
+        self.records = []
+        self.fail_after = fail_after
+        self.close_calls = 0
+    
+    async def write(self, chunk):
+        if len(self.records) >= self.fail_after:
+            raise ConnectionResetError('client disconnected')
+        self.records.append(chunk)
+    
+    async def close(self):
+        self.close_calls += 1
+        if len(self.records) >= self.fail_after:
+            raise ConnectionResetError('stream errored')
+
+
+class Ctx:
+    def __init__(self):
+        self.tasks = []
+    
+    def waitUntil(self, task):
+        self.tasks.append(task)
+
+
+@pytest.fixture
+def streaming(worker, monkeypatch):
+    def setup(fail_after):
+        writer = FakeWriter(fail_after)
+        stream = type('Stream', (), {'writable': type('Writable', (), {'getWriter': lambda self: writer})(),
+                                     'readable': None})()
+        monkeypatch.setattr(worker, 'TransformStream', type('TransformStream', (), {'new': staticmethod(lambda: stream)}))
+        monkeypatch.setattr(worker, 'TextEncoder', type('TextEncoder', (), {
+            'new': staticmethod(lambda: type('Encoder', (), {'encode': lambda self, text: text})())}))
+        monkeypatch.setattr(worker, 'Response', type('Response', (), {'new': staticmethod(lambda *args, **kwargs: None)}))
+        return writer
+    return setup
+
+
+def test_client_disconnect_stops_pipeline_without_raising(worker, monkeypatch, streaming):
+    writer = streaming(fail_after=1)
+    sent = []
+    
+    async def run_grading_pipeline(images, options, stage_concurrency, env, on_result=None):
+        for index in range(5):
+            sent.append(index)
+            await on_result({'imageIndex': index})
+        return []
+    
+    monkeypatch.setattr(worker, 'run_grading_pipeline', run_grading_pipeline)
+    
+    async def main():
+        ctx = Ctx()
+        worker.start_streaming_response('ndjson', [], {}, {}, None, ctx, {})
+        await asyncio.gather(*ctx.tasks)
+    
+    asyncio.run(main())
+    # 두 번째 페이지 쓰기에서 끊기면 더 처리하지 않고, 끊긴 스트림에 summary나 close를 시도하지 않음
+    assert sent == [0, 1]
+    assert len(writer.records) == 1
+    assert writer.close_calls == 0
+
+
+def test_close_failure_after_error_summary_is_contained(worker, monkeypatch, streaming):
+    writer = streaming(fail_after=1)
+    
+    async def run_grading_pipeline(images, options, stage_concurrency, env, on_result=None):
+        raise RuntimeError('OCR 실패')
+    
+    monkeypatch.setattr(worker, 'run_grading_pipeline', run_grading_pipeline)
+    
+    async def main():
+        ctx = Ctx()
+        worker.start_streaming_response('ndjson', [], {}, {}, None, ctx, {})
+        await asyncio.gather(*ctx.tasks)
+    
+    asyncio.run(main())
+    assert '"success": false' in writer.records[0]
+    assert writer.close_calls == 1
+
+
+def test_summary_is_written_and_stream_closed(worker, monkeypatch, streaming):
+    writer = streaming(fail_after=10)
+    
+    async def run_grading_pipeline(images, options, stage_concurrency, env, on_result=None):
+        await on_result({'imageIndex': 0, 'grading': {'totalQuestions': 2, 'correctAnswers': 1}})
+        return []
+    
+    monkeypatch.setattr(worker, 'run_grading_pipeline', run_grading_pipeline)
+    
+    async def main():
+        ctx = Ctx()
+        worker.start_streaming_response('ndjson', [], {}, {}, None, ctx, {})
+        await asyncio.gather(*ctx.tasks)
+    
+    asyncio.run(main())
+    assert '"type": "summary"' in writer.records[-1] and '"correctAnswers": 1' in writer.records[-1]
+    assert writer.close_calls == 1
@@ -0,0 +1,51 @@
+import pytest
+
+
+@pytest.mark.parametrize('text, subject', [
+    ('Name: 김철수 2024-03-05\n1. 광합성에 필요한 물질은?', 'science'),
+    ('연락처 010-1234-5678\n1. 세포의 구조를 쓰시오.', 'science'),
+    ('1. 3 + 4 = 7\n2. 12 - 5 = 7', 'math'),
+    ('Read the passage. There is a cat and you are here.', 'english'),
+    ('비문학 지문을 읽고 글쓴이의 주장을 쓰시오.', 'korean'),
+])
+def test_classify_subject_keywords(worker, text, subject):
+    assert worker.classify_subject_keywords(text)['subject'] == subject
+
+
+@pytest.mark.parametrize('text', ['2024-03-05', '2024/3/5', '010-1234-5678', '02-123-4567'])
+def test_dates_and_phone_numbers_are_not_arithmetic(worker, text):
+    assert worker.classify_subject_keywords(text)['scores']['math'] == 0
+
+
+@pytest.mark.parametrize('text, math_score', [
+    ('3+4', 2),
+    ('3.5 × 2', 2),
+    ('１２＋３', 2),
+    ('5-3-1', 2),
+    ('x² = 4', 3),
+])
+def test_arithmetic_patterns(worker, text, math_score):
+    assert worker.classify_subject_keywords(text)['scores']['math'] == math_score
+
+
+def test_english_keywords_match_whole_words_only(worker):
+    scores = worker.classify_subject_keywords('there this island')['scores']
+    assert scores['english'] == 0
+    assert worker.classify_subject_keywords('be동사 the')['scores']['english'] == 4
+
+
+def test_keyword_hits_are_capped(worker):
+    assert worker.classify_subject_keywords('함수 ' * 10)['scores']['math'] == 3 * worker.SUBJECT_MAX_HITS
+
+
+def test_leading_characters(worker):
+    assert worker.leading_characters('[=＝]') == ('=＝', '')
+    assert worker.leading_characters('[a-c]x') == ('abc', 'x')
+    assert worker.leading_characters(r'\d+')[1] == '+'
+    assert worker.leading_characters('(?:ab)') is None
+
+
+def test_subject_patterns_start_with_a_character_class(worker):
+    # 모든 대안이 글자 하나로 시작해야 re가 후보가 아닌 위치를 건너뜀 (새 패턴도 문자 집합으로 시작하게)
+    patterns = [pattern for patterns in worker.SUBJECT_PATTERNS.values() for pattern in patterns]
+    assert all(worker.leading_characters(pattern) for pattern in patterns)
@@ -0,0 +1,17 @@
+def test_split_questions_numbers_question_and_answer(worker):
+    units = worker.split_questions('수학 학습지\n1. 3 + 4 = 7\n2. 우리나라의 수도는?\n답: 서울\n3. 옳은 것을 고르시오.\n정답: ③')
+    
+    assert [unit['number'] for unit in units] == [1, 2, 3]
+    assert units[0]['answer'].strip() == '7'
+    assert units[1]['question'].strip() == '우리나라의 수도는?'
+    assert units[1]['answer'] == '서울'
+    assert units[2]['answer'] == '③'
+
+
+def test_split_questions_gives_up_on_duplicate_numbers(worker):
+    assert worker.split_questions('1. 사과\n1. 배') == []
+
+
+def test_split_questions_without_answer(worker):
+    units = worker.split_questions('1. 다음 글을 읽고 답하시오.')
+    assert units[0]['answer'] == ''
@@ -0,0 +1,299 @@
+"""
+과목 분류 모델 학습 (오프라인 도구, 배포 대상 아님)
+
+worker.py의 특징 추출/키워드 분류 함수를 그대로 가져와 글자 n-gram 나이브 베이즈를 학습하고,
+키워드 분류와 정확도/지연 시간을 비교한 뒤 subject_model_data.py(worker.py와 함께 배포)를 새로 씁니다.
+
+평가는 학습에 쓰지 않은 문항으로만 합니다: 문항 줄을 정규화한 템플릿(번호 제거, 숫자 → 0)마다
+학습/평가를 나누고, 같은 템플릿이 반복된 샘플(중복)은 한 번만 씁니다.
+짧은 텍스트(평가 페이지의 첫 줄)도 평가/보정에 넣어 근거가 적을 때 모델이 확신하지 않게 합니다.
+
+사용법:
+    python3 train_subject_model.py subject_samples.jsonl [추가 데이터.jsonl ...] [--dry-run]
+
+입력 형식 (한 줄에 하나):
+    {"text": "OCR 텍스트", "subject": "math"}
+    {"ocrText": "...", "subject": "english"}          # 채점 결과(homework_gradings.result) 그대로도 가능
+
+채점 결과의 subject는 키워드 분류가 붙인 값이므로 선생님이 확인한 과목으로 고친 뒤 사용하세요.
+"""
+import ast
+import base64
+import json
+import math
+import re
+import sys
+import time
+import unicodedata
+import zlib
+from array import array
+from collections import Counter
+from pathlib import Path
+
+WORKER_PATH = Path(__file__).with_name('worker.py')
+MODEL_PATH = Path(__file__).with_name('subject_model_data.py')
+
+# worker.py에서 가져올 정의 (js 모듈 없이 실행되는 순수 함수/상수만)
+WORKER_NAMES = {
+    'SUBJECT_KEYWORDS', 'SUBJECT_PATTERNS', 'SUBJECT_MAX_HITS', 'SUBJECT_SCORE_PRIOR',
+    'keyword_trie_pattern', 'SUBJECT_LEADING_CLASS', 'SUBJECT_DIGITS', 'leading_characters', 'build_subject_matcher',
+    'SUBJECT_MATCHER', 'SUBJECT_KEYWORD_RULES', 'SUBJECT_PATTERN_RULES',
+    'classify_subject_keywords',
+    'SUBJECT_MODEL_MIN_CHARS', 'SUBJECT_MODEL_MIN_FEATURES', 'SUBJECT_MODEL_MIN_CONFIDENCE', 'SUBJECT_MODEL_MAX_CHARS',
+    'SUBJECT_MODEL_NOISE', 'SUBJECT_MODEL_DIGITS', 'subject_model_features', 'decode_subject_model',
+    'score_subject_model',
+}
+
+VOCABULARY_SIZE = 1500   # 남길 n-gram 수 (모델 크기 ≈ n-gram 글자 + n-gram × 과목 바이트)
+MIN_DOCUMENT_FREQUENCY = 3
+SMOOTHING = 0.5
+HOLDOUT_MODULO = 5       # crc32(문항 템플릿) % 5 == 0 인 문항은 평가용
+TEMPERATURES = (1, 2, 4, 8, 16, 32, 64)   # 나이브 베이즈는 과신하므로 1 이상에서만 고름
+# 근거(n-gram 수)가 적을 때 균등 분포로 당기는 정도
+# 샘플에는 여러 과목에 걸친 문항("다음을 쓰시오." 등)이 없어 로그 손실만으로는 0에 가깝게 고르므로
+# 20 이상에서만 고름 (문항 한 줄 분량의 근거로는 0.6을 넘지 않아 키워드 분류로 대신함)
+SHRINKAGES = (20, 30, 40, 60, 80)
+TEMPLATE_CHARS = 20      # 문항 템플릿 키 길이 (OCR 오타가 있는 같은 문항을 한 템플릿으로)
+QUESTION_NUMBER = re.compile(r'^\s*(?:\(\d+\)|\d+[.)]|q\d+\.|문제?\s*\d*[.|]?)\s*')
+NGRAM = (2, 3)          # 한글은 두세 음절, 영어는 철자 조각
+
+
+def load_worker_functions() -> dict:
+    """
+    worker.py에서 WORKER_NAMES에 해당하는 최상위 정의만 실행해 네임스페이스로 반환
+    """
+    tree = ast.parse(WORKER_PATH.read_text(encoding='utf-8'))
+    nodes = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            names = {node.name}
+        elif isinstance(node, ast.Assign):
+            names = {elt.id for target in node.targets
+                     for elt in (target.elts if isinstance(target, ast.Tuple) else [target])
+                     if isinstance(elt, ast.Name)}
+        else:
+            continue
+        if names & WORKER_NAMES:
+            nodes.append(node)
+    namespace = {
+        're': re, 'json': json, 'zlib': zlib, 'base64': base64, 'math': math,
+        'unicodedata': unicodedata, 'Counter': Counter, 'time': time,
+    }
+    exec(compile(ast.Module(body=nodes, type_ignores=[]), str(WORKER_PATH), 'exec'), namespace)
+    return namespace
+
+
+def load_samples(paths: list) -> list:
+    samples = []
+    for path in paths:
+        for line in Path(path).read_text(encoding='utf-8').splitlines():
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            text = row.get('text') or row.get('ocrText') or ''
+            if text.strip() and row.get('subject'):
+                samples.append((text, row['subject']))
+    return samples
+
+
+def template_key(line: str) -> str:
+    """
+    문항 줄 → 템플릿 키 (번호, 숫자, 공백/기호 차이를 지움)
+    """
+    line = QUESTION_NUMBER.sub('', unicodedata.normalize('NFKC', line).lower())
+    return re.sub(r'\d+', '0', re.sub(r'[\W_]+', '', line))[:TEMPLATE_CHARS]
+
+
+def deduplicate(samples: list) -> list:
+    """
+    문항 템플릿 구성이 같은 샘플은 하나만 (숫자만 바뀐 같은 학습지)
+    """
+    seen = set()
+    unique = []
+    for text, subject in samples:
+        key = (subject, tuple(sorted({template_key(line) for line in text.splitlines() if line.strip()})))
+        if key not in seen:
+            seen.add(key)
+            unique.append((text, subject))
+    return unique
+
+
+def split_samples(samples: list) -> tuple:
+    """
+    문항 템플릿 단위로 학습/평가 분리: 평가 템플릿의 줄은 학습 샘플에서 빼고 평가 샘플로 모음
+    (같은 문항이 여러 샘플에 반복되어도 평가 문항은 학습 때 본 적이 없음)
+    """
+    training, holdout = [], []
+    for text, subject in samples:
+        lines = [line for line in text.splitlines() if line.strip()]
+        held = [line for line in lines if zlib.crc32(template_key(line).encode('utf-8')) % HOLDOUT_MODULO == 0]
+        kept = [line for line in lines if line not in held]
+        if kept:
+            training.append(('\n'.join(kept), subject))
+        if held:
+            holdout.append(('\n'.join(held), subject))
+    return deduplicate(training), deduplicate(holdout)
+
+
+def short_samples(samples: list) -> list:
+    """
+    평가 페이지의 첫 줄만 (제목이나 문항 하나뿐인 짧은 OCR 결과)
+    """
+    firsts = [(text.splitlines()[0], subject) for text, subject in samples if '\n' in text]
+    return deduplicate(firsts)
+
+
+def train(samples: list, worker: dict, temperature: float = 1.0, shrinkage: float = 0) -> bytes:
+    """
+    n-gram 존재 여부 기반 다항 나이브 베이즈 → 압축 전 모델 바이트
+    """
+    classes = sorted({subject for _, subject in samples})
+    class_counts = Counter(subject for _, subject in samples)
+    document_frequency = {subject: Counter() for subject in classes}
+    for text, subject in samples:
+        features = worker['subject_model_features'](text, worker['SUBJECT_MODEL_MAX_CHARS'], NGRAM)
+        document_frequency[subject].update(features)
+
+    total = Counter()
+    for counts in document_frequency.values():
+        total.update(counts)
+
+    # 과목 사이 분포가 가장 치우친 n-gram만 남김 (과목별 출현 × 로그 비율의 합)
+    def informativeness(gram):
+        score = 0.0
+        for subject in classes:
+            df = document_frequency[subject][gram]
+            if df:
+                score += df * math.log((df / class_counts[subject]) / (total[gram] / len(samples)))
+        return score
+
+    candidates = [gram for gram, df in total.items()
+                  if df >= MIN_DOCUMENT_FREQUENCY and '\0' not in gram and '\x1f' not in gram]
+    vocabulary = sorted(candidates, key=informativeness, reverse=True)[:VOCABULARY_SIZE]
+
+    log_probabilities = {}
+    for subject in classes:
+        counts = document_frequency[subject]
+        denominator = sum(counts[gram] for gram in vocabulary) + SMOOTHING * len(vocabulary)
+        log_probabilities[subject] = [math.log((counts[gram] + SMOOTHING) / denominator) for gram in vocabulary]
+
+    # n-gram마다 과목 평균을 빼면 argmax는 그대로이고 int8 범위를 더 잘 씀
+    weights = []
+    for idx in range(len(vocabulary)):
+        row = [log_probabilities[subject][idx] for subject in classes]
+        mean = sum(row) / len(row)
+        weights.append([value - mean for value in row])
+    scale = max(abs(value) for row in weights for value in row) / 127
+    quantized = array('b', (round(value / scale) for row in weights for value in row))
+
+    header = {
+        'version': 2,
+        'classes': classes,
+        'ngram': list(NGRAM),
+        'maxChars': worker['SUBJECT_MODEL_MAX_CHARS'],
+        'scale': scale,
+        'bias': [math.log(class_counts[subject] / len(samples)) for subject in classes],
+        'temperature': temperature,
+        'shrinkage': shrinkage,
+        'samples': len(samples),
+        'trainedAt': time.strftime('%Y-%m-%d'),
+    }
+    return (json.dumps(header, ensure_ascii=False).encode('utf-8') + b'\0'
+            + '\x1f'.join(vocabulary).encode('utf-8') + b'\0' + quantized.tobytes())
+
+
+def encode(raw: bytes) -> str:
+    return base64.b64encode(zlib.compress(raw, 9)).decode('ascii')
+
+
+def fit_calibration(model: dict, samples: list, worker: dict) -> tuple:
+    """
+    평가 샘플의 로그 손실이 가장 작은 (softmax 온도, 근거 부족 보정값)
+    """
+    def log_loss(setting):
+        model['temperature'], model['shrinkage'] = setting
+        loss = 0.0
+        for text, subject in samples:
+            probability = worker['score_subject_model'](model, text)[0].get(subject, 0.0)
+            loss -= math.log(max(probability, 1e-9))
+        return loss / len(samples)
+    model['temperature'], model['shrinkage'] = min(
+        ((temperature, shrinkage) for temperature in TEMPERATURES for shrinkage in SHRINKAGES), key=log_loss)
+    return model['temperature'], model['shrinkage']
+
+
+def evaluate(model: dict, samples: list, worker: dict) -> dict:
+    """
+    모델 / 모델+키워드 대체 / 키워드 분류의 정확도와 호출당 지연 시간
+    """
+    correct = Counter()
+    timings = {'model': 0.0, 'keywords': 0.0}
+    for text, subject in samples:
+        started = time.perf_counter()
+        probabilities, matched = worker['score_subject_model'](model, text)
+        timings['model'] += time.perf_counter() - started
+        predicted = max(probabilities, key=probabilities.get)
+
+        started = time.perf_counter()
+        keyword = worker['classify_subject_keywords'](text)['subject']
+        timings['keywords'] += time.perf_counter() - started
+
+        confident = (probabilities[predicted] >= worker['SUBJECT_MODEL_MIN_CONFIDENCE']
+                     and matched >= worker['SUBJECT_MODEL_MIN_FEATURES']
+                     and len(text.strip()) >= worker['SUBJECT_MODEL_MIN_CHARS'])
+        correct['model'] += predicted == subject
+        correct['combined'] += (predicted if confident else keyword) == subject
+        correct['keywords'] += keyword == subject
+        correct['fallbacks'] += not confident
+    return {
+        'samples': len(samples),
+        'accuracy': {name: round(correct[name] / len(samples), 3) for name in ('model', 'combined', 'keywords')},
+        'fallbackRate': round(correct['fallbacks'] / len(samples), 3),
+        'latencyUs': {name: round(value / len(samples) * 1e6, 1) for name, value in timings.items()},
+    }
+
+
+def write_model(data: str):
+    """
+    subject_model_data.py를 새 모델로 씀 (worker.py는 건드리지 않음)
+    """
+    chunks = [data[i:i + 100] for i in range(0, len(data), 100)]
+    MODEL_PATH.write_text(
+        'r"""\n과목 분류 모델 데이터 (train_subject_model.py가 생성, 직접 고치지 마세요)\n'
+        'zlib + base64: 헤더 JSON \\0 n-gram 목록(\\x1f 구분) \\0 int8 가중치 (n-gram × 과목)\n"""\n'
+        'SUBJECT_MODEL_DATA = (\n' + ''.join(f"    '{chunk}'\n" for chunk in chunks) + ')\n',
+        encoding='utf-8')
+
+
+def main(argv: list):
+    paths = [arg for arg in argv if not arg.startswith('--')]
+    if not paths:
+        print(__doc__)
+        return 1
+    worker = load_worker_functions()
+    samples = load_samples(paths)
+    unique = deduplicate(samples)
+    training, holdout = split_samples(unique)
+    short = short_samples(holdout)
+    print(f"샘플 {len(samples)}개 (중복 제외 {len(unique)}): {dict(Counter(s for _, s in unique))}")
+    print(f"학습 {len(training)}, 평가 {len(holdout)} (문항 템플릿 분리), 짧은 텍스트 평가 {len(short)}")
+
+    model = worker['decode_subject_model'](encode(train(training, worker)))
+    temperature, shrinkage = fit_calibration(model, holdout + short, worker)
+    print(f"softmax 온도: {temperature}, 근거 부족 보정: {shrinkage}")
+    print(json.dumps({'pages': evaluate(model, holdout, worker), 'short': evaluate(model, short, worker)},
+                     ensure_ascii=False, indent=2))
+
+    # 배포 모델은 중복을 뺀 전체 샘플로 다시 학습
+    data = encode(train(unique, worker, temperature, shrinkage))
+    started = time.perf_counter()
+    worker['decode_subject_model'](data)
+    print(f"모델 크기: {len(data)}자 (base64), 로드 {(time.perf_counter() - started) * 1000:.1f}ms")
+    if '--dry-run' not in argv:
+        write_model(data)
+        print(f"✅ {MODEL_PATH.name} 생성")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
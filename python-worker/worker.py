@@ -1,9 +1,24 @@
-from js import Response, fetch, Headers
+from js import Response, fetch, Headers, TransformStream, TextEncoder, Blob, Object, Reflect, crypto
+from pyodide.ffi import JsException, jsnull, to_js
+from urllib.parse import urlparse, parse_qsl, urlencode
 import json
 import asyncio
 import re
+import time
+import uuid
+import random
+import base64
+import hashlib
+import functools
+import unicodedata
+import zlib
+import math
+import io
+from collections import Counter, OrderedDict
+from fractions import Fraction
+from email.utils import parsedate_to_datetime
 
-async def on_fetch(request, env):
+async def on_fetch(request, env, ctx=None):
     """
     숙제 채점 Python Worker
     
@@ -18,7 +33,7 @@ async def on_fetch(request, env):
     headers = {
         'Content-Type': 'application/json',
         'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Methods': 'POST, OPTIONS',
+        'Access-Control-Allow-Methods': 'POST, GET, OPTIONS',
         'Access-Control-Allow-Headers': 'Content-Type, X-API-Key',
     }
     
@@ -32,9 +47,28 @@ async def on_fetch(request, env):
         return Response.json({'error': 'Unauthorized'}, status=401, headers=headers)
     
     try:
+        path = urlparse(request.url).path
+        
+        # isolate 진단 정보 (회로 차단기 상태, OCR 헤징 카운터)
+        if request.method == 'GET' and path.rstrip('/') == '/diagnostics':
+            return Response.json({'success': True, **get_diagnostics()}, headers=headers)
+        
+        # 비동기 채점 작업 상태 조회 (GET /grade/jobs/<jobId>)
+        job_match = JOB_STATUS_PATH.match(path)
+        if request.method == 'GET' and job_match:
+            query = dict(parse_qsl(urlparse(request.url).query))
+            return await get_grading_job(job_match.group(1), query, env, headers)
+        
+        # 학습지 정답지 등록 (POST /answer-keys) / 조회 (GET /answer-keys/<answerKeyId>)
+        answer_key_match = ANSWER_KEY_PATH.match(path)
+        if answer_key_match:
+            if request.method == 'POST' and not answer_key_match.group(1):
+                return await save_answer_key(to_py(await request.json()), env, headers)
+            if request.method == 'GET' and answer_key_match.group(1):
+                return await get_answer_key(answer_key_match.group(1), env, headers)
+        
         # 요청 파싱
-        body = await request.json()
-        images = body.get('images', [])
+        body, images = await read_grade_request(request)
         user_id = body.get('userId')
         user_name = body.get('userName', '학생')
         system_prompt = body.get('systemPrompt', '')
@@ -43,54 +77,62 @@ async def on_fetch(request, env):
         enable_rag = body.get('enableRAG', False)
         academy_id = body.get('academyId')
         
-        print(f"📚 채점 시작: {user_name} ({user_id}), 이미지 {len(images)}장")
+        print(f"📚 채점 시작: {user_name} ({user_id}), 이미지 {f'{len(images)}장' if isinstance(images, list) else '업로드 중'}")
         
-        results = []
+        options = {
+            'model': model,
+            'system_prompt': system_prompt,
+            'temperature': temperature,
+            'enable_rag': enable_rag,
+            'academy_id': academy_id,
+            'batch_grading': get_flag(body.get('batchGrading'), env, 'GRADING_BATCH_MODE'),
+            'batch_ocr': get_flag(body.get('batchOcr'), env, 'OCR_BATCH_MODE'),
+            'hedge_ocr': get_flag(body.get('hedgeOcr'), env, 'OCR_HEDGE_MODE'),
+            'deadline': get_deadline(body.get('deadlineMs'), env),
+            'ocr_cache': get_flag(body.get('ocrCache'), env, 'OCR_CACHE_MODE', default=True),
+            'grading_cache': get_flag(body.get('gradingCache'), env, 'GRADING_CACHE_MODE', default=True),
+            'verdict_cache': get_flag(body.get('verdictCache'), env, 'VERDICT_CACHE_MODE', default=True),
+            'worksheet_match': get_flag(body.get('worksheetMatch'), env, 'WORKSHEET_MATCH_MODE', default=True),
+            'subject_model': get_flag(body.get('subjectModel'), env, 'SUBJECT_MODEL_MODE', default=True),
+            # 큰 사진은 OCR 전에 줄이고 흑백 JPEG로 다시 압축 (학원별 값은 요청 본문으로)
+            'image_preprocess': get_image_settings(body, env),
+            # 연산 학습지 로컬 채점 (선생님이 llmFeedback을 켜면 항상 LLM 피드백)
+            'local_math': get_flag(body.get('localMath'), env, 'LOCAL_MATH_MODE', default=True)
+                          and not body.get('llmFeedback'),
+            # 영어 어법 규칙으로 확실히 판정한 문항은 LLM에 보내지 않음
+            'local_english': get_flag(body.get('localEnglish'), env, 'LOCAL_ENGLISH_MODE', default=True)
+                             and not body.get('llmFeedback'),
+        }
         
-        # 각 이미지 처리
-        for idx, image_base64 in enumerate(images):
-            print(f"📄 이미지 {idx + 1}/{len(images)} 처리 중...")
-            
-            # 1. OCR with DeepSeek/Gemini (설정된 모델 및 프롬프트 사용)
-            ocr_text = await ocr_with_llm(image_base64, model, system_prompt, env)
-            print(f"✅ OCR 완료: {len(ocr_text)} 글자")
-            
-            # 2. RAG 검색 (활성화된 경우)
-            rag_context = []
-            if enable_rag and academy_id and hasattr(env, 'VECTORIZE'):
-                rag_context = await search_rag(ocr_text, academy_id, env)
-                print(f"✅ RAG 검색 완료: {len(rag_context)}개 결과")
-            
-            # 3. 과목 감지
-            subject = detect_subject(ocr_text)
-            print(f"✅ 과목 감지: {subject}")
-            
-            # 4. 과목별 처리
-            calculation = None
-            if subject == 'math':
-                calculation = calculate_math_simple(ocr_text)
-                print(f"✅ 수학 계산 완료")
-            
-            # 5. 최종 채점
-            grading = await final_grading(
-                ocr_text=ocr_text,
-                calculation_result=calculation,
-                rag_context=rag_context,
-                system_prompt=system_prompt,
-                model=model,
-                temperature=temperature,
-                env=env
-            )
-            print(f"✅ 채점 완료: {grading.get('correctAnswers', 0)}/{grading.get('totalQuestions', 0)} 정답")
-            
-            results.append({
-                'imageIndex': idx,
-                'ocrText': ocr_text,
-                'subject': subject,
-                'calculation': calculation,
-                'ragContext': rag_context,
-                'grading': grading,
-            })
+        # 정답지가 지정되면 객관식/단답형/수치 답은 로컬에서 비교
+        if body.get('answerKeyId') or body.get('worksheetId'):
+            options['answer_key'] = await load_answer_key(env, body.get('answerKeyId'), body.get('worksheetId'), academy_id)
+            if options['answer_key'] is None:
+                return Response.json({'success': False, 'error': '정답지를 찾을 수 없습니다.'}, status=404, headers=headers)
+        
+        # 단계별 파이프라인 처리 (단계별 동시 작업 수 + isolate 전체 상한)
+        concurrency = get_page_concurrency(body.get('concurrency'), env)
+        stage_concurrency = get_stage_concurrency(body.get('stageConcurrency'), concurrency, env)
+        print(f"⚡ 단계별 동시 작업 수: {stage_concurrency}")
+        
+        # multipart 업로드는 응답을 먼저 보내는 모드(비동기 작업/스트리밍)면 업로드를 끝까지 받고 시작
+        stream_format = get_stream_format(body.get('stream'), request.headers.get('Accept'))
+        if not isinstance(images, list) and (body.get('async') or stream_format):
+            images = [image async for image in images]
+        
+        # R2 객체 키로 받은 이미지는 버킷에서 직접 읽음 (앞 페이지 처리 중에 뒤 페이지를 미리 읽음)
+        if isinstance(images, list) and any(isinstance(image, dict) for image in images):
+            images = R2ImageSource(images, env)
+        
+        # 비동기 작업 모드 (작업 ID를 바로 반환하고 백그라운드에서 채점)
+        if body.get('async'):
+            return await submit_grading_job(body, images, options, stage_concurrency, env, ctx, headers)
+        
+        # 스트리밍 응답 (페이지가 끝나는 대로 전송)
+        if stream_format:
+            return start_streaming_response(stream_format, images, options, stage_concurrency, env, ctx, headers)
+        
+        results = await run_grading_pipeline(images, options, stage_concurrency, env)
         
         print(f"🎉 전체 채점 완료: {len(results)}개 이미지")
         
@@ -111,297 +153,4379 @@ async def on_fetch(request, env):
         }, status=500, headers=headers)
 
 
-async def ocr_with_llm(image_base64: str, model: str, system_prompt: str, env) -> str:
+# 페이지 동시 처리 설정
+DEFAULT_PAGE_CONCURRENCY = 4     # 요청 하나에서 동시에 처리할 페이지 수
+ISOLATE_PAGE_CONCURRENCY = 16    # isolate 전체에서 동시에 처리할 페이지 수
+
+# 배치 채점 설정 (여러 페이지를 한 번의 LLM 호출로 채점)
+GRADING_BATCH_MAX_PAGES = 8         # 한 번에 채점할 최대 페이지 수
+GRADING_BATCH_TOKEN_BUDGET = 6000   # 한 번에 보낼 페이지 컨텍스트 토큰 예산 (추정치)
+GRADING_OUTPUT_TOKENS_PER_PAGE = 400
+
+# 배치 OCR 설정 (여러 이미지를 한 번의 Gemini 요청으로 OCR)
+OCR_BATCH_MAX_PAGES = 4                 # 한 번에 OCR할 최대 이미지 수
+OCR_BATCH_MAX_BYTES = 12 * 1024 * 1024  # 한 번에 보낼 base64 이미지 크기 합 (Gemini 요청 20MB 제한 이내)
+OCR_OUTPUT_TOKENS_PER_PAGE = 800
+
+GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1/models/gemini-2.5-flash-lite:generateContent"
+DEEPSEEK_API_URL = "https://api.deepseek.com/v1/chat/completions"
+
+_isolate_page_semaphore = None
+
+
+def get_env_int(env, name: str, default: int) -> int:
     """
-    DeepSeek OCR 또는 Gemini로 이미지에서 텍스트 추출
-    관리자가 설정한 systemPrompt를 사용하여 OCR 수행
+    wrangler vars / secrets에서 정수 설정값 읽기 (없거나 잘못된 값이면 기본값)
     """
     try:
-        # 이미지 데이터 준비 (base64에서 data:image 부분 제거)
-        if image_base64.startswith('data:image'):
-            image_data = image_base64.split(',')[1]
-        else:
-            image_data = image_base64
+        value = getattr(env, name, None)
+        if value is None or value == '':
+            return default
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_flag(value) -> bool:
+    """
+    on/off 값: 문자열은 '1', 'true', 'yes', 'on'만 켜짐, 그 밖의 값은 bool()
+    """
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+
+def get_flag(requested, env, name: str, default: bool = False) -> bool:
+    """
+    요청 값이 있으면 요청 값, 없으면 환경 변수('1', 'true', 'yes', 'on')로 on/off 결정
+    """
+    if requested is not None:
+        return parse_flag(requested)
+    value = getattr(env, name, None)
+    if value is None or value == '':
+        return default
+    return parse_flag(str(value))
+
+
+def get_isolate_semaphore(env) -> asyncio.Semaphore:
+    """
+    isolate 전체에서 공유하는 페이지 처리 세마포어
+    여러 요청이 동시에 들어와도 외부 API 호출이 폭주하지 않도록 제한
+    """
+    global _isolate_page_semaphore
+    if _isolate_page_semaphore is None:
+        limit = max(1, get_env_int(env, 'ISOLATE_PAGE_CONCURRENCY', ISOLATE_PAGE_CONCURRENCY))
+        _isolate_page_semaphore = asyncio.Semaphore(limit)
+    return _isolate_page_semaphore
+
+
+def get_page_concurrency(requested, env) -> int:
+    """
+    요청별 동시 처리 페이지 수 결정
+    요청 값 > GRADE_CONCURRENCY 환경 변수 > 기본값 순서, isolate 상한을 넘지 않음
+    """
+    default = get_env_int(env, 'GRADE_CONCURRENCY', DEFAULT_PAGE_CONCURRENCY)
+    try:
+        concurrency = int(requested) if requested is not None else default
+    except (TypeError, ValueError):
+        concurrency = default
+    isolate_limit = get_env_int(env, 'ISOLATE_PAGE_CONCURRENCY', ISOLATE_PAGE_CONCURRENCY)
+    return max(1, min(concurrency, isolate_limit))
+
+
+def get_stage_concurrency(requested: dict, page_concurrency: int, env) -> dict:
+    """
+    단계별 동시 작업 수 결정
+    OCR과 채점은 서로 다른 API rate limit을 가지므로 따로 설정 가능
+    요청 값(stageConcurrency) > 환경 변수 > 요청별 페이지 동시 처리 수 순서
+    """
+    requested = requested if isinstance(requested, dict) else {}
+    env_names = {
+        'ocr': 'OCR_CONCURRENCY',
+        'rag': 'RAG_CONCURRENCY',
+        'analyze': 'ANALYZE_CONCURRENCY',
+        'grade': 'GRADING_CONCURRENCY',
+    }
+    
+    concurrency = {}
+    for stage_name, env_name in env_names.items():
+        default = 1 if stage_name == 'analyze' else page_concurrency
+        value = requested.get(stage_name)
+        try:
+            value = int(value) if value is not None else get_env_int(env, env_name, default)
+        except (TypeError, ValueError):
+            value = default
+        concurrency[stage_name] = max(1, value)
+    return concurrency
+
+
+_PIPELINE_DONE = object()
+
+
+def mark_page_failed(page: dict, stage_name: str, e: Exception):
+    """
+    페이지 처리 실패 기록 (이후 단계는 건너뜀), 마감 시간 초과는 timedOut으로 표시
+    """
+    print(f"❌ [{stage_name}] 이미지 {page.get('imageIndex', 0) + 1} 처리 오류: {str(e)}")
+    page['error'] = str(e)
+    page['failedStage'] = stage_name
+    if isinstance(e, DeadlineExceeded):
+        page['timedOut'] = True
+
+
+class PipelineStage:
+    """
+    파이프라인 단계 하나: 처리 함수 + 작업자 수 + 입력 큐 크기
+    
+    batch_size가 있으면 배치 단계: handler가 페이지 목록을 받아 목록을 반환
+    페이지 수(batch_size) 또는 가중치 합(batch_weight / batch_budget)이 넘치면 배치를 보냄
+    """
+    
+    def __init__(self, name: str, handler, concurrency: int = 1, queue_size: int = None,
+                 batch_size: int = None, batch_weight=None, batch_budget: int = None):
+        self.name = name
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        # 큐 크기를 제한해서 느린 단계가 있으면 앞 단계가 기다리도록 (backpressure)
+        self.queue_size = queue_size if queue_size is not None else self.concurrency * 2
+        self.batch_size = batch_size
+        self.batch_weight = batch_weight
+        self.batch_budget = batch_budget
+    
+    @property
+    def is_batch(self) -> bool:
+        return bool(self.batch_size)
+    
+    @property
+    def workers(self) -> int:
+        # 배치 단계는 모으는 작업자 하나 + 동시에 보내는 배치 수(concurrency)
+        return 1 if self.is_batch else self.concurrency
+
+
+# 배치 단계가 부분 배치를 기다리면서 admission 세마포어를 모두 잡고 있는지 확인하는 주기 (초)
+BATCH_STALL_CHECK_INTERVAL = 0.05
+
+
+class StagePipeline:
+    """
+    단계별 큐와 작업자를 가진 파이프라인 실행기
+    
+    페이지 N이 채점되는 동안 페이지 N+1은 OCR을 진행하는 식으로 단계가 겹쳐서 실행됨
+    - 각 단계는 자신의 작업자 수만큼만 동시에 실행 (provider별 rate limit 대응)
+    - 단계에서 예외가 발생한 페이지는 'error'를 기록하고 이후 단계를 건너뜀
+    - admission 세마포어가 있으면 파이프라인 안의 페이지 수를 제한
+    """
+    
+    def __init__(self, stages: list, admission: asyncio.Semaphore = None, on_result=None,
+                 keep_results: bool = True):
+        self.stages = stages
+        self.admission = admission
+        self.on_result = on_result
+        # on_result로 바로 내보내는 경우 결과를 모아두지 않음 (스트리밍 시 메모리 절약)
+        self.keep_results = keep_results
+    
+    async def run(self, items) -> list:
+        """
+        items: 목록 또는 async iterator (업로드처럼 도착하는 대로 파이프라인에 넣을 때)
+        """
+        queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        results = []
+        # 아직 돌려주지 않은 admission 자리 수 (실패로 중단될 때 남은 자리를 반환)
+        held = 0
+        # 단계 작업자와 배치 작업 (중단 시 함께 취소)
+        spawned = []
         
-        # DeepSeek OCR 모델 사용
-        # 모델명에서 접두사 제거 (deepseek/deepseek-ocr-2 → deepseek-ocr-2)
-        model_name = model.split('/')[-1] if '/' in model else model
+        def spawn(coro):
+            task = asyncio.ensure_future(coro)
+            spawned.append(task)
+            return task
         
-        if 'deepseek' in model_name.lower():
-            print(f"🔍 DeepSeek OCR 2 사용 (모델: {model})")
-            # Novita_AI_API 우선, 없으면 ALL_AI_API_KEY 사용
-            api_key = None
-            if hasattr(env, 'Novita_AI_API') and env.Novita_AI_API:
-                api_key = env.Novita_AI_API
-                print("✅ Novita_AI_API 키 사용")
-            elif hasattr(env, 'ALL_AI_API_KEY') and env.ALL_AI_API_KEY:
-                api_key = env.ALL_AI_API_KEY
-                print("✅ ALL_AI_API_KEY 키 사용")
-            
-            if not api_key:
-                print("⚠️ DeepSeek API 키 없음, Gemini로 폴백")
-                return await ocr_with_gemini(image_data, env)
-            
-            url = "https://api.deepseek.com/v1/chat/completions"
-            
-            # OCR 프롬프트 - 간결하게
-            ocr_instruction = "이미지의 모든 텍스트와 수식을 텍스트로 변환."
-            
-            payload = {
-                "model": "deepseek-chat",
-                "messages": [{
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": ocr_instruction
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{image_data}"
-                            }
-                        }
-                    ]
-                }],
-                "max_tokens": 800,
-                "temperature": 0.1
-            }
-            
-            headers = Headers.new({
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {api_key}'
-            }.items())
-            
-            response = await fetch(url,
-                method='POST',
-                headers=headers,
-                body=json.dumps(payload)
-            )
+        async def admit():
+            nonlocal held
+            if self.admission:
+                await self.admission.acquire()
+                held += 1
+        
+        def release():
+            nonlocal held
+            if self.admission and held:
+                held -= 1
+                self.admission.release()
+        
+        async def feed():
+            if isinstance(items, list):
+                for item in items:
+                    await admit()
+                    await queues[0].put(item)
+            else:
+                # 자리가 난 뒤에 다음 항목을 읽음 (파이프라인이 밀리면 업로드 읽기도 멈춤)
+                while True:
+                    await admit()
+                    try:
+                        item = await anext(items)
+                    except StopAsyncIteration:
+                        release()
+                        break
+                    await queues[0].put(item)
+            for _ in range(self.stages[0].workers):
+                await queues[0].put(_PIPELINE_DONE)
+        
+        async def finish(item):
+            release()
+            if self.keep_results:
+                results.append(item)
+            if self.on_result:
+                await self.on_result(item)
+        
+        async def forward(index, item):
+            if index + 1 < len(self.stages):
+                await queues[index + 1].put(item)
+            else:
+                await finish(item)
+        
+        async def work(index, stage):
+            while True:
+                item = await queues[index].get()
+                if item is _PIPELINE_DONE:
+                    return
+                
+                if 'error' not in item:
+                    try:
+                        item = await stage.handler(item)
+                    except Exception as e:
+                        mark_page_failed(item, stage.name, e)
+                
+                await forward(index, item)
+        
+        async def work_batch(index, stage):
+            flush_slots = asyncio.Semaphore(stage.concurrency)
+            stage_flushes = []
+            batch = []
+            weight = 0
             
-            result = await response.json()
+            async def flush(pages):
+                try:
+                    try:
+                        pages = await stage.handler(pages)
+                    except Exception as e:
+                        for page in pages:
+                            mark_page_failed(page, stage.name, e)
+                    for page in pages:
+                        await forward(index, page)
+                finally:
+                    flush_slots.release()
             
-            if result.get('choices') and len(result['choices']) > 0:
-                text = result['choices'][0]['message']['content']
-                print(f"✅ DeepSeek OCR 완료: {len(text)} 글자")
-                return text
+            async def start_flush():
+                nonlocal batch, weight
+                if not batch:
+                    return
+                await flush_slots.acquire()
+                stage_flushes.append(spawn(flush(batch)))
+                batch, weight = [], 0
             
-            print(f"⚠️ DeepSeek OCR 응답 없음, Gemini로 폴백")
-            return await ocr_with_gemini(image_data, system_prompt, env)
+            while True:
+                if batch and self.admission:
+                    # 부분 배치를 들고 있는데 admission이 꽉 차 있으면 더 기다려도 새 페이지가 오지 않음
+                    try:
+                        item = await asyncio.wait_for(queues[index].get(), BATCH_STALL_CHECK_INTERVAL)
+                    except asyncio.TimeoutError:
+                        if self.admission.locked():
+                            await start_flush()
+                        continue
+                else:
+                    item = await queues[index].get()
+                
+                if item is _PIPELINE_DONE:
+                    await start_flush()
+                    await asyncio.gather(*stage_flushes)
+                    return
+                
+                if 'error' in item:
+                    await forward(index, item)
+                    continue
+                
+                item_weight = stage.batch_weight(item) if stage.batch_weight else 0
+                over_budget = stage.batch_budget and weight + item_weight > stage.batch_budget
+                if batch and (len(batch) >= stage.batch_size or over_budget):
+                    await start_flush()
+                batch.append(item)
+                weight += item_weight
         
-        # Gemini API 사용 (기본)
-        else:
-            return await ocr_with_gemini(image_data, system_prompt, env)
+        async def run_stage(index, stage):
+            runner = work_batch if stage.is_batch else work
+            await asyncio.gather(*(spawn(runner(index, stage)) for _ in range(stage.workers)))
+            if index + 1 < len(self.stages):
+                for _ in range(self.stages[index + 1].workers):
+                    await queues[index + 1].put(_PIPELINE_DONE)
         
-    except Exception as e:
-        print(f"OCR 오류: {str(e)}, Gemini로 폴백")
-        return await ocr_with_gemini(image_data, system_prompt, env)
+        tasks = [spawn(feed())] + [spawn(run_stage(i, stage)) for i, stage in enumerate(self.stages)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # on_result 실패 등으로 중단되면 남은 작업자를 멈추고 잡고 있던 자리를 모두 반환
+            pending = {task for task in spawned if not task.done()}
+            while pending:
+                # wait_for가 취소와 결과를 동시에 받으면 취소가 묻힐 수 있어 끝날 때까지 다시 취소
+                for task in pending:
+                    task.cancel()
+                _, pending = await asyncio.wait(pending, timeout=BATCH_STALL_CHECK_INTERVAL)
+            while held:
+                release()
+            raise
+        return results
 
 
-async def ocr_with_gemini(image_data: str, system_prompt: str, env) -> str:
+def build_grading_stages(options: dict, stage_concurrency: dict, env) -> list:
     """
-    Gemini Vision API로 OCR 수행
+    채점 파이프라인 단계 구성: OCR → RAG → 과목 감지/계산 → 최종 채점
     """
-    try:
-        api_key = env.GEMINI_API_KEY if hasattr(env, 'GEMINI_API_KEY') else None
-        
-        if not api_key:
-            return "OCR API 키가 설정되지 않았습니다."
+    ocr_cache = get_ocr_cache(env) if options.get('ocr_cache') else None
+    
+    async def lookup_ocr_cache(page):
+        # 같은 이미지(바이트)를 요청한 모델로 이미 OCR한 적이 있으면 캐시된 텍스트 사용
+        if ocr_cache is None:
+            return False
+        page['ocrImageId'] = await ocr_image_id(page['image'])
+        ocr_model = ocr_model_name(options['model'], env)
+        text = await ocr_cache.get(ocr_cache_key(page['ocrImageId'], ocr_model, options.get('image_preprocess')))
+        if text is None:
+            return False
+        page.pop('image')
+        page['ocrText'] = text
+        page['ocrModel'] = ocr_model
+        page['ocrCacheHit'] = True
+        print(f"✅ [{page['imageIndex'] + 1}] OCR 캐시 적중: {len(text)} 글자")
+        return True
+    
+    async def store_ocr_cache(page):
+        # 폴백/헤지로 다른 모델이 OCR했으면 그 모델의 키로 저장 (요청한 모델의 결과로 재사용하지 않음)
+        image_id = page.pop('ocrImageId', None)
+        if image_id and not is_ocr_failure(page['ocrText']):
+            await ocr_cache.put(ocr_cache_key(image_id, page['ocrModel'], options.get('image_preprocess')),
+                                page['ocrText'])
+    
+    async def prepare_image(page):
+        # 캐시에 없는 이미지만 형식 확인 + 축소/재압축 (캐시 키는 원본 + 전처리 설정 기준)
+        page['image'], page['imagePreprocess'] = await preprocess_image(page['image'], options.get('image_preprocess'))
+        info = page['imagePreprocess']
+        if 'resizedFrom' in info:
+            print(f"🗜️ [{page['imageIndex'] + 1}] 이미지 전처리: {info['bytesBefore']} → {info['bytesAfter']} 바이트 "
+                  f"({info['preprocessMs']}ms)")
+    
+    def record_ocr_latency(page, started):
+        page['ocrMs'] = round((time.time() - started) * 1000)
+        record_image_stats(options.get('academy_id'), page['imagePreprocess'], page['ocrMs'])
+    
+    async def ocr_stage(page):
+        if await lookup_ocr_cache(page):
+            page.pop('ocrImageId', None)
+            return page
         
-        url = f"https://generativelanguage.googleapis.com/v1/models/gemini-2.5-flash-lite:generateContent?key={api_key}"
+        # 1. OCR with DeepSeek/Gemini (설정된 모델 및 프롬프트 사용)
+        await prepare_image(page)
+        started = time.time()
+        page['ocrText'], page['ocrModel'] = await ocr_with_llm(
+            page.pop('image'), options['model'], options['system_prompt'], env,
+            hedge=options.get('hedge_ocr', False), deadline=stage_deadline(options.get('deadline'), 'ocr'))
+        record_ocr_latency(page, started)
+        print(f"✅ [{page['imageIndex'] + 1}] OCR 완료: {len(page['ocrText'])} 글자")
+        await store_ocr_cache(page)
+        return page
+    
+    async def ocr_batch_stage(pages):
+        # 캐시에 없는 페이지만 배치 OCR
+        misses = []
+        for page in pages:
+            if await lookup_ocr_cache(page):
+                page.pop('ocrImageId', None)
+            else:
+                misses.append(page)
+        if not misses:
+            return pages
         
-        # OCR 프롬프트 - 간결하게 최적화
-        ocr_instruction = "이미지의 모든 텍스트와 수식을 텍스트로 변환."
+        # 1. OCR (여러 페이지를 한 번의 Gemini 요청으로)
+        for page in misses:
+            await prepare_image(page)
+        started = time.time()
+        texts = await ocr_with_gemini_batch([page.pop('image') for page in misses], options['system_prompt'], env,
+                                            deadline=stage_deadline(options.get('deadline'), 'ocr'))
+        for page, text in zip(misses, texts):
+            if isinstance(text, Exception):
+                mark_page_failed(page, 'ocr', text)
+                page.pop('ocrImageId', None)
+                continue
+            page['ocrText'] = text
+            page['ocrModel'] = GEMINI_OCR_MODEL
+            record_ocr_latency(page, started)
+            print(f"✅ [{page['imageIndex'] + 1}] OCR 완료: {len(text)} 글자")
+            await store_ocr_cache(page)
+        return pages
+    
+    async def rag_stage(page):
+        # 2. RAG 검색 (활성화된 경우)
+        if options['enable_rag'] and options['academy_id'] and hasattr(env, 'VECTORIZE'):
+            page['ragContext'] = await search_rag(page['ocrText'], options['academy_id'], env,
+                                                  deadline=stage_deadline(options.get('deadline'), 'rag'))
+            print(f"✅ [{page['imageIndex'] + 1}] RAG 검색 완료: {len(page['ragContext'])}개 결과")
+        return page
+    
+    # 학습지 템플릿과 일치한 페이지의 정답지/문항 번호 (imageIndex → 값, 응답에는 넣지 않음)
+    worksheet_answer_keys = {}
+    worksheet_questions = {}
+    
+    async def match_worksheet(page):
+        # 지정된 정답지가 없으면 등록된 학습지 템플릿과 비교해 정답지를 찾음
+        if options.get('answer_key') or not options.get('worksheet_match') or not hasattr(env, 'DB'):
+            return
+        index = await get_worksheet_index(env, options.get('academy_id'))
+        match = index.match(worksheet_signature(page['ocrText'])) if index.templates else None
+        if match is None:
+            return
         
-        payload = {
-            "contents": [{
-                "parts": [
-                    {"text": ocr_instruction},
-                    {
-                        "inline_data": {
-                            "mime_type": "image/jpeg",
-                            "data": image_data
-                        }
-                    }
-                ]
-            }],
-            "generationConfig": {
-                "maxOutputTokens": 800
-            }
+        template, similarity = match
+        answer_key = await load_answer_key(env, template['answerKeyId'], None, None)
+        if answer_key is None:
+            return
+        worksheet_answer_keys[page['imageIndex']] = answer_key
+        worksheet_questions[page['imageIndex']] = set(template['questionNumbers'])
+        page['worksheet'] = {
+            'worksheetId': template['worksheetId'],
+            'pageNumber': template['pageNumber'],
+            'answerKeyId': template['answerKeyId'],
+            'similarity': round(similarity, 2),
         }
+        print(f"✅ [{page['imageIndex'] + 1}] 학습지 일치: {template['worksheetId']} {template['pageNumber']}쪽 "
+              f"(유사도 {similarity:.2f})")
+    
+    def answer_key_for(page):
+        return options.get('answer_key') or worksheet_answer_keys.get(page['imageIndex'])
+    
+    async def analyze_stage(page):
+        await match_worksheet(page)
         
-        headers = Headers.new({'Content-Type': 'application/json'}.items())
-        response = await fetch(url,
-            method='POST',
-            headers=headers,
-            body=json.dumps(payload)
-        )
+        # 3. 과목 감지
+        classified = classify_subject(page['ocrText'], use_model=options.get('subject_model', True))
+        page['subject'] = classified['subject']
+        page['subjectConfidence'] = classified['confidence']
+        print(f"✅ [{page['imageIndex'] + 1}] 과목 감지: {page['subject']} (신뢰도 {classified['confidence']:.2f})")
         
-        result = await response.json()
+        # 4. 과목별 처리
+        if page['subject'] == 'math':
+            page['calculation'] = calculate_math_simple(page['ocrText'])
+            # 방정식 풀이/식 정리는 기호 연산으로 검증 (SymPy는 필요할 때만 로드)
+            symbolic = verify_algebra(page['ocrText'])
+            if symbolic:
+                page['calculation'] = {**(page['calculation'] or {}), **symbolic}
+            print(f"✅ [{page['imageIndex'] + 1}] 수학 계산 완료")
+        elif page['subject'] == 'english':
+            page['calculation'] = check_english_grammar(page['ocrText'])
+            print(f"✅ [{page['imageIndex'] + 1}] 영어 어법 검증: {len(page['calculation'] or {})}문항 판정")
+        return page
+    
+    grading_cache = get_grading_cache(env) if options.get('grading_cache') else None
+    verdict_cache = get_verdict_cache(env) if options.get('verdict_cache') else None
+    grading_cache_policy = get_grading_cache_policy(env, options.get('academy_id'))
+    if not grading_cache_policy['enabled'] or options['temperature'] > grading_cache_policy['max_temperature']:
+        grading_cache = verdict_cache = None
+    
+    async def lookup_grading_cache(page):
+        # 같은 OCR 텍스트/계산 결과/참고 자료/프롬프트/모델/temperature로 채점한 적이 있으면 그 결과 사용
+        if grading_cache is None:
+            return False
+        page['gradingCacheKey'] = grading_cache_key(page['ocrText'], page['calculation'], page['ragContext'], options,
+                                                    answer_key_for(page))
+        cached = await grading_cache.get(page['gradingCacheKey'])
+        if cached is None:
+            return False
+        page.pop('gradingCacheKey')
+        page['grading'] = json.loads(cached)
+        page['gradingCacheHit'] = True
+        print(f"✅ [{page['imageIndex'] + 1}] 채점 캐시 적중")
+        return True
+    
+    async def store_grading_cache(page):
+        key = page.pop('gradingCacheKey', None)
+        if key and page['grading'].get('totalQuestions', 0) > 0:
+            await grading_cache.put(key, json.dumps(page['grading'], ensure_ascii=False),
+                                    grading_cache_policy['ttl_seconds'])
+    
+    async def lookup_verdicts(page):
+        """
+        문항 단위 판정: 정답지 로컬 비교 → 영어 어법 규칙 → 문항 판정 캐시 (같은 학원에서 같은 문제에 같은 답을 쓴 경우)
+        LLM에 보낼 OCR 텍스트를 반환, 모든 문항이 판정되면 page['grading']을 채우고 None
+        """
+        answer_key = answer_key_for(page)
+        known_questions = worksheet_questions.pop(page['imageIndex'], None)
+        grammar_verdicts = {}
+        if options.get('local_english') and page['subject'] == 'english':
+            grammar_verdicts = {result['questionNumber']: result['isCorrect']
+                                for result in (page['calculation'] or {}).values() if 'questionNumber' in result}
+        # 문항 판정 캐시는 학습지를 알 때만 (지문이 다른 학습지의 같은 문항 줄과 섞이지 않도록)
+        context = verdict_context(page, answer_key)
+        page_verdict_cache = verdict_cache if context else None
+        if page_verdict_cache is None and answer_key is None and not grammar_verdicts:
+            return page['ocrText']
+        units = split_questions(page['ocrText'])
+        if known_questions:
+            # 학습지 템플릿의 문항 번호에 없는 줄(날짜, 쪽 번호 등)은 문항으로 보지 않음
+            units = [unit for unit in units if unit['number'] in known_questions]
+        if not units or (answer_key is None and not grammar_verdicts and len(units) < VERDICT_MIN_UNITS):
+            return page['ocrText']
         
-        if result.get('candidates') and len(result['candidates']) > 0:
-            text = result['candidates'][0]['content']['parts'][0]['text']
-            print(f"✅ Gemini OCR 완료: {len(text)} 글자")
-            return text
+        answer_key_matches = grammar_matches = verdict_cache_hits = 0
+        for unit in units:
+            item = answer_key['answers'].get(unit['number']) if answer_key else None
+            unit['isCorrect'] = check_answer(unit['answer'], item)
+            if unit['isCorrect'] is not None:
+                answer_key_matches += 1
+                continue
+            if item is None and unit['number'] in grammar_verdicts:
+                unit['isCorrect'] = grammar_verdicts[unit['number']]
+                grammar_matches += 1
+                continue
+            if item is not None:
+                # 정답지로 판단하지 못한 문항은 정답을 함께 보내 LLM이 참고
+                unit['expected'] = item['answer']
+            if page_verdict_cache is not None:
+                unit['key'] = verdict_cache_key(unit, options, context)
+                cached = await page_verdict_cache.get(unit['key'])
+                if cached is not None:
+                    unit['isCorrect'] = cached == '1'
+                    verdict_cache_hits += 1
         
-        return "텍스트를 읽을 수 없습니다."
+        if answer_key is not None:
+            page['answerKeyMatches'] = answer_key_matches
+        if grammar_verdicts:
+            page['grammarMatches'] = grammar_matches
+        if page_verdict_cache is not None:
+            page['verdictCacheHits'] = verdict_cache_hits
         
-    except Exception as e:
-        print(f"Gemini OCR 오류: {str(e)}")
-        return f"OCR 오류: {str(e)}"
+        unseen = [unit for unit in units if unit['isCorrect'] is None]
+        page['questionUnits'] = units
+        if unseen:
+            return pending_questions_text(page['ocrText'], units)
+        
+        page['grading'] = merge_question_verdicts(page.pop('questionUnits'), None)
+        worksheet_answer_keys.pop(page['imageIndex'], None)
+        print(f"✅ [{page['imageIndex'] + 1}] 문항 단위 로컬 채점: {len(units)}문항 "
+              f"(정답지 {answer_key_matches}, 어법 {grammar_matches}, 캐시 {verdict_cache_hits})")
+        return None
+    
+    async def store_verdicts(page, grading):
+        """
+        새로 채점한 문항 판정을 캐시에 저장하고, 로컬 판정과 합쳐 페이지 결과 구성
+        """
+        worksheet_answer_keys.pop(page['imageIndex'], None)
+        units = page.pop('questionUnits', None)
+        if units is None:
+            return grading
+        for unit in assign_fresh_verdicts(units, grading):
+            if verdict_cache is not None and 'key' in unit:
+                await verdict_cache.put(unit['key'], '1' if unit['isCorrect'] else '0', grading_cache_policy['ttl_seconds'])
+        return merge_question_verdicts(units, grading)
+    
+    def grade_locally(page):
+        # 모든 문항이 로컬 계산으로 검증되는 연산 학습지는 LLM 없이 채점
+        if not options.get('local_math') or page['subject'] != 'math':
+            return False
+        grading = grade_arithmetic_locally(page['ocrText'], page['calculation'])
+        if grading is None:
+            return False
+        page['grading'] = grading
+        page['gradedLocally'] = True
+        print(f"✅ [{page['imageIndex'] + 1}] 연산 로컬 채점: {grading['correctAnswers']}/{grading['totalQuestions']} 정답")
+        return True
+    
+    async def grade_stage(page):
+        if grade_locally(page) or await lookup_grading_cache(page):
+            return page
+        grading_text = await lookup_verdicts(page)
+        if grading_text is None:
+            await store_grading_cache(page)
+            return page
+        
+        # 5. 최종 채점
+        grading = await final_grading(
+            ocr_text=grading_text,
+            calculation_result=filter_calculation(page['calculation'], grading_text),
+            rag_context=page['ragContext'],
+            system_prompt=options['system_prompt'],
+            model=options['model'],
+            temperature=options['temperature'],
+            env=env,
+            deadline=stage_deadline(options.get('deadline'), 'grade')
+        )
+        page['grading'] = grading = await store_verdicts(page, grading)
+        print(f"✅ [{page['imageIndex'] + 1}] 채점 완료: {grading.get('correctAnswers', 0)}/{grading.get('totalQuestions', 0)} 정답")
+        await store_grading_cache(page)
+        return page
+    
+    async def grade_batch_stage(pages):
+        # 캐시에 없는 페이지(문항)만 배치 채점
+        misses, grading_texts = [], []
+        for page in pages:
+            if grade_locally(page) or await lookup_grading_cache(page):
+                continue
+            grading_text = await lookup_verdicts(page)
+            if grading_text is None:
+                await store_grading_cache(page)
+                continue
+            misses.append(page)
+            grading_texts.append(grading_text)
+        if not misses:
+            return pages
+        
+        # 5. 최종 채점 (여러 페이지를 한 번의 LLM 호출로)
+        gradings = await final_grading_batch(
+            pages=[{
+                'ocr_text': grading_text,
+                'calculation_result': filter_calculation(page['calculation'], grading_text),
+                'rag_context': page['ragContext'],
+            } for page, grading_text in zip(misses, grading_texts)],
+            system_prompt=options['system_prompt'],
+            model=options['model'],
+            temperature=options['temperature'],
+            env=env,
+            deadline=stage_deadline(options.get('deadline'), 'grade')
+        )
+        for page, grading in zip(misses, gradings):
+            if isinstance(grading, Exception):
+                mark_page_failed(page, 'grade', grading)
+                page.pop('gradingCacheKey', None)
+                page.pop('questionUnits', None)
+                continue
+            page['grading'] = await store_verdicts(page, grading)
+            await store_grading_cache(page)
+        print(f"✅ 배치 채점 완료: 이미지 {', '.join(str(page['imageIndex'] + 1) for page in misses)}")
+        return pages
+    
+    if options.get('batch_grading'):
+        grading = PipelineStage(
+            'grade', grade_batch_stage, stage_concurrency['grade'],
+            batch_size=get_env_int(env, 'GRADING_BATCH_MAX_PAGES', GRADING_BATCH_MAX_PAGES),
+            batch_weight=lambda page: estimate_tokens(build_grading_context(
+                page['ocrText'], page['calculation'], page['ragContext'])),
+            batch_budget=get_env_int(env, 'GRADING_BATCH_TOKEN_BUDGET', GRADING_BATCH_TOKEN_BUDGET),
+        )
+    else:
+        grading = PipelineStage('grade', grade_stage, stage_concurrency['grade'])
+    
+    # DeepSeek OCR은 요청당 이미지 한 장이므로 Gemini OCR일 때만 배치
+    if options.get('batch_ocr') and 'deepseek' not in options['model'].lower():
+        ocr = PipelineStage(
+            'ocr', ocr_batch_stage, stage_concurrency['ocr'],
+            batch_size=get_env_int(env, 'OCR_BATCH_MAX_PAGES', OCR_BATCH_MAX_PAGES),
+            batch_weight=lambda page: page['image'].size,
+            batch_budget=get_env_int(env, 'OCR_BATCH_MAX_BYTES', OCR_BATCH_MAX_BYTES),
+        )
+    else:
+        ocr = PipelineStage('ocr', ocr_stage, stage_concurrency['ocr'])
+    
+    return [
+        ocr,
+        PipelineStage('rag', rag_stage, stage_concurrency['rag']),
+        PipelineStage('analyze', analyze_stage, stage_concurrency['analyze']),
+        grading,
+    ]
+
+
+# data URL 접두사("data:image/png;base64,")를 찾을 때 읽는 앞부분 길이
+DATA_URL_PREFIX_MAX = 128
+
+# provider 요청 본문에서 이미지 자리 표시 ("...@@<번호>@@" 자리에 이미지 Blob을 이어 붙임)
+IMAGE_PLACEHOLDER = f"@@page-image-{uuid.uuid4().hex}-"
+IMAGE_PLACEHOLDER_PATTERN = re.compile(re.escape(IMAGE_PLACEHOLDER) + r'(\d+)@@')
+
+
+class PageImage:
+    """
+    페이지 이미지: data URL 접두사를 뗀 base64 본문을 담은 JS Blob + MIME 타입
+    base64 문자열을 Python str로 옮기지 않고, provider 요청 본문에 Blob 그대로 이어 붙임
+    (요청 본문 → split → json.dumps로 이어지던 페이지당 이미지 사본 3~4개 → JS 쪽 1개)
+    """
+    
+    def __init__(self, blob, mime_type: str = 'image/jpeg', cache_id: str = None):
+        self.blob = blob
+        self.mime_type = mime_type
+        # 내용을 해시하지 않아도 이미지를 식별할 수 있는 값 (R2 ETag 등), 있으면 OCR 캐시 키로 사용
+        self.cache_id = cache_id
+    
+    @property
+    def size(self) -> int:
+        # base64 본문 길이 (배치 OCR 크기 예산 기준)
+        return int(self.blob.size)
+    
+    def data_url(self) -> 'PageImageUrl':
+        return PageImageUrl(self)
+    
+    async def sha256(self) -> bytes:
+        """
+        base64 본문의 SHA-256 (Blob 스트림을 그대로 해시, Python으로 복사하지 않음)
+        """
+        stream = crypto.DigestStream.new('SHA-256')
+        await self.blob.stream().pipeTo(stream)
+        return (await stream.digest).to_bytes()
+
+
+class PageImageUrl:
+    """
+    요청 본문 안의 "data:<mime>;base64,<이미지>" 문자열 자리 (DeepSeek image_url)
+    """
+    
+    def __init__(self, image: PageImage):
+        self.image = image
+
+
+async def load_page_image(value) -> PageImage:
+    """
+    요청의 이미지 항목 → PageImage
+    value는 문자열 하나가 든 JS 배열(요청 본문에서 잘라낸 것) 또는 Python 문자열
+    data URL 접두사는 앞부분만 읽어 위치를 찾고 Blob.slice로 떼어냄 (본문 복사 없음)
+    """
+    blob = Blob.new(to_js([value]) if isinstance(value, str) else value)
+    head = await blob.slice(0, DATA_URL_PREFIX_MAX).text()
+    comma = head.find(',')
+    if not head.startswith('data:') or comma < 0 or not head[:comma].isascii():
+        return PageImage(blob)
+    mime_type = head[5:comma].split(';')[0] or 'image/jpeg'
+    return PageImage(blob.slice(comma + 1), mime_type)
+
+
+def parse_object_field(value) -> dict:
+    value = json.loads(value) if isinstance(value, str) else value
+    if not isinstance(value, dict):
+        raise ValueError("객체가 아닙니다.")
+    return value
+
+
+# /grade 요청 필드 타입 (JSON 본문과 multipart 문자열 필드를 같은 값으로 맞춤)
+GRADE_FIELD_PARSERS = {
+    **{name: parse_flag for name in (
+        'async', 'enableRAG', 'batchGrading', 'batchOcr', 'hedgeOcr', 'ocrCache', 'gradingCache', 'verdictCache',
+        'worksheetMatch', 'subjectModel', 'imagePreprocess', 'imageGrayscale', 'localMath', 'localEnglish',
+        'llmFeedback',
+    )},
+    **{name: int for name in (
+        'deadlineMs', 'jobDeadlineMs', 'concurrency', 'imageMinBytes', 'imageMaxDimension', 'imageQuality',
+    )},
+    'temperature': float,
+    'stageConcurrency': parse_object_field,
+}
+
+
+def normalize_grade_fields(body: dict) -> dict:
+    """
+    /grade 요청 필드 타입 맞추기 (JSON 본문과 multipart 업로드 모두 여기를 거침)
+    on/off → bool, 숫자 → int/float, stageConcurrency → dict, stream → 형식 이름 또는 bool
+    빈 값이나 해석할 수 없는 값은 빼서 환경 변수/기본값을 쓰게 함
+    """
+    for name, parse in GRADE_FIELD_PARSERS.items():
+        value = body.get(name)
+        if value is None:
+            continue
+        try:
+            if isinstance(value, str) and not value.strip():
+                raise ValueError("빈 값")
+            body[name] = parse(value)
+        except (TypeError, ValueError):
+            print(f"⚠️ 요청 필드 무시: {name}={value!r}")
+            body.pop(name)
+    
+    stream = body.get('stream')
+    if isinstance(stream, str) and stream.strip().lower() not in STREAM_CONTENT_TYPES:
+        body['stream'] = parse_flag(stream)
+    return body
+
+
+async def read_grade_body(request) -> tuple:
+    """
+    /grade 요청 본문 → (나머지 필드 dict, 이미지 목록)
+    JS 객체로 받은 본문은 images 배열을 떼어낸 뒤 나머지만 Python으로 변환하고,
+    이미지 문자열은 JS 배열에서 하나씩 꺼내 Blob으로 옮김 (원본 문자열은 바로 해제)
+    R2 객체 참조({"r2Key": "..."})는 dict 그대로 두고 R2ImageSource가 읽음
+    """
+    raw = await request.json()
+    if not hasattr(raw, 'to_py'):
+        # 이미 Python 값으로 변환된 본문
+        images = raw.pop('images', None) or []
+        pages = []
+        while images:
+            image = images.pop(0)
+            pages.append(image if isinstance(image, dict) else await load_page_image(image))
+        return raw, pages
+    
+    images = getattr(raw, 'images', None)
+    Reflect.deleteProperty(raw, 'images')
+    body = raw.to_py()
+    pages = []
+    while images is not None and images.length > 0:
+        entry = images.splice(0, 1)
+        # 객체 항목인지는 JS에서 확인 (문자열 항목을 Python으로 꺼내면 이미지가 복사됨)
+        if entry.some(Object.isExtensible):
+            pages.append(to_py(entry[0]))
+        else:
+            pages.append(await load_page_image(entry))
+    return body, pages
+
+
+# multipart/form-data 업로드 (base64 없이 이미지 원본 바이트)
+MULTIPART_BOUNDARY = re.compile(r'boundary="?([^";]+)"?', re.IGNORECASE)
+MULTIPART_PARAM = re.compile(r';\s*([\w*-]+)="?([^";]*)"?')
+MULTIPART_MAX_HEADER_BYTES = 16 * 1024
+MULTIPART_MAX_FIELD_BYTES = 1024 * 1024
+
+
+class MultipartReader:
+    """
+    multipart/form-data 본문을 요청 스트림에서 조금씩 읽으며 파트 단위로 파싱
+    버퍼에는 아직 처리하지 않은 조각(경계 길이 이하 + 읽은 청크 하나)만 남김
+    """
+    
+    def __init__(self, stream, boundary: str):
+        self.reader = stream.getReader()
+        self.delimiter = b'\r\n--' + boundary.encode('latin-1')
+        # 첫 경계 앞에도 줄바꿈이 있는 것처럼 두면 모든 경계를 같은 패턴으로 찾을 수 있음
+        self.buffer = bytearray(b'\r\n')
+        self.eof = False
+    
+    async def fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = await self.reader.read()
+        if chunk.done:
+            self.eof = True
+            return False
+        self.buffer += chunk.value.to_bytes()
+        return True
+    
+    async def next_part(self):
+        """
+        다음 파트의 헤더(dict, 소문자 키), 마지막 경계면 None
+        앞 파트 본문을 다 읽지 않았으면 건너뜀
+        """
+        while True:
+            index = self.buffer.find(self.delimiter)
+            if index >= 0 and len(self.buffer) >= index + len(self.delimiter) + 2:
+                break
+            if index < 0 and len(self.buffer) > len(self.delimiter):
+                del self.buffer[:-len(self.delimiter)]
+            if not await self.fill():
+                return None
+        del self.buffer[:index + len(self.delimiter)]
+        if self.buffer.startswith(b'--'):
+            return None
+        
+        while (end := self.buffer.find(b'\r\n\r\n')) < 0:
+            if len(self.buffer) > MULTIPART_MAX_HEADER_BYTES or not await self.fill():
+                raise ValueError("multipart 파트 헤더를 읽을 수 없습니다.")
+        lines = bytes(self.buffer[2:end]).decode('utf-8', 'replace').split('\r\n')
+        del self.buffer[:end + 4]
+        
+        headers = {}
+        for line in lines:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return headers
+    
+    async def read_body(self):
+        """
+        현재 파트 본문을 조각 단위로 (다음 경계 앞까지)
+        """
+        keep = len(self.delimiter) - 1
+        while True:
+            index = self.buffer.find(self.delimiter)
+            if index >= 0:
+                if index:
+                    yield bytes(self.buffer[:index])
+                del self.buffer[:index]
+                return
+            if len(self.buffer) > keep:
+                yield bytes(self.buffer[:-keep])
+                del self.buffer[:-keep]
+            if not await self.fill():
+                raise ValueError("multipart 본문이 마지막 경계 없이 끝났습니다.")
+
+
+def multipart_params(headers: dict) -> dict:
+    """
+    Content-Disposition 매개변수 (name, filename)
+    """
+    return {key.lower(): value for key, value in MULTIPART_PARAM.findall(headers.get('content-disposition', ''))}
+
+
+def is_image_part(headers: dict) -> bool:
+    content_type = headers.get('content-type', '').lower()
+    return 'filename' in multipart_params(headers) or content_type.startswith(('image/', 'application/octet-stream'))
+
+
+async def read_multipart_field(reader: MultipartReader) -> str:
+    data = bytearray()
+    async for chunk in reader.read_body():
+        data += chunk
+        if len(data) > MULTIPART_MAX_FIELD_BYTES:
+            raise ValueError("multipart 필드가 너무 큽니다.")
+    return data.decode('utf-8')
+
+
+async def encode_image_chunks(chunks, mime_type: str, cache_id: str = None) -> PageImage:
+    """
+    이미지 원본 바이트 조각(async iterator) → PageImage
+    받은 조각을 3바이트 단위로 바로 base64로 바꿔 JS Blob 조각으로 넘김 (Python에는 조각 하나만 남음)
+    """
+    pieces = []
+    pending = b''
+    async for chunk in chunks:
+        data = pending + chunk
+        cut = len(data) - len(data) % 3
+        pieces.append(base64.b64encode(data[:cut]).decode('ascii'))
+        pending = data[cut:]
+    pieces.append(base64.b64encode(pending).decode('ascii'))
+    return PageImage(Blob.new(to_js(pieces)), mime_type, cache_id)
+
+
+async def read_stream_chunks(stream):
+    """
+    JS ReadableStream → bytes 조각
+    """
+    reader = stream.getReader()
+    while True:
+        chunk = await reader.read()
+        if chunk.done:
+            return
+        yield chunk.value.to_bytes()
+
+
+def image_mime_type(content_type) -> str:
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    return content_type if content_type.startswith('image/') else 'image/jpeg'
+
+
+async def read_multipart_image(reader: MultipartReader, headers: dict) -> PageImage:
+    return await encode_image_chunks(reader.read_body(), image_mime_type(headers.get('content-type')))
+
+
+async def read_grade_multipart(request, content_type: str) -> tuple:
+    """
+    multipart/form-data /grade 요청 → (메타데이터 dict, 이미지 async iterator)
+    첫 이미지 파트 전의 필드(userId, systemPrompt, model, ...)만 읽고 바로 반환하고,
+    이미지 파트는 파이프라인이 꺼낼 때 이어서 읽음 (앞 페이지 OCR 중에 뒤 페이지가 업로드됨)
+    필드 값은 문자열 그대로 두고 타입은 normalize_grade_fields에서 JSON 본문과 같이 맞춤
+    """
+    match = MULTIPART_BOUNDARY.search(content_type)
+    if not match:
+        raise ValueError("multipart boundary가 없습니다.")
+    reader = MultipartReader(request.body, match.group(1))
+    
+    body = {}
+    headers = await reader.next_part()
+    while headers is not None and not is_image_part(headers):
+        name = multipart_params(headers).get('name', '')
+        body[name] = await read_multipart_field(reader)
+        headers = await reader.next_part()
+    
+    async def images():
+        nonlocal headers
+        try:
+            while headers is not None:
+                if is_image_part(headers):
+                    image = await read_multipart_image(reader, headers)
+                    if image.size:
+                        yield image
+                else:
+                    print(f"⚠️ 이미지 뒤에 온 필드는 무시: {multipart_params(headers).get('name')}")
+                headers = await reader.next_part()
+        except ValueError as e:
+            # 업로드가 중간에 끊겨도 이미 받은 페이지는 채점
+            print(f"⚠️ multipart 업로드 읽기 오류: {str(e)}")
+    
+    return body, images()
+
+
+async def read_grade_request(request) -> tuple:
+    """
+    /grade 요청 → (메타데이터 dict, 이미지)
+    JSON 본문이면 이미지는 PageImage 목록, multipart/form-data면 업로드 순서대로 나오는 async iterator
+    """
+    content_type = request.headers.get('Content-Type') or ''
+    if content_type.lower().startswith('multipart/form-data'):
+        body, images = await read_grade_multipart(request, content_type)
+    else:
+        body, images = await read_grade_body(request)
+    return normalize_grade_fields(body), images
+
+
+# R2 객체 키로 받은 이미지 미리 읽기
+R2_FETCH_CONCURRENCY = 4                  # 동시에 읽는 R2 객체 수
+R2_PREFETCH_MAX_BYTES = 16 * 1024 * 1024  # 다 읽었지만 파이프라인이 아직 꺼내지 않은 이미지(base64) 크기 합
+
+
+async def load_r2_image(bucket, key: str) -> PageImage:
+    """
+    R2 객체 → PageImage (ETag를 OCR 캐시 키로 사용해서 이미지 내용을 해시하지 않음)
+    """
+    obj = await bucket.get(key)
+    if obj is None:
+        raise ValueError(f"R2 객체를 찾을 수 없습니다: {key}")
+    http_metadata = getattr(obj, 'httpMetadata', None)
+    return await encode_image_chunks(read_stream_chunks(obj.body),
+                                     image_mime_type(getattr(http_metadata, 'contentType', None)),
+                                     cache_id=f"r2:{key}:{obj.etag}")
+
+
+class R2ImageSource:
+    """
+    images 목록 중 R2 객체 참조({"r2Key": "..."})를 R2_SUPERPLACESTUDY 바인딩에서 직접 읽어 요청 순서대로 내보냄
+    - 파이프라인이 앞 페이지를 처리하는 동안 뒤 객체를 최대 R2_FETCH_CONCURRENCY개까지 동시에 읽음
+    - 다 읽고 아직 꺼내지 않은 이미지 크기 합이 R2_PREFETCH_MAX_BYTES를 넘으면 더 읽지 않음
+    - 읽지 못한 항목은 예외 객체로 내보내고 해당 페이지만 실패 처리
+    """
+    
+    def __init__(self, entries: list, env):
+        self.entries = entries
+        self.count = len(entries)
+        self.bucket = getattr(env, 'R2_SUPERPLACESTUDY', None)
+        self.concurrency = max(1, get_env_int(env, 'R2_FETCH_CONCURRENCY', R2_FETCH_CONCURRENCY))
+        self.max_bytes = get_env_int(env, 'R2_PREFETCH_MAX_BYTES', R2_PREFETCH_MAX_BYTES)
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    async def load(self, entry):
+        if isinstance(entry, PageImage):
+            return entry
+        key = entry.get('r2Key') if isinstance(entry, dict) else None
+        if not isinstance(key, str) or not key:
+            raise ValueError("images 항목은 base64 문자열 또는 {\"r2Key\": \"...\"} 이어야 합니다.")
+        if self.bucket is None:
+            raise ValueError("R2_SUPERPLACESTUDY 바인딩이 없습니다.")
+        return await load_r2_image(self.bucket, key)
+    
+    def buffered_bytes(self, window) -> int:
+        return sum(task.result().size for task in window if task.done() and not task.exception())
+    
+    async def __aiter__(self):
+        entries = self.entries
+        self.entries = []
+        window = []
+        try:
+            while entries or window:
+                while entries and len(window) < self.concurrency and \
+                        (not window or self.buffered_bytes(window) < self.max_bytes):
+                    window.append(asyncio.ensure_future(self.load(entries.pop(0))))
+                task = window.pop(0)
+                try:
+                    image = await task
+                except Exception as e:
+                    image = e
+                yield image
+        finally:
+            for task in window:
+                task.cancel()
+
+
+def provider_body(payload: dict):
+    """
+    provider 요청 본문: payload 안의 PageImage/PageImageUrl 자리에 이미지 Blob을 이어 붙인 Blob
+    이미지가 없으면 json.dumps 문자열 그대로 (재시도할 때도 같은 본문을 다시 사용)
+    """
+    images = []
+    
+    def placeholder(value):
+        if not isinstance(value, (PageImage, PageImageUrl)):
+            raise TypeError(f"JSON으로 변환할 수 없는 값: {type(value).__name__}")
+        images.append(value)
+        return f"{IMAGE_PLACEHOLDER}{len(images) - 1}@@"
+    
+    text = json.dumps(payload, default=placeholder)
+    if not images:
+        return text
+    
+    pieces = IMAGE_PLACEHOLDER_PATTERN.split(text)
+    parts = [pieces[0]]
+    for index, after in zip(pieces[1::2], pieces[2::2]):
+        value = images[int(index)]
+        if isinstance(value, PageImageUrl):
+            parts.append(f"data:{value.image.mime_type};base64,")
+            value = value.image
+        parts.append(value.blob)
+        parts.append(after)
+    return Blob.new(to_js(parts))
+
+
+def new_page(idx: int, image: PageImage) -> dict:
+    """
+    파이프라인에서 사용하는 페이지 상태 (처리가 끝나면 그대로 결과가 됨)
+    """
+    return {
+        'imageIndex': idx,
+        'image': image,
+        'ocrText': '',
+        'subject': 'other',
+        'subjectConfidence': 0.0,
+        'calculation': None,
+        'ragContext': [],
+        'grading': None,
+    }
+
+
+async def run_grading_pipeline(images, options: dict, stage_concurrency: dict, env, on_result=None) -> list:
+    """
+    모든 페이지를 단계 파이프라인으로 처리하고 imageIndex 순서로 결과 반환
+    images가 async iterator(multipart 업로드, R2 객체)면 이미지가 도착하는 대로 OCR 시작
+    한 페이지가 실패해도 나머지 페이지 결과는 그대로 반환
+    on_result가 있으면 페이지가 끝나는 대로 전달하고 결과를 모아두지 않음
+    """
+    async def emit(page):
+        page.pop('image', None)
+        await on_result(page)
+    
+    pipeline = StagePipeline(
+        build_grading_stages(options, stage_concurrency, env),
+        admission=get_isolate_semaphore(env),
+        on_result=emit if on_result else None,
+        keep_results=on_result is None,
+    )
+    
+    if isinstance(images, list):
+        pages = [new_page(idx, image) for idx, image in enumerate(images)]
+        # 이미지 Blob은 페이지 상태에서만 참조 (OCR이 끝나면 바로 해제되도록)
+        images.clear()
+    else:
+        async def upload_pages():
+            idx = 0
+            async for image in images:
+                page = new_page(idx, image)
+                if isinstance(image, Exception):
+                    # 읽지 못한 이미지 (R2 객체 없음 등)는 그 페이지만 실패
+                    page.pop('image')
+                    mark_page_failed(page, 'input', image)
+                yield page
+                idx += 1
+        pages = upload_pages()
+    
+    results = await pipeline.run(pages)
+    for page in results:
+        page.pop('image', None)
+    return sorted(results, key=lambda r: r['imageIndex'])
+
+
+STREAM_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream',
+}
+
+
+def get_stream_format(requested, accept: str):
+    """
+    스트리밍 형식 결정: 요청 본문 stream ('ndjson' / 'sse' / true) 또는 Accept 헤더
+    """
+    if isinstance(requested, str) and requested.lower() in STREAM_CONTENT_TYPES:
+        return requested.lower()
+    if requested is True:
+        return 'ndjson'
+    
+    accept = (accept or '').lower()
+    for stream_format, content_type in STREAM_CONTENT_TYPES.items():
+        if content_type in accept:
+            return stream_format
+    return None
+
+
+def summarize_results(results: list) -> dict:
+    """
+    전체 페이지 채점 요약 (스트리밍 마지막 레코드 등에 사용)
+    """
+    summary = {
+        'pageCount': 0,
+        'failedPages': [],
+        'timedOutPages': [],
+        'totalQuestions': 0,
+        'correctAnswers': 0,
+    }
+    for page in results:
+        add_to_summary(summary, page)
+    return summary
+
+
+def add_to_summary(summary: dict, page: dict):
+    summary['pageCount'] += 1
+    if page.get('error'):
+        summary['failedPages'].append(page['imageIndex'])
+    if page.get('timedOut'):
+        summary['timedOutPages'].append(page['imageIndex'])
+    grading = page.get('grading') or {}
+    try:
+        summary['totalQuestions'] += int(grading.get('totalQuestions', 0) or 0)
+        summary['correctAnswers'] += int(grading.get('correctAnswers', 0) or 0)
+    except (TypeError, ValueError):
+        pass
+
+
+def format_stream_record(stream_format: str, event: str, data: dict) -> str:
+    """
+    스트리밍 레코드 한 줄: NDJSON은 {"type": ..., ...}, SSE는 event/data 블록
+    """
+    if stream_format == 'sse':
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    return json.dumps({'type': event, **data}, ensure_ascii=False) + "\n"
+
+
+class StreamClosed(Exception):
+    """
+    클라이언트가 연결을 끊어 스트림에 더 쓸 수 없음
+    """
+
+
+def start_streaming_response(stream_format: str, images: list, options: dict, stage_concurrency: dict,
+                             env, ctx, headers: dict):
+    """
+    페이지 결과를 끝나는 대로 NDJSON/SSE로 보내는 응답 반환
+    처리는 백그라운드에서 계속되고, 마지막에 summary 레코드를 보낸 뒤 스트림을 닫음
+    """
+    stream = TransformStream.new()
+    writer = stream.writable.getWriter()
+    encoder = TextEncoder.new()
+    summary = summarize_results([])
+    
+    async def write(event, data):
+        try:
+            await writer.write(encoder.encode(format_stream_record(stream_format, event, data)))
+        except Exception as e:
+            raise StreamClosed(str(e)) from e
+    
+    async def on_result(page):
+        add_to_summary(summary, page)
+        print(f"📤 [{page['imageIndex'] + 1}] 결과 전송")
+        # 쓰기에 실패하면 StreamClosed가 파이프라인을 멈춤 (남은 페이지는 처리하지 않음)
+        await write('page', page)
+    
+    async def run():
+        closed = False
+        try:
+            await run_grading_pipeline(images, options, stage_concurrency, env, on_result=on_result)
+            print(f"🎉 전체 채점 완료: {summary['pageCount']}개 이미지")
+            await write('summary', {'success': True, **summary})
+        except StreamClosed as e:
+            closed = True
+            print(f"⚠️ 클라이언트 연결 종료로 스트리밍 중단 ({summary['pageCount']}개 전송): {str(e)}")
+        except Exception as e:
+            print(f"❌ 스트리밍 채점 오류: {str(e)}")
+            try:
+                await write('summary', {'success': False, 'error': str(e), **summary})
+            except StreamClosed:
+                closed = True
+        finally:
+            if not closed:
+                try:
+                    await writer.close()
+                except Exception as e:
+                    print(f"⚠️ 스트림 닫기 실패: {str(e)}")
+    
+    task = asyncio.ensure_future(run())
+    if ctx is not None and hasattr(ctx, 'waitUntil'):
+        ctx.waitUntil(task)
+    
+    stream_headers = dict(headers)
+    stream_headers['Content-Type'] = STREAM_CONTENT_TYPES[stream_format]
+    stream_headers['Cache-Control'] = 'no-cache'
+    return Response.new(stream.readable, headers=stream_headers)
+
+
+JOB_STATUS_PATH = re.compile(r'^/grade/jobs/([\w-]+)/?$')
+
+_job_tables_ready = False
+
+
+def kst_timestamp() -> str:
+    """
+    KST 기준 'YYYY-MM-DD HH:MM:SS' (Pages 앱의 homework API와 같은 형식)
+    """
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(time.time() + 9 * 60 * 60))
+
+
+def to_py(value):
+    """
+    JS 객체(D1 결과 등)를 Python 값으로 변환
+    """
+    return value.to_py() if hasattr(value, 'to_py') else value
+
+
+def d1_statement(env, sql: str, params: tuple):
+    # D1은 undefined를 바인딩할 수 없으므로 None은 null로
+    return env.DB.prepare(sql).bind(*[jsnull if p is None else p for p in params])
+
+
+async def d1_run(env, sql: str, *params):
+    return await d1_statement(env, sql, params).run()
+
+
+async def d1_first(env, sql: str, *params):
+    row = await d1_statement(env, sql, params).first()
+    return to_py(row) if row else None
+
+
+async def d1_all(env, sql: str, *params) -> list:
+    result = to_py(await d1_statement(env, sql, params).all())
+    return result.get('results', []) if result else []
+
+
+async def add_missing_columns(env, table: str, columns: dict):
+    """
+    테이블에 컬럼이 없으면 추가 (migrations/005_python_worker_grading_jobs.sql을 아직 적용하지 않은 DB용)
+    이미 있는 컬럼의 'duplicate column' 오류만 무시하고 나머지 오류는 그대로 올림
+    """
+    for name, column_type in columns.items():
+        try:
+            await d1_run(env, f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+            print(f"✅ {table}.{name} 컬럼 추가")
+        except Exception as e:
+            if 'duplicate column' not in str(e).lower():
+                raise
+
+
+async def ensure_job_tables(env):
+    """
+    비동기 채점 작업에 필요한 컬럼 확인 (isolate당 한 번)
+    작업 상태는 homework_submissions, 페이지별 결과는 homework_gradings에 저장
+    """
+    global _job_tables_ready
+    if _job_tables_ready:
+        return
+    
+    await add_missing_columns(env, 'homework_submissions', {
+        'userName': 'TEXT',
+        'academyId': 'INTEGER',
+        'imageUrl': 'TEXT',
+        'status': 'TEXT',
+        'pageCount': 'INTEGER',
+        'score': 'INTEGER',
+        'gradingResult': 'TEXT',
+        'gradedAt': 'TEXT',
+    })
+    await add_missing_columns(env, 'homework_gradings', {
+        'pageIndex': 'INTEGER',
+        'result': 'TEXT',
+        'gradedBy': 'TEXT',
+        'model': 'TEXT',
+    })
+    _job_tables_ready = True
+
+
+def grading_score(grading: dict) -> int:
+    """
+    정답 수 / 문제 수 → 0-100점
+    """
+    try:
+        total = int(grading.get('totalQuestions', 0) or 0)
+        correct = int(grading.get('correctAnswers', 0) or 0)
+    except (TypeError, ValueError, AttributeError):
+        return 0
+    return round(correct * 100 / total) if total > 0 else 0
+
+
+async def save_job_page(job_id: str, user_id, model: str, page: dict, env):
+    """
+    페이지 하나의 채점 결과를 homework_gradings에 저장
+    """
+    grading = page.get('grading') or {}
+    await d1_run(env, """
+        INSERT OR REPLACE INTO homework_gradings
+            (id, submissionId, userId, pageIndex, score, feedback, strengths, suggestions, result, gradedAt, gradedBy, model)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'PYTHON_WORKER', ?)
+    """,
+        f"{job_id}-page-{page['imageIndex']}",
+        job_id,
+        str(user_id) if user_id is not None else '',
+        page['imageIndex'],
+        grading_score(grading),
+        grading.get('overallFeedback', page.get('error', '')),
+        grading.get('strengths', ''),
+        grading.get('improvements', ''),
+        json.dumps(page, ensure_ascii=False),
+        kst_timestamp(),
+        model,
+    )
+
+
+async def run_grading_job(job_id: str, user_id, images: list, options: dict, stage_concurrency: dict, env):
+    """
+    백그라운드 채점: 페이지가 끝날 때마다 저장하고 마지막에 작업 상태 갱신
+    """
+    summary = summarize_results([])
+    
+    async def on_result(page):
+        add_to_summary(summary, page)
+        try:
+            await save_job_page(job_id, user_id, options['model'], page, env)
+            print(f"💾 [{page['imageIndex'] + 1}] 작업 {job_id} 페이지 저장")
+        except Exception as e:
+            print(f"⚠️ 작업 {job_id} 페이지 저장 오류: {str(e)}")
+    
+    try:
+        await d1_run(env, "UPDATE homework_submissions SET status = 'processing' WHERE id = ?", job_id)
+        await run_grading_pipeline(images, options, stage_concurrency, env, on_result=on_result)
+        
+        if len(summary['failedPages']) == summary['pageCount']:
+            # 결과가 나온 페이지가 하나도 없으면 0점 'graded'가 아니라 실패로 기록
+            raise RuntimeError(f"모든 페이지 채점 실패 ({summary['pageCount']}장)")
+        
+        score = round(summary['correctAnswers'] * 100 / summary['totalQuestions']) if summary['totalQuestions'] else 0
+        await d1_run(env, """
+            UPDATE homework_submissions
+            SET status = 'graded', score = ?, gradingResult = ?, gradedAt = ?
+            WHERE id = ?
+        """, score, json.dumps(summary, ensure_ascii=False), kst_timestamp(), job_id)
+        print(f"🎉 작업 {job_id} 채점 완료: {summary['pageCount']}개 이미지")
+        
+    except Exception as e:
+        print(f"❌ 작업 {job_id} 채점 오류: {str(e)}")
+        try:
+            await d1_run(env, """
+                UPDATE homework_submissions
+                SET status = 'failed', gradingResult = ?, gradedAt = ?
+                WHERE id = ?
+            """, json.dumps({'error': str(e), **summary}, ensure_ascii=False), kst_timestamp(), job_id)
+        except Exception as db_error:
+            print(f"⚠️ 작업 {job_id} 상태 저장 오류: {str(db_error)}")
+
+
+async def submit_grading_job(body: dict, images: list, options: dict, stage_concurrency: dict,
+                             env, ctx, headers: dict):
+    """
+    비동기 채점 작업 등록: 작업 ID를 바로 반환하고 채점은 ctx.waitUntil로 백그라운드 실행
+    ctx가 없는 로컬 환경에서는 채점이 끝날 때까지 기다린 뒤 반환
+    """
+    if not hasattr(env, 'DB'):
+        return Response.json({'success': False, 'error': 'DB 바인딩이 없습니다.'}, status=500, headers=headers)
+    
+    await ensure_job_tables(env)
+    
+    job_id = f"homework-{int(time.time() * 1000)}-{uuid.uuid4().hex[:9]}"
+    user_id = body.get('userId')
+    await d1_run(env, """
+        INSERT INTO homework_submissions (id, userId, userName, academyId, imageUrl, status, pageCount, submittedAt)
+        VALUES (?, ?, ?, ?, '', 'queued', ?, ?)
+    """, job_id, str(user_id) if user_id is not None else '', body.get('userName', '학생'),
+        body.get('academyId'), len(images), kst_timestamp())
+    print(f"📥 비동기 채점 작업 등록: {job_id} ({len(images)}장)")
+    
+    page_count = len(images)
+    # 요청 응답 시간용 마감(GRADE_DEADLINE_MS)이 아니라 작업 마감을 씀 (기본은 마감 없음)
+    options = {**options, 'deadline': get_job_deadline(body.get('jobDeadlineMs'), env)}
+    task = run_grading_job(job_id, user_id, images, options, stage_concurrency, env)
+    if ctx is not None and hasattr(ctx, 'waitUntil'):
+        ctx.waitUntil(asyncio.ensure_future(task))
+    else:
+        # 로컬 개발 환경 (waitUntil 없음): 동기적으로 처리
+        await task
+    
+    return Response.json({
+        'success': True,
+        'jobId': job_id,
+        'status': 'queued',
+        'pageCount': page_count,
+        'statusUrl': f'/grade/jobs/{job_id}?' + urlencode(
+            {'userId': user_id if user_id is not None else '', 'academyId': body.get('academyId') or ''}),
+    }, status=202, headers=headers)
+
+
+async def get_grading_job(job_id: str, query: dict, env, headers: dict):
+    """
+    비동기 채점 작업 상태와 지금까지 끝난 페이지 결과 반환
+    작업을 등록한 학생(userId)과 학원(academyId)이 일치할 때만 조회 (다르면 없는 작업과 같이 404)
+    """
+    if not hasattr(env, 'DB'):
+        return Response.json({'success': False, 'error': 'DB 바인딩이 없습니다.'}, status=500, headers=headers)
+    
+    user_id = query.get('userId')
+    if not user_id:
+        return Response.json({'success': False, 'error': 'userId가 필요합니다.'}, status=400, headers=headers)
+    
+    await ensure_job_tables(env)
+    
+    job = await d1_first(env, """
+        SELECT id, status, pageCount, score, gradingResult, submittedAt, gradedAt
+        FROM homework_submissions
+        WHERE id = ? AND CAST(userId AS TEXT) = ? AND IFNULL(CAST(academyId AS TEXT), '') = ?
+    """, job_id, str(user_id), str(query.get('academyId') or ''))
+    if not job:
+        return Response.json({'success': False, 'error': '작업을 찾을 수 없습니다.'}, status=404, headers=headers)
+    
+    rows = await d1_all(env, """
+        SELECT result FROM homework_gradings
+        WHERE submissionId = ? ORDER BY pageIndex
+    """, job_id)
+    results = [json.loads(row['result']) for row in rows if row.get('result')]
+    
+    response = {
+        'success': True,
+        'jobId': job_id,
+        'status': job.get('status'),
+        'pageCount': job.get('pageCount'),
+        'completedPages': len(results),
+        'submittedAt': job.get('submittedAt'),
+        'gradedAt': job.get('gradedAt'),
+        'results': results,
+    }
+    if job.get('gradingResult'):
+        response['summary'] = json.loads(job['gradingResult'])
+        response['score'] = job.get('score')
+    
+    return Response.json(response, headers=headers)
+
+
+# 정답지 (학습지별, 학원 범위)
+ANSWER_KEY_PATH = re.compile(r'^/answer-keys(?:/([\w-]+))?/?$')
+ANSWER_KEY_TYPES = ('numeric', 'choice', 'short', 'expression', 'free')
+ANSWER_KEY_CACHE_SECONDS = 60    # isolate 안에서 정답지를 다시 읽지 않는 시간
+_answer_key_tables_ready = False
+_answer_keys = {}                # 조회 키 → (정답지, 만료 시각)
+
+
+async def ensure_answer_key_table(env):
+    """
+    정답지 테이블과 (학원, 학습지) 인덱스 확인 (isolate당 한 번)
+    """
+    global _answer_key_tables_ready
+    if _answer_key_tables_ready:
+        return
+    
+    await d1_run(env, """
+        CREATE TABLE IF NOT EXISTS homework_answer_keys (
+            id TEXT PRIMARY KEY,
+            academyId TEXT NOT NULL DEFAULT '',
+            worksheetId TEXT NOT NULL,
+            title TEXT,
+            answers TEXT NOT NULL,
+            itemCount INTEGER,
+            createdAt TEXT,
+            updatedAt TEXT
+        )
+    """)
+    await d1_run(env, """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_homework_answer_keys_worksheet
+        ON homework_answer_keys (academyId, worksheetId)
+    """)
+    await d1_run(env, """
+        CREATE TABLE IF NOT EXISTS worksheet_templates (
+            id TEXT PRIMARY KEY,
+            answerKeyId TEXT NOT NULL,
+            academyId TEXT NOT NULL DEFAULT '',
+            worksheetId TEXT NOT NULL,
+            pageNumber INTEGER NOT NULL,
+            signature TEXT NOT NULL,
+            questionNumbers TEXT,
+            createdAt TEXT
+        )
+    """)
+    await d1_run(env, """
+        CREATE INDEX IF NOT EXISTS idx_worksheet_templates_academy ON worksheet_templates (academyId)
+    """)
+    _answer_key_tables_ready = True
+
+
+def parse_answer_items(answers) -> dict:
+    """
+    정답지 문항 정리: {"1": "7"}, {"1": {"answer": "7", "type": "numeric"}}, [{"questionNumber": 1, "answer": "7"}]
+    → {1: {"answer": "7", "type": ..., "alternatives": [...]}}
+    형식이 잘못되면 ValueError
+    """
+    if isinstance(answers, dict):
+        answers = [
+            {'questionNumber': number, **(item if isinstance(item, dict) else {'answer': item})}
+            for number, item in answers.items()
+        ]
+    if not isinstance(answers, list) or not answers:
+        raise ValueError('answers는 비어 있지 않은 목록이어야 합니다.')
+    
+    items = {}
+    for entry in answers:
+        if not isinstance(entry, dict) or entry.get('answer') in (None, ''):
+            raise ValueError('각 문항에는 answer가 있어야 합니다.')
+        try:
+            number = int(entry.get('questionNumber'))
+        except (TypeError, ValueError):
+            raise ValueError(f"잘못된 문항 번호: {entry.get('questionNumber')}")
+        item = {'answer': str(entry['answer'])}
+        if entry.get('type'):
+            if entry['type'] not in ANSWER_KEY_TYPES:
+                raise ValueError(f"type은 {', '.join(ANSWER_KEY_TYPES)} 중 하나여야 합니다.")
+            item['type'] = entry['type']
+        if entry.get('alternatives'):
+            item['alternatives'] = [str(alternative) for alternative in entry['alternatives']]
+        items[number] = item
+    return items
+
+
+async def save_answer_key(body: dict, env, headers: dict):
+    """
+    학습지 정답지 등록 (같은 학원 + 학습지면 덮어쓰기)
+    pages(빈 학습지의 쪽별 OCR 텍스트)가 있으면 학습지 템플릿 지문도 함께 저장
+    """
+    if not hasattr(env, 'DB'):
+        return Response.json({'success': False, 'error': 'DB 바인딩이 없습니다.'}, status=500, headers=headers)
+    
+    worksheet_id = body.get('worksheetId')
+    if not worksheet_id:
+        return Response.json({'success': False, 'error': 'worksheetId가 필요합니다.'}, status=400, headers=headers)
+    try:
+        items = parse_answer_items(body.get('answers'))
+    except ValueError as e:
+        return Response.json({'success': False, 'error': str(e)}, status=400, headers=headers)
+    pages = body.get('pages') or []
+    if not isinstance(pages, list) or not all(isinstance(text, str) and text.strip() for text in pages):
+        return Response.json({'success': False, 'error': 'pages는 쪽별 텍스트 목록이어야 합니다.'}, status=400, headers=headers)
+    
+    await ensure_answer_key_table(env)
+    
+    academy_id = str(body.get('academyId') or '')
+    answers_json = json.dumps({str(number): item for number, item in sorted(items.items())}, ensure_ascii=False)
+    now = kst_timestamp()
+    existing = await d1_first(env, "SELECT id FROM homework_answer_keys WHERE academyId = ? AND worksheetId = ?",
+                              academy_id, str(worksheet_id))
+    if existing:
+        answer_key_id = existing['id']
+        await d1_run(env, """
+            UPDATE homework_answer_keys SET title = ?, answers = ?, itemCount = ?, updatedAt = ? WHERE id = ?
+        """, body.get('title'), answers_json, len(items), now, answer_key_id)
+    else:
+        answer_key_id = f"answer-key-{int(time.time() * 1000)}-{uuid.uuid4().hex[:9]}"
+        await d1_run(env, """
+            INSERT INTO homework_answer_keys (id, academyId, worksheetId, title, answers, itemCount, createdAt, updatedAt)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, answer_key_id, academy_id, str(worksheet_id), body.get('title'), answers_json, len(items), now, now)
+    
+    if pages:
+        await d1_run(env, "DELETE FROM worksheet_templates WHERE answerKeyId = ?", answer_key_id)
+        for page_number, text in enumerate(pages, start=1):
+            await d1_run(env, """
+                INSERT INTO worksheet_templates
+                    (id, answerKeyId, academyId, worksheetId, pageNumber, signature, questionNumbers, createdAt)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, f"{answer_key_id}-page-{page_number}", answer_key_id, academy_id, str(worksheet_id), page_number,
+                json.dumps(worksheet_signature(text)),
+                json.dumps([unit['number'] for unit in split_questions(text)]), now)
+    
+    _answer_keys.clear()
+    _worksheet_indexes.pop(academy_id, None)
+    print(f"📝 정답지 저장: {answer_key_id} ({len(items)}문항, 템플릿 {len(pages)}쪽)")
+    return Response.json({
+        'success': True,
+        'answerKeyId': answer_key_id,
+        'worksheetId': worksheet_id,
+        'itemCount': len(items),
+        'templatePages': len(pages),
+        'updatedAt': now,
+    }, headers=headers)
+
+
+async def get_answer_key(answer_key_id: str, env, headers: dict):
+    """
+    정답지 조회
+    """
+    if not hasattr(env, 'DB'):
+        return Response.json({'success': False, 'error': 'DB 바인딩이 없습니다.'}, status=500, headers=headers)
+    
+    await ensure_answer_key_table(env)
+    
+    row = await d1_first(env, "SELECT * FROM homework_answer_keys WHERE id = ?", answer_key_id)
+    if not row:
+        return Response.json({'success': False, 'error': '정답지를 찾을 수 없습니다.'}, status=404, headers=headers)
+    
+    return Response.json({'success': True, **row, 'answers': json.loads(row['answers'])}, headers=headers)
+
+
+async def load_answer_key(env, answer_key_id, worksheet_id, academy_id) -> dict:
+    """
+    채점에 쓸 정답지 읽기 (ID 또는 학원 + 학습지 ID), 없으면 None
+    반환: {'id', 'version', 'answers': {문항 번호: 문항}}
+    """
+    if not hasattr(env, 'DB'):
+        return None
+    
+    lookup = str(answer_key_id) if answer_key_id else f"{academy_id or ''}/{worksheet_id}"
+    cached = _answer_keys.get(lookup)
+    if cached and cached[1] > time.time():
+        return cached[0]
+    
+    await ensure_answer_key_table(env)
+    
+    if answer_key_id:
+        row = await d1_first(env, "SELECT id, answers, updatedAt FROM homework_answer_keys WHERE id = ?",
+                             str(answer_key_id))
+    else:
+        row = await d1_first(env, """
+            SELECT id, answers, updatedAt FROM homework_answer_keys WHERE academyId = ? AND worksheetId = ?
+        """, str(academy_id or ''), str(worksheet_id))
+    if not row:
+        return None
+    
+    answer_key = {
+        'id': row['id'],
+        'version': f"{row['id']}@{row['updatedAt']}",
+        'answers': {int(number): item for number, item in json.loads(row['answers']).items()},
+    }
+    _answer_keys[lookup] = (answer_key, time.time() + ANSWER_KEY_CACHE_SECONDS)
+    return answer_key
+
+
+# 수치 답: "3/4", "-0.5", "1,200원", "x=3", "2분의 1", "1 1/2"
+MIXED_NUMBER = re.compile(r'^(-?)(\d+)\s+(\d+)\s*/\s*(\d+)(.*)$')
+KOREAN_FRACTION = re.compile(r'^(-?\d+)분의(-?\d+)(.*)$')
+PLAIN_NUMBER = re.compile(r'^(-?\d[\d,]*(?:\.\d+)?(?:/\d+)?)(.*)$')
+ANSWER_UNIT = re.compile(r'^[a-z가-힣°%²³]{0,4}$')
+THOUSANDS_NUMBER = re.compile(r'^-?\d{1,3}(?:,\d{3})+(?:\.\d+)?(?:/\d+)?$')
+# 객관식 답: "3", "(3)", "③", "b", "ㄴ"
+# normalize_answer(NFKC)를 거치면 호환 자모 ㄱ(U+3131)이 첫소리 자모 ᄀ(U+1100)로 바뀌므로 둘 다 허용
+CHOICE_ANSWER = re.compile(r'^\(?([1-9]|[a-e]|[ㄱ-ㅎ\u1100-\u1112])\)?\.?$')
+
+
+def normalize_answer(text: str) -> str:
+    """
+    답 비교용 정규화: 전각/원문자(①) → 일반 문자, 연속 공백 → 한 칸, 소문자, 끝의 마침표 제거
+    (공백을 없애면 "1 2"와 "12"가 같아지므로 줄이기만 함)
+    """
+    text = unicodedata.normalize('NFKC', str(text)).replace('⁄', '/')
+    return ' '.join(text.split()).lower().rstrip('.').rstrip()
+
+
+def parse_numeric_answer(text: str):
+    """
+    수치 답을 (Fraction, 단위)로, 수치가 아니면 None
+    숫자 사이 공백("1 2")이나 세 자리씩 끊기지 않은 쉼표("1,2")는 수치로 보지 않음
+    """
+    text = unicodedata.normalize('NFKC', str(text)).replace('⁄', '/').strip().lower()
+    
+    mixed = MIXED_NUMBER.match(text)
+    if mixed:
+        sign, whole, numerator, denominator, unit = mixed.groups()
+        if int(denominator) == 0:
+            return None
+        value = int(whole) + Fraction(int(numerator), int(denominator))
+        return (-value if sign else value), re.sub(r'\s+', '', unit)
+    
+    # "x = 3", "3 / 4", "5 cm", "- 3", "2분의 1"의 공백만 없앰
+    text = re.sub(r'\s*([=/])\s*', r'\1', text)
+    text = re.sub(r'(?<=\d)\s+(?=[^\d\s,.])|(?<=[^\d\s,.])\s+(?=\d)', '', text)
+    if re.search(r'\s', text):
+        return None
+    text = re.sub(r'^[a-z]=', '', text)
+    try:
+        korean = KOREAN_FRACTION.match(text)
+        if korean:
+            denominator, numerator, unit = korean.groups()
+            value = Fraction(int(numerator), int(denominator))
+        else:
+            plain = PLAIN_NUMBER.match(text)
+            if not plain:
+                return None
+            number, unit = plain.groups()
+            if ',' in number and not THOUSANDS_NUMBER.match(number):
+                return None
+            value = Fraction(number.replace(',', ''))
+    except (ValueError, ZeroDivisionError):
+        return None
+    
+    return (value, unit) if ANSWER_UNIT.match(unit) else None
+
+
+def choice_answer(text: str):
+    match = CHOICE_ANSWER.match(normalize_answer(text).replace(' ', ''))
+    return match.group(1) if match else None
+
+
+def infer_answer_type(answer: str) -> str:
+    if parse_numeric_answer(answer) is not None:
+        return 'numeric'
+    if choice_answer(answer) is not None:
+        return 'choice'
+    if is_symbolic_text(normalize_symbolic(answer)) and SYMBOLIC_VARIABLE.search(normalize_symbolic(answer)):
+        return 'expression'
+    return 'text'
+
+
+def check_answer(student_answer: str, item: dict):
+    """
+    학생 답을 정답지 문항과 로컬 비교
+    True/False: 확실히 판정, None: 판단할 수 없음 (서술형, 답을 못 읽음, 단위가 다름 등 → LLM)
+    """
+    if item is None or item.get('type') == 'free':
+        return None
+    student_answer = (student_answer or '').strip()
+    if not student_answer:
+        return None
+    
+    expected = [item['answer'], *item.get('alternatives', [])]
+    normalized = normalize_answer(student_answer)
+    if any(normalized == normalize_answer(answer) for answer in expected):
+        return True
+    
+    answer_type = item.get('type') or infer_answer_type(item['answer'])
+    student = parse_numeric_answer(student_answer) if answer_type == 'numeric' else None
+    if student is not None:
+        for answer in expected:
+            correct = parse_numeric_answer(answer)
+            if correct is None:
+                continue
+            if student[1] and correct[1] and student[1] != correct[1]:
+                return None
+            if student[0] == correct[0]:
+                # 정답에 단위가 있는데 학생이 단위를 빠뜨렸으면 감점 여부는 LLM 판단 ("1200" vs "1200원")
+                return None if correct[1] and not student[1] else True
+        return False
+    
+    # "3"처럼 숫자인 객관식 정답에 "(2)", "②"로 답한 경우도 객관식으로 비교
+    if answer_type == 'choice' or (answer_type == 'numeric' and choice_answer(item['answer']) is not None):
+        student = choice_answer(student_answer)
+        if student is None:
+            return None
+        return any(choice_answer(answer) == student for answer in expected)
+    
+    # 식 답은 기호 연산으로 동치 비교 (2(x + 1) = 2x + 2)
+    if answer_type == 'expression':
+        verdicts = [symbolic_equivalent(student_answer, answer) for answer in expected]
+        return True if True in verdicts else (False if verdicts and None not in verdicts else None)
+    
+    # 단답형으로 지정된 문항만 불일치를 오답 처리 (그 외 텍스트 답은 동의어 등이 있을 수 있어 LLM 판단)
+    return False if answer_type == 'short' else None
+
+
+# 학습지 지문 (one-permutation MinHash + LSH)
+WORKSHEET_SHINGLE_SIZE = 5          # 글자 단위 shingle 길이
+WORKSHEET_SIGNATURE_BINS = 64       # 서명 길이 (bin 수)
+WORKSHEET_LSH_BANDS = 16            # LSH band 수 (band당 4개 bin)
+WORKSHEET_MATCH_THRESHOLD = 0.5     # 추정 Jaccard 유사도가 이 이상이면 같은 학습지
+WORKSHEET_INDEX_TTL_SECONDS = 300   # isolate 안에서 템플릿 목록을 다시 읽지 않는 시간
+EMPTY_BIN = 0xFFFFFFFF
+_worksheet_indexes = {}             # 학원 ID → (WorksheetIndex, 만료 시각)
+
+
+def printed_text(ocr_text: str) -> str:
+    """
+    지문에 쓸 인쇄된 부분: 문항으로 나뉘면 학생 답을 뺀 문제 부분만, 아니면 전체
+    공백 제거 + NFKC + 소문자로 정규화
+    """
+    units = split_questions(ocr_text)
+    text = ''.join(f"{unit['number']}.{unit['question']}" for unit in units) if units else ocr_text
+    return normalize_answer(text).replace(' ', '')
+
+
+def worksheet_signature(ocr_text: str) -> list:
+    """
+    글자 shingle의 CRC32를 bin에 나눠 bin별 최솟값을 남기는 one-permutation MinHash
+    (shingle마다 해시 한 번이라 페이지 하나에 수백 µs 수준)
+    """
+    text = printed_text(ocr_text)
+    signature = [EMPTY_BIN] * WORKSHEET_SIGNATURE_BINS
+    for i in range(max(1, len(text) - WORKSHEET_SHINGLE_SIZE + 1)):
+        h = zlib.crc32(text[i:i + WORKSHEET_SHINGLE_SIZE].encode('utf-8'))
+        b = h % WORKSHEET_SIGNATURE_BINS
+        if h < signature[b]:
+            signature[b] = h
+    return signature
+
+
+def signature_similarity(a: list, b: list) -> float:
+    """
+    두 서명의 추정 Jaccard 유사도 (둘 다 빈 bin은 제외)
+    """
+    compared = same = 0
+    for x, y in zip(a, b):
+        if x == EMPTY_BIN and y == EMPTY_BIN:
+            continue
+        compared += 1
+        same += x == y
+    return same / compared if compared else 0.0
+
+
+class WorksheetIndex:
+    """
+    학원의 학습지 템플릿 지문 색인
+    LSH band가 하나라도 같은 템플릿만 후보로 골라 유사도를 계산
+    """
+    
+    def __init__(self, templates: list):
+        self.templates = templates
+        self.bands = {}
+        for position, template in enumerate(templates):
+            for key in self.band_keys(template['signature']):
+                self.bands.setdefault(key, []).append(position)
+    
+    @staticmethod
+    def band_keys(signature: list) -> list:
+        rows = WORKSHEET_SIGNATURE_BINS // WORKSHEET_LSH_BANDS
+        keys = []
+        for band in range(WORKSHEET_LSH_BANDS):
+            values = tuple(signature[band * rows:(band + 1) * rows])
+            if any(value != EMPTY_BIN for value in values):
+                keys.append((band, values))
+        return keys
+    
+    def match(self, signature: list):
+        """
+        가장 비슷한 템플릿과 유사도, 기준 미만이면 None
+        """
+        candidates = {position for key in self.band_keys(signature) for position in self.bands.get(key, ())}
+        best, best_similarity = None, WORKSHEET_MATCH_THRESHOLD
+        for position in candidates:
+            similarity = signature_similarity(signature, self.templates[position]['signature'])
+            if similarity >= best_similarity:
+                best, best_similarity = self.templates[position], similarity
+        return (best, best_similarity) if best else None
+
+
+async def get_worksheet_index(env, academy_id) -> WorksheetIndex:
+    """
+    학원의 학습지 템플릿 색인 (D1에서 읽어 isolate에 캐시)
+    """
+    academy_key = str(academy_id or '')
+    cached = _worksheet_indexes.get(academy_key)
+    if cached and cached[1] > time.time():
+        return cached[0]
+    
+    await ensure_answer_key_table(env)
+    rows = await d1_all(env, """
+        SELECT answerKeyId, worksheetId, pageNumber, signature, questionNumbers
+        FROM worksheet_templates WHERE academyId = ?
+    """, academy_key)
+    index = WorksheetIndex([{
+        **row,
+        'signature': json.loads(row['signature']),
+        'questionNumbers': json.loads(row.get('questionNumbers') or '[]'),
+    } for row in rows])
+    _worksheet_indexes[academy_key] = (index, time.time() + WORKSHEET_INDEX_TTL_SECONDS)
+    return index
+
+
+# 회로 차단기 기본값 (provider + endpoint별, isolate 안에서 공유)
+BREAKER_WINDOW = 20              # 최근 N개 호출 결과로 오류율 계산
+BREAKER_MIN_CALLS = 5            # 이보다 적으면 차단하지 않음
+BREAKER_ERROR_RATE = 50          # 오류율(%)이 이 이상이면 차단
+BREAKER_SLOW_CALL_MS = 20000     # 이보다 느린 호출은 실패로 계산
+BREAKER_PROBE_INTERVAL_MS = 30000  # 차단 후 이 시간이 지나면 시험 호출 1회 허용
+
+
+class CircuitBreaker:
+    """
+    provider/endpoint별 회로 차단기 (closed → open → half_open → closed)
+    
+    - closed: 모든 호출 허용, 최근 호출의 오류율이 임계값을 넘으면 open
+    - open: 호출 차단 (바로 다른 provider 사용), probe_interval이 지나면 half_open
+    - half_open: 시험 호출 하나만 허용, 성공하면 closed / 실패하면 다시 open
+    """
+    
+    def __init__(self, name: str, window: int = BREAKER_WINDOW, min_calls: int = BREAKER_MIN_CALLS,
+                 error_rate: int = BREAKER_ERROR_RATE, slow_call_ms: int = BREAKER_SLOW_CALL_MS,
+                 probe_interval_ms: int = BREAKER_PROBE_INTERVAL_MS):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_ms = slow_call_ms
+        self.probe_interval = probe_interval_ms / 1000
+        self.state = 'closed'
+        self.outcomes = []          # 최근 호출 실패 여부 (True = 실패)
+        self.opened_at = None
+        self.probe_started_at = None
+        self.latency = LatencyWindow(window)
+        self.stats = {'calls': 0, 'failures': 0, 'slowCalls': 0, 'rejected': 0, 'opened': 0}
+    
+    def allow(self) -> bool:
+        """
+        지금 이 provider를 호출해도 되는지 (False면 다른 provider로 바로 넘어감)
+        """
+        now = time.time()
+        if self.state == 'open' and now - self.opened_at >= self.probe_interval:
+            self.state = 'half_open'
+            self.probe_started_at = None
+        
+        if self.state == 'half_open':
+            # 시험 호출은 하나만 (응답 없이 취소된 시험 호출은 probe_interval 뒤에 다시 허용)
+            if self.probe_started_at is None or now - self.probe_started_at >= self.probe_interval:
+                self.probe_started_at = now
+                return True
+        elif self.state == 'closed':
+            return True
+        
+        self.stats['rejected'] += 1
+        return False
+    
+    def record(self, ok: bool, elapsed_ms: float):
+        slow = elapsed_ms >= self.slow_call_ms
+        failed = not ok or slow
+        self.stats['calls'] += 1
+        self.stats['failures'] += 0 if ok else 1
+        self.stats['slowCalls'] += 1 if slow else 0
+        self.latency.record(elapsed_ms)
+        
+        if self.state != 'closed':
+            # 시험 호출 결과 (open 상태에서도 다른 대안이 없어 호출한 경우 결과를 그대로 반영)
+            if failed:
+                self.trip()
+            else:
+                print(f"✅ 회로 복구: {self.name}")
+                self.state = 'closed'
+                self.outcomes = []
+            return
+        
+        self.outcomes.append(failed)
+        if len(self.outcomes) > self.window:
+            self.outcomes.pop(0)
+        if len(self.outcomes) >= self.min_calls and \
+                sum(self.outcomes) * 100 >= self.error_rate * len(self.outcomes):
+            self.trip()
+    
+    def trip(self):
+        if self.state != 'open':
+            print(f"⚡ 회로 차단: {self.name}")
+            self.stats['opened'] += 1
+        self.state = 'open'
+        self.opened_at = time.time()
+        self.probe_started_at = None
+        self.outcomes = []
+    
+    def snapshot(self) -> dict:
+        return {
+            'state': self.state,
+            'recentErrorRate': round(sum(self.outcomes) * 100 / len(self.outcomes)) if self.outcomes else 0,
+            'recentCalls': len(self.outcomes),
+            'p90LatencyMs': self.latency.percentile(0.9),
+            'openedAt': self.opened_at,
+            **self.stats,
+        }
+
+
+_circuit_breakers = {}
+
+
+def get_circuit_breaker(provider: str, endpoint: str, env) -> CircuitBreaker:
+    """
+    provider/endpoint별 회로 차단기 (isolate 안의 모든 요청이 공유)
+    임계값은 BREAKER_* 환경 변수로 변경 가능
+    """
+    name = f"{provider}:{endpoint}"
+    if name not in _circuit_breakers:
+        _circuit_breakers[name] = CircuitBreaker(
+            name,
+            window=get_env_int(env, 'BREAKER_WINDOW', BREAKER_WINDOW),
+            min_calls=get_env_int(env, 'BREAKER_MIN_CALLS', BREAKER_MIN_CALLS),
+            error_rate=get_env_int(env, 'BREAKER_ERROR_RATE', BREAKER_ERROR_RATE),
+            slow_call_ms=get_env_int(env, 'BREAKER_SLOW_CALL_MS', BREAKER_SLOW_CALL_MS),
+            probe_interval_ms=get_env_int(env, 'BREAKER_PROBE_INTERVAL_MS', BREAKER_PROBE_INTERVAL_MS),
+        )
+    return _circuit_breakers[name]
+
+
+async def call_with_breaker(call, breaker: CircuitBreaker = None):
+    """
+    provider 호출 결과를 회로 차단기에 기록 (빈 응답과 예외는 실패, 취소는 기록하지 않음)
+    """
+    if breaker is None:
+        return await call()
+    
+    started = time.time()
+    try:
+        result = await call()
+    except Exception:
+        breaker.record(False, (time.time() - started) * 1000)
+        raise
+    breaker.record(result is not None, (time.time() - started) * 1000)
+    return result
+
+
+def get_diagnostics() -> dict:
+    """
+    isolate 상태 진단 정보 (회로 차단기, OCR 헤징 카운터, provider 재시도 카운터, 캐시)
+    """
+    return {
+        'circuitBreakers': {name: breaker.snapshot() for name, breaker in _circuit_breakers.items()},
+        'ocrHedge': dict(ocr_hedge_stats),
+        'providerRetries': dict(provider_retry_stats),
+        'caches': {name: cache.snapshot() for name, cache in _caches.items()},
+        'symbolicMath': {
+            **symbolic_stats,
+            'parseCache': parse_symbolic.cache_info()._asdict(),
+            'equivalenceCache': symbolic_equivalent.cache_info()._asdict(),
+        },
+        'subjectModel': dict(subject_model_stats),
+        'imagePreprocess': dict(image_preprocess_stats),
+    }
+
+
+# 마감 시간 설정
+DEFAULT_DEADLINE_MS = 120000      # 요청 전체 마감 시간 (요청 본문 deadlineMs 또는 GRADE_DEADLINE_MS로 변경)
+DEFAULT_JOB_DEADLINE_MS = 0       # 비동기 작업 마감 시간, 0이면 없음 (요청 본문 jobDeadlineMs 또는 GRADE_JOB_DEADLINE_MS)
+FALLBACK_MIN_BUDGET_MS = 2000     # 남은 시간이 이보다 적으면 폴백 provider를 시도하지 않음
+
+# 남은 시간을 단계별로 나누는 비율 (OCR과 채점은 LLM 호출, RAG는 짧은 검색)
+STAGE_BUDGET_SHARES = {
+    'ocr': 45,
+    'rag': 10,
+    'grade': 45,
+}
+
+
+class DeadlineExceeded(Exception):
+    """
+    요청 마감 시간(또는 단계 예산)을 넘김
+    """
+
+
+class Deadline:
+    """
+    요청 단위 마감 시각 (time.time() 기준 절대 시각)
+    단계별 예산은 남은 시간을 지금 단계와 이후 단계의 비율로 나눠서 계산
+    """
+    
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+    
+    @classmethod
+    def after_ms(cls, ms: int) -> 'Deadline':
+        return cls(time.time() + ms / 1000)
+    
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.time())
+    
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+    
+    def check(self, what: str):
+        if self.expired:
+            raise DeadlineExceeded(f"{what}: 마감 시간 초과")
+    
+    def for_stage(self, stage: str) -> 'Deadline':
+        """
+        이 단계가 쓸 수 있는 마감 시각 (이후 단계가 쓸 시간은 남겨둠)
+        """
+        stages = list(STAGE_BUDGET_SHARES)
+        if stage not in STAGE_BUDGET_SHARES:
+            return self
+        later = sum(STAGE_BUDGET_SHARES[name] for name in stages[stages.index(stage):])
+        share = STAGE_BUDGET_SHARES[stage] / later
+        return Deadline(time.time() + self.remaining() * share)
+    
+    def reserve(self, seconds: float) -> 'Deadline':
+        """
+        폴백에 쓸 시간(seconds)을 남긴 마감 시각 (단, 남은 시간의 절반은 보장)
+        """
+        remaining = self.remaining()
+        return Deadline(time.time() + max(remaining - seconds, remaining / 2))
+
+
+def get_deadline(requested, env):
+    """
+    요청 마감 시간: 요청 본문 deadlineMs > GRADE_DEADLINE_MS 환경 변수 > 기본값
+    """
+    try:
+        ms = int(requested) if requested is not None else get_env_int(env, 'GRADE_DEADLINE_MS', DEFAULT_DEADLINE_MS)
+    except (TypeError, ValueError):
+        ms = get_env_int(env, 'GRADE_DEADLINE_MS', DEFAULT_DEADLINE_MS)
+    return Deadline.after_ms(ms) if ms > 0 else None
+
+
+def get_job_deadline(requested, env):
+    """
+    비동기 작업 마감 시간: 요청 본문 jobDeadlineMs > GRADE_JOB_DEADLINE_MS 환경 변수 > 기본값 (없음)
+    작업은 응답을 먼저 보내므로 요청 마감 시간(deadlineMs)과 따로 둠
+    """
+    try:
+        ms = int(requested) if requested is not None else get_env_int(env, 'GRADE_JOB_DEADLINE_MS',
+                                                                       DEFAULT_JOB_DEADLINE_MS)
+    except (TypeError, ValueError):
+        ms = get_env_int(env, 'GRADE_JOB_DEADLINE_MS', DEFAULT_JOB_DEADLINE_MS)
+    return Deadline.after_ms(ms) if ms > 0 else None
+
+
+def stage_deadline(deadline: Deadline, stage: str):
+    """
+    단계 시작 시점에 마감 시간이 지났으면 DeadlineExceeded, 아니면 단계 예산 반환
+    """
+    if deadline is None:
+        return None
+    deadline.check(stage)
+    return deadline.for_stage(stage)
+
+
+def fallback_deadline(deadline: Deadline, env):
+    """
+    주 provider 호출에 쓸 마감 시각 (폴백 provider를 시도할 시간은 남겨둠)
+    폴백 최소 시간의 두 배를 남겨서, 주 provider가 시간 초과되어도 폴백은 시도할 수 있도록
+    """
+    if deadline is None:
+        return None
+    return deadline.reserve(2 * get_env_int(env, 'FALLBACK_MIN_BUDGET_MS', FALLBACK_MIN_BUDGET_MS) / 1000)
+
+
+def ensure_fallback_budget(deadline: Deadline, env, what: str):
+    """
+    폴백 provider를 시도할 시간이 남았는지 확인 (부족하면 DeadlineExceeded)
+    """
+    if deadline is None:
+        return
+    if deadline.remaining() * 1000 < get_env_int(env, 'FALLBACK_MIN_BUDGET_MS', FALLBACK_MIN_BUDGET_MS):
+        raise DeadlineExceeded(f"{what}: 폴백할 시간이 부족합니다")
+
+
+async def with_deadline(awaitable, deadline: Deadline, what: str):
+    """
+    마감 시각까지만 기다림 (넘으면 DeadlineExceeded)
+    """
+    if deadline is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, deadline.remaining())
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f"{what}: 마감 시간 초과")
+
+
+# 캐시 설정
+OCR_CACHE_MAX_BYTES = 8 * 1024 * 1024        # isolate 메모리 캐시 상한 (OCR 텍스트 크기 합)
+OCR_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60     # 캐시 유지 기간 (메모리/영구 저장소 공통)
+GRADING_CACHE_MAX_BYTES = 4 * 1024 * 1024    # 채점 결과 캐시 상한
+GRADING_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+GRADING_CACHE_MAX_TEMPERATURE = 0.5          # 이보다 높은 temperature는 결과가 매번 달라 캐시하지 않음
+VERDICT_CACHE_MAX_BYTES = 2 * 1024 * 1024    # 문항 판정 캐시 상한 (키 포함)
+VERDICT_MIN_UNITS = 2                        # 문항이 이보다 적게 나뉘면 페이지 단위로 채점
+
+
+class ByteLRUCache:
+    """
+    바이트 크기 상한이 있는 isolate 메모리 LRU 캐시 (항목별 TTL)
+    """
+    
+    def __init__(self, max_bytes: int, ttl_seconds: int):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()   # key → (value, size, expires_at)
+        self.bytes = 0
+        self.evictions = 0
+    
+    def get(self, key: str):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, size, expires_at = entry
+        if expires_at < time.time():
+            self.remove(key)
+            return None
+        self.entries.move_to_end(key)
+        return value
+    
+    def put(self, key: str, value, size: int, ttl_seconds: int = None):
+        if size > self.max_bytes:
+            return
+        self.remove(key)
+        self.entries[key] = (value, size, time.time() + (ttl_seconds or self.ttl_seconds))
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self.entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+    
+    def remove(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+
+class MemoryCacheStore:
+    """
+    영구 캐시 저장소의 로컬 대체 (DB 바인딩이 없는 로컬 개발/테스트용)
+    """
+    
+    def __init__(self):
+        self.values = {}
+    
+    async def get(self, key: str):
+        entry = self.values.get(key)
+        if entry is None or entry[1] < time.time():
+            return None
+        return entry[0]
+    
+    async def put(self, key: str, value: str, ttl_seconds: int):
+        self.values[key] = (value, time.time() + ttl_seconds)
+
+
+class D1CacheStore:
+    """
+    D1 테이블 기반 영구 캐시 저장소 (isolate가 바뀌어도 유지)
+    """
+    
+    def __init__(self, env, table: str):
+        self.env = env
+        self.table = table
+        self.ready = False
+    
+    async def ensure_table(self):
+        if self.ready:
+            return
+        await d1_run(self.env, f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expiresAt INTEGER NOT NULL
+            )
+        """)
+        self.ready = True
+    
+    async def get(self, key: str):
+        await self.ensure_table()
+        row = await d1_first(self.env, f"SELECT value FROM {self.table} WHERE key = ? AND expiresAt > ?",
+                             key, int(time.time()))
+        return row['value'] if row else None
+    
+    async def put(self, key: str, value: str, ttl_seconds: int):
+        await self.ensure_table()
+        await d1_run(self.env, f"INSERT OR REPLACE INTO {self.table} (key, value, expiresAt) VALUES (?, ?, ?)",
+                     key, value, int(time.time()) + ttl_seconds)
+
+
+class TieredCache:
+    """
+    isolate 메모리 LRU → 영구 저장소(D1 또는 로컬 대체) 2단계 캐시
+    영구 저장소 오류는 캐시 미스로 처리 (채점은 계속 진행)
+    """
+    
+    def __init__(self, name: str, memory: ByteLRUCache, store):
+        self.name = name
+        self.memory = memory
+        self.store = store
+        self.stats = {'memoryHits': 0, 'storeHits': 0, 'misses': 0, 'writes': 0, 'storeErrors': 0}
+    
+    async def get(self, key: str):
+        value = self.memory.get(key)
+        if value is not None:
+            self.stats['memoryHits'] += 1
+            return value
+        
+        try:
+            value = await self.store.get(key)
+        except Exception as e:
+            print(f"⚠️ {self.name} 캐시 저장소 조회 오류: {str(e)}")
+            self.stats['storeErrors'] += 1
+            value = None
+        
+        if value is None:
+            self.stats['misses'] += 1
+            return None
+        
+        self.stats['storeHits'] += 1
+        self.memory.put(key, value, len(key) + len(value.encode('utf-8')))
+        return value
+    
+    async def put(self, key: str, value: str, ttl_seconds: int = None):
+        self.stats['writes'] += 1
+        ttl_seconds = ttl_seconds or self.memory.ttl_seconds
+        self.memory.put(key, value, len(key) + len(value.encode('utf-8')), ttl_seconds)
+        try:
+            await self.store.put(key, value, ttl_seconds)
+        except Exception as e:
+            print(f"⚠️ {self.name} 캐시 저장소 저장 오류: {str(e)}")
+            self.stats['storeErrors'] += 1
+    
+    def snapshot(self) -> dict:
+        lookups = self.stats['memoryHits'] + self.stats['storeHits'] + self.stats['misses']
+        hits = self.stats['memoryHits'] + self.stats['storeHits']
+        return {
+            **self.stats,
+            'hitRate': round(hits * 100 / lookups) if lookups else 0,
+            'entries': len(self.memory.entries),
+            'bytes': self.memory.bytes,
+            'evictions': self.memory.evictions,
+        }
+
+
+_caches = {}
+
+
+def get_tiered_cache(name: str, table: str, env, max_bytes: int, ttl_seconds: int) -> TieredCache:
+    """
+    isolate 전체에서 공유하는 캐시 (DB 바인딩이 있으면 D1, 없으면 메모리 저장소)
+    """
+    if name not in _caches:
+        store = D1CacheStore(env, table) if hasattr(env, 'DB') else MemoryCacheStore()
+        _caches[name] = TieredCache(name, ByteLRUCache(max_bytes, ttl_seconds), store)
+    return _caches[name]
+
+
+def get_ocr_cache(env) -> TieredCache:
+    return get_tiered_cache(
+        'ocr', 'ocr_cache', env,
+        max_bytes=get_env_int(env, 'OCR_CACHE_MAX_BYTES', OCR_CACHE_MAX_BYTES),
+        ttl_seconds=get_env_int(env, 'OCR_CACHE_TTL_SECONDS', OCR_CACHE_TTL_SECONDS),
+    )
+
+
+# OCR 결과를 만든 모델 (캐시 키와 응답의 ocrModel)
+DEEPSEEK_OCR_MODEL = 'deepseek-chat'
+GEMINI_OCR_MODEL = 'gemini-2.5-flash-lite'
+
+
+def ocr_model_name(model: str, env) -> str:
+    """
+    요청한 모델로 OCR할 때 먼저 시도하는 모델 (ocr_with_llm의 라우팅과 같은 기준)
+    DeepSeek 모델이어도 API 키가 없으면 Gemini로 OCR
+    실제로 OCR한 모델은 회로 차단/헤지/폴백에 따라 다를 수 있음 (ocr_with_llm의 반환값)
+    """
+    model_name = model.split('/')[-1]
+    if 'deepseek' in model_name.lower() and get_deepseek_api_key(env):
+        return DEEPSEEK_OCR_MODEL
+    return GEMINI_OCR_MODEL
+
+
+def image_settings_id(settings: dict) -> str:
+    """
+    OCR 캐시 키에 넣을 이미지 전처리 설정 (꺼져 있으면 'off')
+    """
+    if not settings:
+        return 'off'
+    return f"{settings['min_bytes']}:{settings['max_dimension']}:{settings['quality']}:{int(settings['grayscale'])}"
+
+
+async def ocr_image_id(image: PageImage) -> str:
+    """
+    OCR 캐시 키의 이미지 식별값: cache_id(R2 ETag 등)가 있으면 그 값, 없으면 base64 본문의 SHA-256
+    (data URL 접두사는 키에 들어가지 않음, 해시는 JS Blob 스트림에서 계산)
+    """
+    return f"etag:{image.cache_id}" if image.cache_id else (await image.sha256()).hex()
+
+
+def ocr_cache_key(image_id: str, ocr_model: str, image_settings: dict) -> str:
+    """
+    OCR 캐시 키: 이미지 식별값 + 실제로 OCR한 모델 + 이미지 전처리 설정 + OCR 지시문의 SHA-256
+    """
+    digest = hashlib.sha256(image_id.encode('utf-8'))
+    digest.update(f"\0{ocr_model}\0{image_settings_id(image_settings)}\0{OCR_INSTRUCTION}".encode('utf-8'))
+    return f"ocr:{digest.hexdigest()}"
+
+
+def is_ocr_failure(text: str) -> bool:
+    """
+    OCR 함수가 반환하는 오류 안내 문구인지 (캐시하지 않음)
+    """
+    return not text or text in ("텍스트를 읽을 수 없습니다.", "OCR API 키가 설정되지 않았습니다.") \
+        or text.startswith("OCR 오류:")
+
+
+def get_grading_cache(env) -> TieredCache:
+    return get_tiered_cache(
+        'grading', 'grading_cache', env,
+        max_bytes=get_env_int(env, 'GRADING_CACHE_MAX_BYTES', GRADING_CACHE_MAX_BYTES),
+        ttl_seconds=get_env_int(env, 'GRADING_CACHE_TTL_SECONDS', GRADING_CACHE_TTL_SECONDS),
+    )
+
+
+def get_grading_cache_policy(env, academy_id) -> dict:
+    """
+    학원별 채점 캐시 설정
+    GRADING_CACHE_ACADEMIES 환경 변수(JSON)로 학원마다 덮어쓰기:
+    {"academy-1": {"enabled": false}, "academy-2": {"maxTemperature": 0.7, "ttlSeconds": 86400}}
+    """
+    max_temperature = getattr(env, 'GRADING_CACHE_MAX_TEMPERATURE', None)
+    policy = {
+        'enabled': True,
+        'max_temperature': float(max_temperature) if max_temperature not in (None, '') else GRADING_CACHE_MAX_TEMPERATURE,
+        'ttl_seconds': get_env_int(env, 'GRADING_CACHE_TTL_SECONDS', GRADING_CACHE_TTL_SECONDS),
+    }
+    
+    try:
+        overrides = json.loads(getattr(env, 'GRADING_CACHE_ACADEMIES', None) or '{}')
+    except ValueError:
+        print("⚠️ GRADING_CACHE_ACADEMIES 형식 오류 (JSON 객체여야 함)")
+        return policy
+    
+    academy = overrides.get(str(academy_id)) if academy_id is not None else None
+    if isinstance(academy, dict):
+        policy['enabled'] = bool(academy.get('enabled', policy['enabled']))
+        policy['max_temperature'] = float(academy.get('maxTemperature', policy['max_temperature']))
+        policy['ttl_seconds'] = int(academy.get('ttlSeconds', policy['ttl_seconds']))
+    return policy
+
+
+def grading_cache_key(ocr_text: str, calculation_result, rag_context: list, options: dict,
+                      answer_key: dict = None) -> str:
+    """
+    채점 캐시 키: 공백을 정규화한 OCR 텍스트, 계산 결과, 참고 자료(내용 해시),
+    프롬프트, 모델, temperature, 학원 ID, 정답지 버전을 정렬된 JSON으로 만든 뒤 SHA-256
+    """
+    canonical = json.dumps({
+        'ocrText': ' '.join(ocr_text.split()),
+        'calculation': calculation_result,
+        'ragContext': [hashlib.sha256(doc.encode('utf-8')).hexdigest()[:16] for doc in rag_context or []],
+        'systemPrompt': options['system_prompt'],
+        'model': options['model'],
+        'temperature': options['temperature'],
+        'academyId': options.get('academy_id'),
+        'answerKey': (answer_key or {}).get('version'),
+    }, ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str)
+    return f"grade:{hashlib.sha256(canonical.encode('utf-8')).hexdigest()}"
+
+
+def get_verdict_cache(env) -> TieredCache:
+    return get_tiered_cache(
+        'verdict', 'verdict_cache', env,
+        max_bytes=get_env_int(env, 'VERDICT_CACHE_MAX_BYTES', VERDICT_CACHE_MAX_BYTES),
+        ttl_seconds=get_env_int(env, 'GRADING_CACHE_TTL_SECONDS', GRADING_CACHE_TTL_SECONDS),
+    )
+
+
+# 문항 시작: "1.", "2)", "(3)", "[4]", "5번", "문제 6.", "Q7:"
+QUESTION_START = re.compile(r'^\s*(?:문제\s*|Q\s*)?[(\[]?(\d{1,3})\s*(?:[.:](?!\d)|[)\]]|번\s*[.)]?)\s*', re.IGNORECASE)
+# 학생 답 표시: "답: 7", "정답 : 7", "Answer: b"
+ANSWER_MARK = re.compile(r'(?:정답|답|answer|ans)\s*[:：)]\s*(.+)$', re.IGNORECASE | re.MULTILINE)
+
+
+def split_questions(ocr_text: str) -> list:
+    """
+    OCR 텍스트를 문항 단위(번호, 문제, 학생 답)로 분리
+    번호가 중복되는 등 문항 구분이 확실하지 않으면 빈 리스트
+    """
+    units = []
+    for line in ocr_text.splitlines():
+        match = QUESTION_START.match(line)
+        if match:
+            units.append({'number': int(match.group(1)), 'lines': [line.strip()]})
+        elif units and line.strip():
+            units[-1]['lines'].append(line.strip())
+    
+    if len({unit['number'] for unit in units}) != len(units):
+        return []
+    
+    for unit in units:
+        unit['text'] = '\n'.join(unit.pop('lines'))
+        body = QUESTION_START.sub('', unit['text'], count=1)
+        answer = ANSWER_MARK.search(body)
+        if answer:
+            # 답 표시 뒤의 줄(날짜, 쪽 번호 등)은 버림
+            unit['question'], unit['answer'] = body[:answer.start()], answer.group(1)
+        elif '=' in body:
+            unit['question'], _, unit['answer'] = body.rpartition('=')
+        else:
+            unit['question'], unit['answer'] = body, ''
+    return units
+
+
+def normalize_unit_text(text: str) -> str:
+    """
+    문항 비교용 정규화 (공백 제거, 소문자)
+    """
+    return re.sub(r'\s+', '', text).lower()
+
+
+def verdict_context(page: dict, answer_key: dict = None):
+    """
+    문항 판정 캐시 범위: 인식한 학습지 쪽 또는 정답지 (둘 다 없으면 None → 캐시 사용 안 함)
+    문항 줄만으로는 "1. 위 글의 내용과 일치하는 것은?"처럼 지문이 다른 학습지끼리 겹치므로
+    """
+    worksheet = page.get('worksheet')
+    if worksheet:
+        return f"worksheet:{worksheet['worksheetId']}:{worksheet['pageNumber']}:{worksheet['answerKeyId']}"
+    if answer_key:
+        return f"answerKey:{answer_key['version']}"
+    return None
+
+
+def verdict_cache_key(unit: dict, options: dict, context: str) -> str:
+    """
+    문항 판정 캐시 키: 학원 ID + 학습지(verdict_context) + 모델 + 프롬프트 + 정규화한 (문제, 학생 답)
+    """
+    canonical = json.dumps([
+        options.get('academy_id'),
+        context,
+        options['model'],
+        options['system_prompt'],
+        normalize_unit_text(unit['question']),
+        normalize_unit_text(unit['answer']),
+    ], ensure_ascii=False, default=str)
+    return f"verdict:{hashlib.sha256(canonical.encode('utf-8')).hexdigest()}"
+
+
+def pending_questions_text(ocr_text: str, units: list) -> str:
+    """
+    LLM에 보낼 채점 텍스트: 페이지 전체(지문, 지시문 포함) + 아직 판정이 없는 문항 번호와 정답지 정답
+    """
+    pending = [unit for unit in units if unit['isCorrect'] is None]
+    numbers = ', '.join(str(unit['number']) for unit in pending)
+    lines = [ocr_text, '', f"[채점할 문항: {numbers}번만 채점하고 detailedResults에 questionNumber를 적을 것 "
+                           f"(나머지 문항은 이미 채점됨)]"]
+    lines += [f"({unit['number']}번 정답: {unit['expected']})" for unit in pending if 'expected' in unit]
+    return '\n'.join(lines)
+
+
+def filter_calculation(calculation_result: dict, text: str) -> dict:
+    """
+    LLM에 보내는 텍스트에 들어 있는 수식(어법 판정은 답 줄)의 계산 결과만 남김
+    """
+    if not calculation_result:
+        return calculation_result
+    return {expr: result for expr, result in calculation_result.items() if result.get('line', expr) in text} or None
+
+
+def assign_fresh_verdicts(units: list, grading: dict) -> list:
+    """
+    LLM 채점 결과(detailedResults)를 아직 판정이 없는 문항에 연결하고, 연결된 문항 목록 반환
+    문항 번호로 먼저 맞추고, 안 되면 개수가 같을 때만 순서대로 맞춤
+    """
+    unseen = [unit for unit in units if unit['isCorrect'] is None]
+    results = [r for r in grading.get('detailedResults') or [] if isinstance(r, dict) and 'isCorrect' in r]
+    by_number = {}
+    for result in results:
+        if question_number(result):
+            by_number[question_number(result)] = bool(result['isCorrect'])
+    
+    if all(unit['number'] in by_number for unit in unseen):
+        verdicts = [by_number[unit['number']] for unit in unseen]
+    elif len(results) == len(unseen):
+        verdicts = [bool(result['isCorrect']) for result in results]
+    else:
+        return []
+    
+    for unit, verdict in zip(unseen, verdicts):
+        unit['isCorrect'] = verdict
+    return unseen
+
+
+def question_number(result: dict) -> int:
+    try:
+        return int(result.get('questionNumber'))
+    except (TypeError, ValueError):
+        return 0
+
+
+def merge_question_verdicts(units: list, grading: dict) -> dict:
+    """
+    로컬 판정(정답지, 캐시)과 새 채점 결과를 합쳐 페이지 채점 결과 구성
+    새 결과를 문항에 연결하지 못했으면 캐시된 문항 수를 새 결과에 더함
+    """
+    decided = [unit for unit in units if unit['isCorrect'] is not None]
+    detailed = [{'questionNumber': unit['number'], 'isCorrect': unit['isCorrect']} for unit in decided]
+    total = len(decided)
+    correct = sum(1 for unit in decided if unit['isCorrect'])
+    
+    if grading is not None and len(decided) < len(units):
+        # LLM은 페이지 전체를 보므로 이미 판정한 문항까지 채점했을 수 있음 → 그 결과는 빼고 더함
+        decided_numbers = {unit['number'] for unit in decided}
+        fresh = [r for r in grading.get('detailedResults') or [] if question_number(r) not in decided_numbers]
+        repeated = [r for r in grading.get('detailedResults') or [] if question_number(r) in decided_numbers]
+        detailed += fresh
+        total += max(0, grading.get('totalQuestions', 0) - len(repeated))
+        correct += max(0, grading.get('correctAnswers', 0) - sum(1 for r in repeated if r.get('isCorrect')))
+    
+    if grading is None:
+        return local_grading_result(detailed)
+    
+    return {
+        **grading,
+        'totalQuestions': total,
+        'correctAnswers': correct,
+        'detailedResults': sorted(detailed, key=question_number),
+    }
+
+
+def local_grading_result(detailed: list) -> dict:
+    """
+    LLM 없이 판정한 문항들로 채점 결과 구성 (LLM 채점과 같은 형식)
+    """
+    detailed = sorted(detailed, key=question_number)
+    wrong = [str(result['questionNumber']) for result in detailed if not result['isCorrect']]
+    return {
+        'totalQuestions': len(detailed),
+        'correctAnswers': len(detailed) - len(wrong),
+        'detailedResults': detailed,
+        'overallFeedback': f"틀린 문항: {', '.join(wrong)}번" if wrong else "모든 문항 정답",
+        'strengths': '',
+        'improvements': '',
+    }
+
+
+def grade_arithmetic_locally(ocr_text: str, calculation_result: dict) -> dict:
+    """
+    연산 학습지 로컬 채점: 모든 문항이 계산 검증된 수식 하나로만 이루어져 있으면 채점 결과, 아니면 None
+    문항 번호가 없으면 숫자가 있는 줄을 문항으로 보고 (제목 줄은 무시)
+    """
+    if not calculation_result:
+        return None
+    by_expression = {normalize_unit_text(expression): result for expression, result in calculation_result.items()}
+    
+    units = split_questions(ocr_text)
+    if units:
+        questions = [(unit['number'], QUESTION_START.sub('', unit['text'], count=1)) for unit in units]
+    else:
+        questions = list(enumerate((line for line in ocr_text.splitlines() if re.search(r'\d', line)), start=1))
+    if not questions:
+        return None
+    
+    detailed = []
+    for number, text in questions:
+        # 줄 전체가 계산한 수식과 같아야 함 ("1.5 + 2 = 3.5" 안의 "5 + 2 = 3" 같은 부분 일치 방지)
+        result = by_expression.get(normalize_unit_text(text))
+        if result is None:
+            return None
+        detailed.append({'questionNumber': number, 'isCorrect': result['isCorrect']})
+    return local_grading_result(detailed)
+
+
+# OCR 프롬프트 - 간결하게
+OCR_INSTRUCTION = "이미지의 모든 텍스트와 수식을 텍스트로 변환."
+
+# OCR 헤징 설정 (DeepSeek이 느리면 Gemini OCR을 병렬로 시작해서 먼저 끝난 쪽 사용)
+OCR_HEDGE_DEFAULT_DELAY_MS = 3000   # 지연 기록이 부족할 때 사용할 헤지 대기 시간
+OCR_HEDGE_PERCENTILE = 0.9          # 최근 DeepSeek OCR 지연의 p90 이후 헤지
+OCR_HEDGE_MIN_SAMPLES = 10
+
+
+class LatencyWindow:
+    """
+    최근 N개 호출 지연 시간(ms) 기록, 백분위 계산
+    """
+    
+    def __init__(self, size: int = 100):
+        self.size = size
+        self.samples = []
+    
+    def record(self, elapsed_ms: float):
+        self.samples.append(elapsed_ms)
+        if len(self.samples) > self.size:
+            self.samples.pop(0)
+    
+    def percentile(self, q: float):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+_deepseek_ocr_latency = LatencyWindow()
+
+# isolate 전체 OCR 헤징 카운터
+ocr_hedge_stats = {
+    'hedgedRequests': 0,   # 헤징 모드로 처리한 OCR 요청
+    'hedgesFired': 0,      # 대기 시간이 지나 Gemini OCR을 추가로 시작한 횟수
+    'hedgeWins': 0,        # 헤지(Gemini)가 먼저 유효한 텍스트를 반환한 횟수
+    'primaryWins': 0,      # 헤지를 시작한 뒤에도 DeepSeek이 먼저 끝난 횟수
+}
+
+
+def get_hedge_delay(env) -> float:
+    """
+    헤지 대기 시간(초): OCR_HEDGE_DELAY_MS 설정값 > 최근 DeepSeek OCR 지연 p90 > 기본값
+    """
+    configured = get_env_int(env, 'OCR_HEDGE_DELAY_MS', 0)
+    if configured > 0:
+        return configured / 1000
+    if len(_deepseek_ocr_latency.samples) >= OCR_HEDGE_MIN_SAMPLES:
+        return _deepseek_ocr_latency.percentile(OCR_HEDGE_PERCENTILE) / 1000
+    return OCR_HEDGE_DEFAULT_DELAY_MS / 1000
+
+
+async def request_deepseek_ocr(image: PageImage, api_key: str, env, deadline: Deadline = None):
+    """
+    DeepSeek OCR 호출, 텍스트 반환 (응답 없으면 None)
+    """
+    started = time.time()
+    try:
+        return await call_deepseek_chat(
+            [{
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": OCR_INSTRUCTION
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": image.data_url()
+                        }
+                    }
+                ]
+            }],
+            api_key, max_tokens=800, temperature=0.1,
+            breaker=get_circuit_breaker('deepseek', 'ocr', env), deadline=deadline, env=env
+        )
+    finally:
+        # 헤지에 밀려 취소된 호출도 그 시점까지의 지연을 기록 (p90이 낮게 잡히지 않도록)
+        _deepseek_ocr_latency.record((time.time() - started) * 1000)
+
+
+async def request_gemini_ocr(image: PageImage, api_key: str, env, deadline: Deadline = None):
+    """
+    Gemini Vision OCR 호출, 텍스트 반환 (응답 없으면 None)
+    """
+    return await call_gemini(
+        [
+            {"text": OCR_INSTRUCTION},
+            {
+                "inline_data": {
+                    "mime_type": image.mime_type,
+                    "data": image
+                }
+            }
+        ],
+        api_key, max_output_tokens=800,
+        breaker=get_circuit_breaker('gemini', 'ocr', env), deadline=deadline, env=env
+    )
+
+
+async def ocr_with_llm(image: PageImage, model: str, system_prompt: str, env, hedge: bool = False,
+                       deadline: Deadline = None) -> tuple:
+    """
+    DeepSeek OCR 또는 Gemini로 이미지에서 텍스트 추출, (텍스트, 실제로 OCR한 모델) 반환
+    관리자가 설정한 systemPrompt를 사용하여 OCR 수행
+    hedge=True이면 DeepSeek이 느릴 때 Gemini OCR을 병렬로 시작해서 먼저 끝난 쪽 사용
+    deadline이 있으면 남은 시간 안에서만 호출하고, 폴백할 시간이 없으면 DeadlineExceeded
+    """
+    try:
+        # DeepSeek OCR 모델 사용
+        # 모델명에서 접두사 제거 (deepseek/deepseek-ocr-2 → deepseek-ocr-2)
+        model_name = model.split('/')[-1] if '/' in model else model
+        
+        if 'deepseek' in model_name.lower():
+            print(f"🔍 DeepSeek OCR 2 사용 (모델: {model})")
+            api_key = get_deepseek_api_key(env)
+            
+            if not api_key:
+                print("⚠️ DeepSeek API 키 없음, Gemini로 폴백")
+                return await ocr_with_gemini(image, system_prompt, env, deadline=deadline), GEMINI_OCR_MODEL
+            
+            if not get_circuit_breaker('deepseek', 'ocr', env).allow():
+                print("⚡ DeepSeek OCR 회로 차단 중, Gemini로 바로 OCR")
+                return await ocr_with_gemini(image, system_prompt, env, deadline=deadline), GEMINI_OCR_MODEL
+            
+            if hedge:
+                return await hedged_ocr(image, api_key, system_prompt, env, deadline=deadline)
+            
+            try:
+                text = await request_deepseek_ocr(image, api_key, env, deadline=fallback_deadline(deadline, env))
+            except DeadlineExceeded:
+                print("⏱️ DeepSeek OCR 시간 초과")
+                text = None
+            if text:
+                print(f"✅ DeepSeek OCR 완료: {len(text)} 글자")
+                return text, DEEPSEEK_OCR_MODEL
+            
+            print(f"⚠️ DeepSeek OCR 응답 없음, Gemini로 폴백")
+            ensure_fallback_budget(deadline, env, 'OCR')
+            return await ocr_with_gemini(image, system_prompt, env, deadline=deadline), GEMINI_OCR_MODEL
+        
+        # Gemini API 사용 (기본)
+        else:
+            return await ocr_with_gemini(image, system_prompt, env, deadline=deadline), GEMINI_OCR_MODEL
+        
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        print(f"OCR 오류: {str(e)}, Gemini로 폴백")
+        ensure_fallback_budget(deadline, env, 'OCR')
+        return await ocr_with_gemini(image, system_prompt, env, deadline=deadline), GEMINI_OCR_MODEL
+
+
+async def hedged_ocr(image: PageImage, deepseek_key: str, system_prompt: str, env,
+                     deadline: Deadline = None) -> tuple:
+    """
+    DeepSeek OCR을 먼저 시작하고, 헤지 대기 시간 안에 끝나지 않으면 Gemini OCR을 병렬로 시작
+    먼저 유효한 텍스트를 반환한 쪽을 사용하고 나머지는 취소, (텍스트, 실제로 OCR한 모델) 반환
+    (Python 태스크 취소는 응답 대기만 중단하며, 이미 보낸 HTTP 요청 자체를 되돌리지는 않음)
+    """
+    ocr_hedge_stats['hedgedRequests'] += 1
+    primary = asyncio.ensure_future(request_deepseek_ocr(image, deepseek_key, env, deadline=deadline))
+    
+    hedge_delay = get_hedge_delay(env)
+    if deadline is not None:
+        hedge_delay = min(hedge_delay, deadline.remaining())
+    
+    done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+    if done:
+        if isinstance(primary.exception(), DeadlineExceeded):
+            raise primary.exception()
+        text = None if primary.exception() else primary.result()
+        if text:
+            print(f"✅ DeepSeek OCR 완료: {len(text)} 글자")
+            return text, DEEPSEEK_OCR_MODEL
+        print(f"⚠️ DeepSeek OCR 응답 없음, Gemini로 폴백")
+        ensure_fallback_budget(deadline, env, 'OCR')
+        return await ocr_with_gemini(image, system_prompt, env, deadline=deadline), GEMINI_OCR_MODEL
+    
+    gemini_key = env.GEMINI_API_KEY if hasattr(env, 'GEMINI_API_KEY') else None
+    if not gemini_key or not get_circuit_breaker('gemini', 'ocr', env).allow():
+        text = await primary
+        return (text if text else "텍스트를 읽을 수 없습니다."), DEEPSEEK_OCR_MODEL
+    
+    ocr_hedge_stats['hedgesFired'] += 1
+    print(f"⏱️ DeepSeek OCR 지연, Gemini OCR 헤지 시작")
+    hedge = asyncio.ensure_future(request_gemini_ocr(image, gemini_key, env, deadline=deadline))
+    
+    timed_out = False
+    pending = {primary, hedge}
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception():
+                timed_out = timed_out or isinstance(task.exception(), DeadlineExceeded)
+                print(f"⚠️ {'Gemini' if task is hedge else 'DeepSeek'} OCR 오류: {str(task.exception())}")
+                continue
+            text = task.result()
+            if not text:
+                continue
+            for other in pending:
+                other.cancel()
+            if task is hedge:
+                ocr_hedge_stats['hedgeWins'] += 1
+                print(f"✅ Gemini OCR(헤지) 완료: {len(text)} 글자")
+                return text, GEMINI_OCR_MODEL
+            ocr_hedge_stats['primaryWins'] += 1
+            print(f"✅ DeepSeek OCR 완료: {len(text)} 글자")
+            return text, DEEPSEEK_OCR_MODEL
+    
+    if timed_out:
+        raise DeadlineExceeded("OCR: 마감 시간 초과")
+    return "텍스트를 읽을 수 없습니다.", DEEPSEEK_OCR_MODEL
+
+
+async def ocr_with_gemini(image: PageImage, system_prompt: str, env, deadline: Deadline = None) -> str:
+    """
+    Gemini Vision API로 OCR 수행
+    """
+    try:
+        api_key = env.GEMINI_API_KEY if hasattr(env, 'GEMINI_API_KEY') else None
+        
+        if not api_key:
+            return "OCR API 키가 설정되지 않았습니다."
+        
+        text = await request_gemini_ocr(image, api_key, env, deadline=deadline)
+        if text:
+            print(f"✅ Gemini OCR 완료: {len(text)} 글자")
+            return text
+        
+        return "텍스트를 읽을 수 없습니다."
+        
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        print(f"Gemini OCR 오류: {str(e)}")
+        return f"OCR 오류: {str(e)}"
+
+
+# OCR 전 이미지 전처리 (Pillow는 큰 이미지를 처음 만났을 때만 import)
+IMAGE_PREPROCESS_MIN_BYTES = 512 * 1024   # base64 크기가 이보다 작은 이미지는 그대로 전송
+IMAGE_MAX_DIMENSION = 2048                # 긴 변 최대 픽셀 (학습지 글씨가 읽히는 수준)
+IMAGE_JPEG_QUALITY = 80
+# 파일 앞부분 → 실제 형식 (오프셋, 시그니처, MIME)
+IMAGE_SIGNATURES = [
+    (0, b'\xff\xd8\xff', 'image/jpeg'),
+    (0, b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (0, b'GIF8', 'image/gif'),
+    (8, b'WEBP', 'image/webp'),
+    (4, b'ftypheic', 'image/heic'),
+    (4, b'ftypheix', 'image/heic'),
+    (4, b'ftypmif1', 'image/heif'),
+]
+_pillow = None
+_pillow_unavailable = False
+# isolate 전체 전처리/OCR 지연 카운터 (학원별, 임계값 조정용)
+image_preprocess_stats = {'loaded': False, 'academies': {}}
+
+
+def get_image_settings(body: dict, env) -> dict:
+    """
+    이미지 전처리 설정: 요청 본문(학원별 값) > 환경 변수 > 기본값, 꺼져 있으면 None
+    """
+    if not get_flag(body.get('imagePreprocess'), env, 'IMAGE_PREPROCESS_MODE', default=True):
+        return None
+    
+    def setting(field, name, default):
+        try:
+            return int(body[field]) if body.get(field) is not None else get_env_int(env, name, default)
+        except (TypeError, ValueError):
+            return default
+    
+    return {
+        'min_bytes': setting('imageMinBytes', 'IMAGE_PREPROCESS_MIN_BYTES', IMAGE_PREPROCESS_MIN_BYTES),
+        'max_dimension': max(256, setting('imageMaxDimension', 'IMAGE_MAX_DIMENSION', IMAGE_MAX_DIMENSION)),
+        'quality': min(95, max(30, setting('imageQuality', 'IMAGE_JPEG_QUALITY', IMAGE_JPEG_QUALITY))),
+        'grayscale': get_flag(body.get('imageGrayscale'), env, 'IMAGE_GRAYSCALE', default=True),
+    }
+
+
+def detect_image_format(head: bytes):
+    for offset, signature, mime_type in IMAGE_SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            return mime_type
+    return None
+
+
+def load_pillow():
+    """
+    Pillow 모듈 (없으면 None, 한 번만 시도)
+    """
+    global _pillow, _pillow_unavailable
+    if _pillow is None and not _pillow_unavailable:
+        started = time.time()
+        try:
+            from PIL import Image, ImageOps
+        except ImportError:
+            print("⚠️ Pillow를 불러올 수 없어 이미지 전처리를 건너뜀")
+            _pillow_unavailable = True
+            return None
+        _pillow = {'Image': Image, 'ImageOps': ImageOps}
+        image_preprocess_stats['loaded'] = True
+        print(f"📦 Pillow 로드: {(time.time() - started) * 1000:.0f}ms")
+    return _pillow
+
+
+def shrink_image(data: bytes, settings: dict):
+    """
+    이미지 바이트 → (JPEG 바이트, 원래 크기, 바뀐 크기)
+    EXIF 회전을 적용하고 긴 변을 max_dimension 이하로 줄인 뒤 (흑백) JPEG로 다시 압축
+    """
+    pil = load_pillow()
+    if pil is None:
+        return None
+    Image, ImageOps = pil['Image'], pil['ImageOps']
+    max_dimension = settings['max_dimension']
+    mode = 'L' if settings['grayscale'] else 'RGB'
+    
+    with Image.open(io.BytesIO(data)) as source:
+        original_size = source.size
+        # JPEG는 디코딩 단계에서 1/2~1/8로 줄여 읽음 (12MP 사진 전체를 풀지 않음)
+        source.draft(mode, (max_dimension, max_dimension))
+        image = ImageOps.exif_transpose(source).convert(mode)
+    image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    
+    output = io.BytesIO()
+    image.save(output, 'JPEG', quality=settings['quality'], optimize=True)
+    return output.getvalue(), original_size, image.size
+
+
+async def preprocess_image(image: PageImage, settings: dict) -> tuple:
+    """
+    OCR 전 이미지 전처리 → (PageImage, 기록)
+    - 앞 12바이트로 실제 형식을 확인해 MIME 타입을 고침 (PNG인데 image/jpeg로 보내지 않도록)
+    - settings가 있고 min_bytes 이상이면 줄이고 다시 압축, 더 작아지지 않거나 실패하면 원본 그대로
+    캐시 키(cache_id)는 원본 기준이라 전처리 설정을 바꿔도 OCR 캐시는 그대로 적중
+    """
+    info = {'format': image.mime_type, 'bytesBefore': image.size, 'bytesAfter': image.size}
+    try:
+        head = base64.b64decode(await image.blob.slice(0, 16).text())
+    except ValueError:
+        head = b''
+    mime_type = detect_image_format(head)
+    if mime_type and mime_type != image.mime_type:
+        info['format'] = mime_type
+        image = PageImage(image.blob, mime_type, image.cache_id)
+    
+    if not settings or image.size < settings['min_bytes']:
+        return image, info
+    
+    started = time.time()
+    try:
+        data = base64.b64decode((await image.blob.arrayBuffer()).to_bytes())
+        shrunk = shrink_image(data, settings)
+    except Exception as e:
+        print(f"⚠️ 이미지 전처리 실패, 원본 전송: {str(e)}")
+        return image, info
+    if shrunk is None:
+        return image, info
+    
+    jpeg, original_size, size = shrunk
+    encoded = base64.b64encode(jpeg).decode('ascii')
+    info['preprocessMs'] = round((time.time() - started) * 1000)
+    info['width'], info['height'] = size
+    if len(encoded) >= image.size:
+        return image, info
+    
+    info['resizedFrom'] = list(original_size)
+    info['bytesAfter'] = len(encoded)
+    return PageImage(Blob.new(to_js([encoded])), 'image/jpeg', image.cache_id), info
+
+
+def record_image_stats(academy_id, info: dict, ocr_ms: int):
+    """
+    학원별 전처리 전후 크기와 OCR 지연 누적 (GET /diagnostics의 imagePreprocess)
+    """
+    stats = image_preprocess_stats['academies'].setdefault(str(academy_id or 'default'), {
+        'pages': 0, 'preprocessed': 0, 'bytesBefore': 0, 'bytesAfter': 0, 'preprocessMs': 0, 'ocrMs': 0,
+    })
+    stats['pages'] += 1
+    stats['preprocessed'] += 'resizedFrom' in info
+    stats['bytesBefore'] += info['bytesBefore']
+    stats['bytesAfter'] += info['bytesAfter']
+    stats['preprocessMs'] += info.get('preprocessMs', 0)
+    stats['ocrMs'] += ocr_ms
+
+
+# 배치 OCR 응답에서 페이지 구분선: "=== 페이지 3 ==="
+OCR_PAGE_DELIMITER = re.compile(r'^\s*=+\s*페이지\s*(\d+)\s*=+\s*$', re.MULTILINE)
+
+
+def split_batch_ocr(response_text: str, page_count: int) -> list:
+    """
+    배치 OCR 응답을 페이지 구분선 기준으로 페이지별 텍스트로 분리
+    구분선이 없거나 중복된 페이지는 None
+    """
+    texts = [None] * page_count
+    matches = list(OCR_PAGE_DELIMITER.finditer(response_text))
+    
+    for i, match in enumerate(matches):
+        number = int(match.group(1))
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(response_text)
+        if not 1 <= number <= page_count:
+            continue
+        if texts[number - 1] is not None:
+            # 같은 페이지 번호가 두 번 나오면 어느 쪽이 맞는지 알 수 없음
+            texts[number - 1] = ''
+            continue
+        texts[number - 1] = response_text[match.end():end].strip()
+    
+    return [text if text else None for text in texts]
+
+
+async def ocr_with_gemini_batch(images: list, system_prompt: str, env, deadline: Deadline = None) -> list:
+    """
+    여러 이미지를 한 번의 Gemini Vision 요청으로 OCR하고 페이지별 텍스트 목록 반환
+    페이지 구분선으로 분리하지 못한 페이지만 ocr_with_gemini로 다시 OCR
+    다시 OCR하다가 마감 시간을 넘긴 페이지는 텍스트 대신 DeadlineExceeded 객체
+    """
+    if len(images) == 1:
+        return [await ocr_with_gemini(images[0], system_prompt, env, deadline=deadline)]
+    
+    texts = [None] * len(images)
+    
+    try:
+        api_key = env.GEMINI_API_KEY if hasattr(env, 'GEMINI_API_KEY') else None
+        if not api_key:
+            return ["OCR API 키가 설정되지 않았습니다."] * len(images)
+        
+        ocr_instruction = (
+            f"{len(images)}개 이미지 각각의 모든 텍스트와 수식을 텍스트로 변환. "
+            "이미지마다 '=== 페이지 N ===' 줄로 시작해서 순서대로 출력."
+        )
+        parts = [{"text": ocr_instruction}]
+        for number, image in enumerate(images, start=1):
+            parts.append({"text": f"=== 페이지 {number} ==="})
+            parts.append({"inline_data": {"mime_type": image.mime_type, "data": image}})
+        
+        response_text = await call_gemini(parts, api_key, OCR_OUTPUT_TOKENS_PER_PAGE * len(images),
+                                          breaker=get_circuit_breaker('gemini', 'ocr', env),
+                                          deadline=fallback_deadline(deadline, env), env=env)
+        if response_text:
+            texts = split_batch_ocr(response_text, len(images))
+            print(f"✅ Gemini 배치 OCR 완료: {len(images)}장")
+        
+    except Exception as e:
+        print(f"Gemini 배치 OCR 오류: {str(e)}, 페이지별 OCR로 폴백")
+    
+    missing = [i for i, text in enumerate(texts) if text is None]
+    if missing:
+        print(f"⚠️ 배치 OCR에서 {len(missing)}개 페이지 분리 실패, 페이지별 OCR")
+        ensure_fallback_budget(deadline, env, 'OCR')
+        fallback = await asyncio.gather(*(
+            ocr_with_gemini(images[i], system_prompt, env, deadline=deadline) for i in missing
+        ), return_exceptions=True)
+        for i, text in zip(missing, fallback):
+            texts[i] = text
+    
+    return texts
+
+
+async def search_rag(text: str, academy_id: int, env, deadline: Deadline = None) -> list:
+    """
+    Vectorize DB에서 관련 학원 자료 검색
+    마감 시간 안에 끝나지 않으면 참고 자료 없이 진행
+    """
+    try:
+        if not hasattr(env, 'VECTORIZE'):
+            return []
+        
+        # Vectorize 검색
+        vectorize = env.VECTORIZE
+        
+        # 텍스트 임베딩 후 검색
+        results = await with_deadline(vectorize.query(text, topK=5), deadline, 'RAG 검색')
+        
+        # academy_id로 필터링
+        filtered = [
+            r.get('metadata', {}).get('content', '')
+            for r in results.get('matches', [])
+            if r.get('metadata', {}).get('academyId') == academy_id
+        ]
+        
+        return filtered[:3]  # 상위 3개만 반환
+        
+    except Exception as e:
+        print(f"RAG 검색 오류: {str(e)}")
+        return []
+
+
+# 과목별 키워드와 가중치 (영문 단어는 단어 경계로만 매칭, 한글은 부분 문자열)
+SUBJECT_KEYWORDS = {
+    'math': {
+        '방정식': 3, '부등식': 3, '함수': 3, '미분': 3, '적분': 3, '인수분해': 3, '약분': 2, '통분': 2,
+        '분수': 2, '소수점': 2, '기하': 2, '대수': 2, '삼각': 2, '넓이': 2, '둘레': 2, '각도': 2,
+        'sin': 2, 'cos': 2, 'tan': 2, 'log': 2,
+    },
+    'english': {
+        'be동사': 3, '조동사': 3, '시제': 3, '문법': 3, '어법': 3, 'grammar': 3, '영어': 2, '영작': 3,
+        'to부정사': 3, '동명사': 3, '관계대명사': 3, '현재완료': 3, '과거형': 2,
+        'the': 1, 'is': 1, 'are': 1, 'was': 1, 'were': 1, 'have': 1, 'has': 1, 'and': 1, 'you': 1,
+    },
+    'science': {
+        '실험': 3, '관찰': 2, '가설': 3, '원소': 3, '원자': 3, '분자': 3, '세포': 3, '광합성': 3,
+        '전류': 3, '전압': 3, '저항': 2, '질량': 2, '속력': 2, '가속도': 3, '중력': 2, '화학': 2,
+        '산소': 2, '이산화탄소': 3, '에너지': 2,
+    },
+    'korean': {
+        '국어': 3, '문학': 3, '비문학': 3, '시조': 3, '소설': 2, '화자': 3, '주제': 1, '맞춤법': 3,
+        '띄어쓰기': 3, '품사': 3, '어휘': 2, '글쓴이': 3, '높임법': 3,
+    },
+}
+# 키워드로 표현하기 어려운 기호 패턴 ("-" 하나만으로는 수학으로 보지 않고 숫자 사이 연산자만)
+# 숫자-연산자-숫자는 숫자 처음부터 보고, 날짜(2024-03-05, 2024/3/5)와 전화번호(010-1234-5678)는 제외
+# (패턴은 글자/문자 집합으로 시작해야 re가 후보가 아닌 위치를 건너뜀, findall로 세므로 캡처 그룹은 쓰지 않음)
+SUBJECT_PATTERNS = {
+    'math': {
+        r'[=＝]': 1,
+        r'\d(?<!\d\d)(?<!\d[-/]\d)(?!\d{3}-\d{1,2}-\d{1,2}(?!\d)|\d{3}/\d{1,2}/\d{1,2}(?!\d)|\d{1,3}-\d{3,4}-\d{4}(?!\d))'
+        r'\d*(?:\.\d+)?[ \t]*[-+*/×÷·−＋－＊／][ \t]*\d': 2,
+        r'[²³√∫π]': 2,
+    },
+}
+# 같은 키워드가 여러 번 나와도 점수는 이 횟수까지만 (긴 영어 지문의 "the" 등)
+SUBJECT_MAX_HITS = 3
+# 신뢰도 계산의 사전 점수 (키워드 한두 개로는 확신하지 않음)
+SUBJECT_SCORE_PRIOR = 2
+
+
+def keyword_trie_pattern(keywords) -> str:
+    """
+    키워드 목록을 접두사 트리 모양의 정규식으로 ("함수|함수식" → "함수(?:식)?")
+    위치마다 키워드를 하나씩 시도하지 않고 첫 글자부터 갈라지는 가지만 따라감
+    맨 위는 묶지 않고 "첫 글자...|첫 글자..." 대안으로 둠 (아래 build_subject_matcher 참고)
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for ch in keyword:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+    
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # 더 긴 키워드를 먼저 시도하고, 안 되면 여기서 끝나는 키워드로 매칭
+        return f'(?:{body})?' if '' in node else body
+    
+    return '|'.join(re.escape(ch) + build(child) for ch, child in sorted(trie.items()))
+
+
+SUBJECT_LEADING_CLASS = re.compile(r'(\\d|\[[^\]\\^][^\]\\]*\])(.*)', re.DOTALL)
+SUBJECT_DIGITS = '0123456789０１２３４５６７８９'
+
+
+def leading_characters(pattern: str):
+    """
+    '[=＝]...', '\\d...'처럼 문자 집합으로 시작하는 패턴을 (첫 글자들, 나머지)로 나눔 (아니면 None)
+    """
+    match = SUBJECT_LEADING_CLASS.fullmatch(pattern)
+    if match is None:
+        return None
+    head, rest = match.groups()
+    if head == r'\d':
+        return SUBJECT_DIGITS, rest
+    chars = re.sub(r'(.)-(.)', lambda m: ''.join(map(chr, range(ord(m[1]), ord(m[2]) + 1))), head[1:-1])
+    return chars, rest
+
+
+def build_subject_matcher():
+    """
+    모든 과목의 키워드/패턴을 하나의 정규식으로 컴파일 (텍스트를 한 번만 훑음)
+    영문 단어는 [a-z]+ 하나로 통째로 잘라 사전에서 찾으므로 "there"가 "the"로 잡히지 않음
+    
+    re는 모든 대안이 글자 하나로 시작할 때만 첫 글자 집합으로 후보가 아닌 위치를 건너뛰므로
+    "[a-z]..."나 "\\d..."는 "a...|b...|..."처럼 첫 글자별 대안으로 풀어서 넣음
+    반환: (정규식, 키워드 → [(과목, 가중치)], 패턴 첫 글자 → [(패턴, [(과목, 가중치)]), ...])
+    """
+    keyword_rules = {}
+    for subject, keywords in SUBJECT_KEYWORDS.items():
+        for keyword, weight in keywords.items():
+            keyword_rules.setdefault(keyword.lower(), []).append((subject, weight))
+    pattern_rules = {}
+    for subject, patterns in SUBJECT_PATTERNS.items():
+        for pattern, weight in patterns.items():
+            pattern_rules.setdefault(pattern, []).append((subject, weight))
+    
+    literals = [keyword for keyword in keyword_rules if not keyword.isascii()]
+    alternatives = [keyword_trie_pattern(literals)]
+    by_first_char = {}
+    for pattern, rules in [('[a-z][a-z]*', None)] + list(pattern_rules.items()):
+        split = leading_characters(pattern)
+        if split is None:
+            alternatives.append(f'(?:{pattern})')
+            continue
+        chars, rest = split
+        alternatives += [re.escape(ch) + rest for ch in chars]
+        if rules is not None:
+            compiled = re.compile(pattern)
+            for ch in chars:
+                by_first_char.setdefault(ch, []).append((compiled, rules))
+    return re.compile('|'.join(alternatives)), keyword_rules, by_first_char
+
+
+SUBJECT_MATCHER, SUBJECT_KEYWORD_RULES, SUBJECT_PATTERN_RULES = build_subject_matcher()
+
+
+def classify_subject_keywords(text: str) -> dict:
+    """
+    키워드 점수로 과목 분류 (소문자 변환 1회 + 정규식 1회, 같은 토큰은 한 번만 규칙 조회)
+    confidence: 1위와 2위 점수 차이를 근거의 양으로 나눈 값 (0~1)
+    """
+    hits = {}
+    for token, count in Counter(SUBJECT_MATCHER.findall((text or '').lower())).items():
+        rules = SUBJECT_KEYWORD_RULES.get(token)
+        if rules is None:
+            # 키워드가 아니면 첫 글자로 패턴을 찾음 (키워드가 아닌 영어 단어는 해당 패턴이 없음)
+            candidates = SUBJECT_PATTERN_RULES.get(token[0], ())
+            if len(candidates) == 1:
+                rules = candidates[0][1]
+            else:
+                rules = next((rules for pattern, rules in candidates if pattern.fullmatch(token)), None)
+            if rules is None:
+                continue
+        hits[id(rules)] = (rules, hits.get(id(rules), (rules, 0))[1] + count)
+    
+    scores = {subject: 0 for subject in SUBJECT_KEYWORDS}
+    for rules, count in hits.values():
+        for subject, weight in rules:
+            scores[subject] += weight * min(count, SUBJECT_MAX_HITS)
+    
+    ranked = sorted(scores.values(), reverse=True)
+    if ranked[0] == ranked[1]:
+        return {'subject': 'other', 'confidence': 0.0, 'scores': scores}
+    return {
+        'subject': max(scores, key=scores.get),
+        'confidence': round((ranked[0] - ranked[1]) / (ranked[0] + ranked[1] + SUBJECT_SCORE_PRIOR), 2),
+        'scores': scores,
+    }
+
+
+# 학습된 과목 분류 모델 (글자 n-gram 나이브 베이즈)
+# 모델 데이터는 train_subject_model.py가 만드는 subject_model_data.py에 있고 처음 분류할 때 불러옴
+# 이보다 짧은 텍스트나 확률이 낮은 결과는 키워드 분류로 대신함
+SUBJECT_MODEL_MIN_CHARS = 8
+SUBJECT_MODEL_MIN_FEATURES = 6      # 모델이 아는 n-gram이 이보다 적으면 판단 근거가 부족함 ("OCR 오류: ..." 등)
+SUBJECT_MODEL_MIN_CONFIDENCE = 0.6
+# 모델 입력은 앞부분만 (학습지 제목과 첫 문항이면 과목은 충분히 드러남)
+SUBJECT_MODEL_MAX_CHARS = 400
+SUBJECT_MODEL_NOISE = re.compile(r'\s+')
+SUBJECT_MODEL_DIGITS = re.compile(r'\d')
+
+_subject_model = None
+_subject_model_unavailable = False
+subject_model_stats = {'loaded': False, 'loadMs': 0, 'calls': 0, 'fallbacks': 0}
+
+
+def subject_model_features(text: str, max_chars: int = SUBJECT_MODEL_MAX_CHARS, ngram=(2, 3)) -> set:
+    """
+    모델 입력 특징: 정규화한 텍스트의 글자 n-gram 집합 (숫자는 모두 0, 공백은 한 칸)
+    """
+    text = unicodedata.normalize('NFKC', text[:max_chars * 2]).lower()
+    text = ' ' + SUBJECT_MODEL_DIGITS.sub('0', SUBJECT_MODEL_NOISE.sub(' ', text))[:max_chars].strip() + ' '
+    features = set()
+    for n in range(ngram[0], ngram[1] + 1):
+        features.update(text[i:i + n] for i in range(len(text) - n + 1))
+    return features
+
+
+def decode_subject_model(data: str) -> dict:
+    """
+    모델 문자열을 n-gram → 과목별 가중치(int8 배열의 한 행) 사전으로 풀기
+    """
+    header, vocabulary, weights = zlib.decompress(base64.b64decode(data)).split(b'\0', 2)
+    model = json.loads(header)
+    width = len(model['classes'])
+    weights = memoryview(weights).cast('b')
+    model['index'] = {gram: tuple(weights[idx * width:(idx + 1) * width])
+                      for idx, gram in enumerate(vocabulary.decode('utf-8').split('\x1f'))}
+    return model
+
+
+def load_subject_model():
+    """
+    과목 분류 모델 (처음 쓸 때 한 번 풀어서 isolate에 보관, 없거나 깨졌으면 None)
+    """
+    global _subject_model, _subject_model_unavailable
+    if _subject_model is None and not _subject_model_unavailable:
+        started = time.time()
+        try:
+            from subject_model_data import SUBJECT_MODEL_DATA
+            _subject_model = decode_subject_model(SUBJECT_MODEL_DATA)
+        except ImportError:
+            print("⚠️ 과목 분류 모델(subject_model_data.py)이 없어 키워드 분류 사용")
+            _subject_model_unavailable = True
+            return None
+        except Exception as e:
+            print(f"⚠️ 과목 분류 모델 로드 실패, 키워드 분류 사용: {str(e)}")
+            _subject_model_unavailable = True
+            return None
+        subject_model_stats['loaded'] = True
+        subject_model_stats['loadMs'] = round((time.time() - started) * 1000, 1)
+        subject_model_stats['vocabulary'] = len(_subject_model['index'])
+        print(f"📦 과목 분류 모델 로드: {subject_model_stats['loadMs']}ms, n-gram {len(_subject_model['index'])}개")
+    return _subject_model
+
+
+def score_subject_model(model: dict, text: str):
+    """
+    과목별 확률과 모델이 아는 n-gram 수
+    온도로 보정한 softmax를 근거(n-gram 수)가 적을수록 균등 분포 쪽으로 당김:
+    p = w·softmax + (1 - w)/과목 수, w = n / (n + shrinkage)  (짧은 텍스트는 확신하지 않음)
+    """
+    index = model['index']
+    rows = [index[gram] for gram in subject_model_features(text, model['maxChars'], model['ngram']) if gram in index]
+    totals = [sum(column) for column in zip(*rows)] if rows else [0] * len(model['classes'])
+    scores = [bias + model['scale'] * total for bias, total in zip(model['bias'], totals)]
+    top = max(scores)
+    exps = [math.exp((score - top) / model['temperature']) for score in scores]
+    total = sum(exps)
+    weight = len(rows) / (len(rows) + model.get('shrinkage', 0)) if rows else 0.0
+    uniform = (1 - weight) / len(exps)
+    return {subject: weight * value / total + uniform for subject, value in zip(model['classes'], exps)}, len(rows)
+
+
+def classify_subject(text: str, use_model: bool = True) -> dict:
+    """
+    과목 분류: 학습된 모델이 있고 확신하면 모델, 아니면 키워드 분류
+    """
+    model = load_subject_model() if use_model and not is_ocr_failure(text) else None
+    if model is not None and len(text.strip()) >= SUBJECT_MODEL_MIN_CHARS:
+        subject_model_stats['calls'] += 1
+        probabilities, matched = score_subject_model(model, text)
+        subject = max(probabilities, key=probabilities.get)
+        if matched >= SUBJECT_MODEL_MIN_FEATURES and probabilities[subject] >= SUBJECT_MODEL_MIN_CONFIDENCE:
+            return {'subject': subject, 'confidence': round(probabilities[subject], 2), 'method': 'model'}
+        subject_model_stats['fallbacks'] += 1
+    return {**classify_subject_keywords(text), 'method': 'keywords'}
+
+
+def detect_subject(text: str) -> str:
+    """
+    과목 자동 감지 (math / english / science / korean / other)
+    """
+    return classify_subject(text)['subject']
+
+
+# 수식이 될 수 있는 글자 (전각 숫자는 \d가 그대로 인식, 연산자/괄호/등호는 전각과 유니코드 변형까지)
+MATH_CHARS = r'\d.+\-*/^×÷·−＋－＊／＾()（） \t'
+# "수식 = 답" 후보 구간: 수식 글자가 이어지는 구간 중 등호가 있는 것
+# (앞 글자가 수식 글자가 아닌 곳에서만 시작하므로 전체 텍스트를 한 번만 훑음)
+EQUATION_SPAN = re.compile(rf'(?<![{MATH_CHARS}])[{MATH_CHARS}]*[=＝](?:[{MATH_CHARS}=＝…]|나머지)*')
+# 가장 흔한 "a ○ b = c" (정수, 앞에 "1." / "(1)" 문항 번호 가능)는 토큰화 없이 바로 계산
+SIMPLE_EQUATION = re.compile(
+    r'[ \t]*(?:[(（]?\d{1,3}[.)）][ \t]+)?'
+    r'(?P<expr>(?P<a>\d+)[ \t]*(?P<op>[-+*/×÷·−＋－＊／])[ \t]*(?P<b>\d+)[ \t]*[=＝][ \t]*(?P<c>-?\d+))[ \t]*'
+)
+MATH_TOKEN = re.compile(r"""
+    [ \t]*(?:
+        (?P<num>\d+(?:\.\d+)?)
+      | (?P<op>[-+*/^×÷·−＋－＊／＾])
+      | (?P<open>[(（])
+      | (?P<close>[)）])
+      | (?P<eq>[=＝])
+      | (?P<rem>…|\.\.\.|나머지)
+      | (?P<other>.)
+    )
+""", re.VERBOSE)
+MATH_OPERATORS = {
+    '+': '+', '＋': '+',
+    '-': '-', '－': '-', '−': '-',
+    '*': '*', '＊': '*', '×': '*', '·': '*',
+    '/': '/', '／': '/', '÷': '/',
+    '^': '^', '＾': '^',
+}
+# 연산자 우선순위 (^는 오른쪽 결합, 단항 -는 *보다 강하고 ^보다 약함)
+OPERATOR_PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2, '^': 3}
+MAX_EXPONENT = 64
+
+
+def tokenize_math(text: str) -> list:
+    """
+    텍스트를 (종류, 값, 시작, 끝) 토큰 목록으로 (종류: num, op, open, close, eq, rem, other)
+    """
+    tokens = []
+    for match in MATH_TOKEN.finditer(text):
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'op':
+            value = MATH_OPERATORS[value]
+        tokens.append((kind, value, match.start(kind), match.end(kind)))
+    return tokens
+
+
+def parse_number(value: str):
+    """
+    숫자 토큰 → 정수는 int, 소수는 Fraction (정확한 비교를 위해 float 사용 안 함)
+    """
+    return Fraction(value) if '.' in value else int(value)
+
+
+def evaluate_tokens(tokens: list):
+    """
+    precedence climbing으로 토큰 목록 전체를 정확한 값(int/Fraction)으로 계산 (수식이 아니면 ValueError)
+    """
+    def parse(pos: int, min_precedence: int):
+        value, pos = parse_unary(pos)
+        while pos < len(tokens) and tokens[pos][0] == 'op' and OPERATOR_PRECEDENCE[tokens[pos][1]] >= min_precedence:
+            op = tokens[pos][1]
+            precedence = OPERATOR_PRECEDENCE[op]
+            right, pos = parse(pos + 1, precedence if op == '^' else precedence + 1)
+            value = apply_operator(op, value, right)
+        return value, pos
+    
+    def parse_unary(pos: int):
+        if pos < len(tokens) and tokens[pos][0] == 'op' and tokens[pos][1] in ('+', '-'):
+            sign = tokens[pos][1]
+            value, pos = parse(pos + 1, OPERATOR_PRECEDENCE['^'])
+            return (-value if sign == '-' else value), pos
+        return parse_primary(pos)
+    
+    def parse_primary(pos: int):
+        if pos >= len(tokens):
+            raise ValueError('수식이 끝남')
+        kind, value = tokens[pos][0], tokens[pos][1]
+        if kind == 'num':
+            return parse_number(value), pos + 1
+        if kind == 'open':
+            value, pos = parse(pos + 1, 1)
+            if pos >= len(tokens) or tokens[pos][0] != 'close':
+                raise ValueError('괄호가 닫히지 않음')
+            return value, pos + 1
+        raise ValueError(f'예상하지 못한 토큰: {value}')
+    
+    value, pos = parse(0, 1)
+    if pos != len(tokens):
+        raise ValueError('수식 뒤에 남은 토큰')
+    return value
+
+
+def apply_operator(op: str, left, right):
+    if op == '+':
+        return left + right
+    if op == '-':
+        return left - right
+    if op == '*':
+        return left * right
+    if op == '/':
+        if right == 0:
+            raise ValueError('0으로 나눔')
+        return Fraction(left, right)
+    if right.denominator != 1 or abs(right) > MAX_EXPONENT:
+        raise ValueError('지원하지 않는 지수')
+    if left == 0 and right < 0:
+        raise ValueError('0으로 나눔')
+    return left ** int(right) if right >= 0 else Fraction(1, left ** -int(right))
+
+
+def format_number(value):
+    """
+    JSON에 넣을 값: 정수 → int, 유한소수 → float, 그 외 → "a/b"
+    """
+    if value.denominator == 1:
+        return int(value)
+    denominator = value.denominator
+    for factor in (2, 5):
+        while denominator % factor == 0:
+            denominator //= factor
+    return float(value) if denominator == 1 else f"{value.numerator}/{value.denominator}"
+
+
+def has_binary_operator(tokens: list) -> bool:
+    previous = None
+    for kind, _, _, _ in tokens:
+        if kind == 'op' and previous in ('num', 'close'):
+            return True
+        previous = kind
+    return False
+
+
+def decimal_places(tokens: list):
+    """
+    학생 답이 소수 하나("3.33", "-0.5")면 소수 자릿수, 아니면 None
+    """
+    numbers = [token for token in tokens if token[0] != 'op']
+    if len(numbers) != 1 or numbers[0][0] != 'num' or '.' not in numbers[0][1] or len(tokens) > 2:
+        return None
+    return len(numbers[0][1].split('.')[1])
+
+
+def equation_result(student, correct, places=None) -> dict:
+    is_correct = student == correct
+    if not is_correct and places is not None and isinstance(format_number(correct), str):
+        # 나누어떨어지지 않는 값을 반올림해 쓴 경우 (10 ÷ 3 = 3.33)
+        is_correct = round(correct, places) == student
+    return {
+        'studentAnswer': format_number(student),
+        'correctAnswer': format_number(correct),
+        'isCorrect': is_correct,
+    }
+
+
+def check_equation(lhs: list, rhs: list, remainder: list) -> dict:
+    """
+    "좌변 = 학생 답" 검증 (수식이 아니면 ValueError)
+    나머지가 있는 나눗셈("7 ÷ 2 = 3 … 1")은 몫과 나머지를 함께 비교
+    """
+    correct = evaluate_tokens(lhs)
+    student = evaluate_tokens(rhs)
+    
+    if remainder is not None:
+        if len(lhs) != 3 or lhs[0][0] != 'num' or lhs[1][1] != '/' or lhs[2][0] != 'num' \
+                or '.' in lhs[0][1] + lhs[2][1]:
+            raise ValueError('나머지는 정수 나눗셈에만')
+        quotient, rest = divmod(int(lhs[0][1]), int(lhs[2][1]))
+        student_rest = evaluate_tokens(remainder)
+        return {
+            'studentAnswer': f"{format_number(student)}…{format_number(student_rest)}",
+            'correctAnswer': f"{quotient}…{rest}",
+            'isCorrect': student == quotient and student_rest == rest,
+        }
+    
+    return equation_result(student, correct, decimal_places(rhs))
+
+
+def check_segment(text: str, segment: list, calculations: dict, after_term: bool = False):
+    """
+    수식 토큰 구간 하나에서 등호마다 좌변/우변 비교 ("2 + 3 × 4 = 2 + 12 = 14"는 두 식)
+    after_term: 구간 바로 앞이 변수("2x + 3 + 4 = 9"의 x)라 연산자로 시작하는 좌변은 식의 일부가 아님
+    """
+    parts = [[]]
+    for token in segment:
+        if token[0] == 'eq':
+            parts.append([])
+        else:
+            parts[-1].append(token)
+    
+    for i in range(len(parts) - 1):
+        lhs, rhs = parts[i], parts[i + 1]
+        remainder = None
+        rem_positions = [j for j, token in enumerate(rhs) if token[0] == 'rem']
+        if rem_positions:
+            rhs, remainder = rhs[:rem_positions[0]], rhs[rem_positions[0] + 1:]
+        if not rhs or (remainder is not None and not remainder):
+            continue
+        
+        candidates = [lhs]
+        if i == 0:
+            # 첫 좌변 앞에 붙은 문항 번호("1)", "(1)")는 빼고도 시도
+            kinds = [kind for kind, _, _, _ in lhs[:3]]
+            if kinds[:2] == ['num', 'close']:
+                candidates.append(lhs[2:])
+            elif kinds == ['open', 'num', 'close']:
+                candidates.append(lhs[3:])
+        
+        for candidate in candidates:
+            if not has_binary_operator(candidate) or (after_term and candidate is lhs and lhs[0][0] == 'op'):
+                continue
+            try:
+                result = check_equation(candidate, rhs, remainder)
+            except (ValueError, ZeroDivisionError, OverflowError, RecursionError):
+                continue
+            calculations[text[candidate[0][2]:(remainder or rhs)[-1][3]]] = result
+            break
+
+
+def extract_equations(text: str) -> dict:
+    """
+    페이지에서 검증할 수 있는 모든 "수식 = 답"을 찾아 계산 (선형 시간)
+    등호가 있는 수식 구간만 골라, 단순한 "a ○ b = c"는 바로 계산하고 나머지는 토큰화 + 파싱
+    """
+    calculations = {}
+    for span in EQUATION_SPAN.finditer(text):
+        span_text = span.group()
+        simple = SIMPLE_EQUATION.fullmatch(span_text)
+        if simple:
+            try:
+                correct = apply_operator(MATH_OPERATORS[simple.group('op')], int(simple.group('a')), int(simple.group('b')))
+            except ValueError:
+                continue
+            calculations[simple.group('expr')] = equation_result(int(simple.group('c')), correct)
+            continue
+        
+        # 수식이 아닌 토큰(문항 번호 뒤 마침표 등)에서 구간을 나눠 각각 검사
+        # 공백을 사이에 두고 숫자/괄호가 이어지면("= 7   5 + 6", "= 7 (2) 5 + 6") 다음 식의 시작
+        previous = text[span.start() - 1] if span.start() > 0 else ' '
+        after_term = (previous.isascii() and previous.isalpha()) or previous in ('²', '³')
+        segment = []
+        for token in tokenize_math(span_text) + [('other', '', len(span_text), len(span_text))]:
+            next_term = segment and token[0] in ('num', 'open') and segment[-1][0] in ('num', 'close') \
+                and token[2] > segment[-1][3]
+            if token[0] != 'other' and not next_term:
+                segment.append(token)
+                continue
+            if len(segment) > 2:
+                check_segment(span_text, segment, calculations, after_term)
+            segment, after_term = ([token] if next_term else []), False
+    return calculations
+
+
+def calculate_math_simple(text: str) -> dict:
+    """
+    수학 계산 검증: 페이지의 "수식 = 답"을 모두 찾아 정확한 분수 연산으로 계산
+    (정수/소수/분수, 괄호, 거듭제곱, 단항 -, 연속 연산, ×/÷/·, 전각 숫자, 나머지 있는 나눗셈)
+    """
+    try:
+        calculations = extract_equations(text)
+        return calculations if calculations else None
+        
+    except Exception as e:
+        print(f"수학 계산 오류: {str(e)}")
+        return None
+
+
+# 기호 연산 검증 (SymPy는 대수식이 있는 페이지를 처음 만났을 때만 import)
+MAX_SYMBOLIC_LENGTH = 80            # 한 변의 최대 길이 (이보다 길면 검증하지 않음)
+MAX_SYMBOLIC_ITEMS = 20             # 페이지당 최대 검증 문항 수
+SIMPLIFY_KEYWORDS = re.compile(r'간단히|전개|인수분해|정리|simplify|expand|factor', re.IGNORECASE)
+# 한 줄 안의 식 구분: 쉼표, 화살표, "또는", "따라서", "답:" 등
+ALGEBRA_SEPARATORS = re.compile(r'[,;\n→∴]|또는|이므로|따라서|\bor\b|(?:정답|답)\s*[:：]?')
+# 수식 글자와 한 글자 변수만으로 된 앞/뒤 부분 ("다음 방정식을 푸시오 2x + 3" → "2x + 3")
+MATH_SUFFIX = re.compile(r'(?:[0-9.+\-*/()\s]|(?<![a-z])[a-z](?![a-z]))*$')
+MATH_PREFIX = re.compile(r'^(?:[0-9.+\-*/()\s]|(?<![a-z])[a-z](?![a-z]))*')
+SYMBOLIC_VARIABLE = re.compile(r'(?<![a-z])[a-z](?![a-z])')
+HUGE_POWER = re.compile(r'\*\*\s*\(?\s*-?\s*(?:\d{3,}|[a-z])|\*\*\s*\(?\s*\d+\s*\)?\s*\*\*')
+_sympy = None
+_sympy_unavailable = False
+symbolic_stats = {'loaded': False, 'checks': 0}
+
+
+def load_sympy():
+    """
+    SymPy 모듈 (없으면 None, 한 번만 시도)
+    """
+    global _sympy, _sympy_unavailable
+    if _sympy is None and not _sympy_unavailable:
+        started = time.time()
+        try:
+            import sympy
+            from sympy.parsing import sympy_parser
+        except ImportError:
+            print("⚠️ SymPy를 불러올 수 없어 기호 연산 검증을 건너뜀")
+            _sympy_unavailable = True
+            return None
+        _sympy = {
+            'sympy': sympy,
+            'parse_expr': sympy_parser.parse_expr,
+            'transformations': sympy_parser.standard_transformations + (
+                sympy_parser.implicit_multiplication_application, sympy_parser.rationalize),
+            'symbols': {letter: sympy.Symbol(letter) for letter in 'abcdefghijklmnopqrstuvwxyz'},
+        }
+        symbolic_stats['loaded'] = True
+        print(f"📦 SymPy 로드: {(time.time() - started) * 1000:.0f}ms")
+    return _sympy
+
+
+def normalize_symbolic(text: str) -> str:
+    """
+    OCR 수식 → SymPy 입력 형식 (위 첨자 거듭제곱, 전각 문자, ×/÷/·/^)
+    """
+    text = str(text).replace('²', '^2').replace('³', '^3')
+    text = unicodedata.normalize('NFKC', text).lower()
+    for old, new in (('×', '*'), ('·', '*'), ('÷', '/'), ('−', '-'), ('^', '**')):
+        text = text.replace(old, new)
+    return text
+
+
+def is_symbolic_text(text: str) -> bool:
+    """
+    SymPy에 넘겨도 안전한 식인지 (숫자, 연산자, 괄호, 한 글자 변수만 + 길이/거듭제곱 제한)
+    parse_expr는 내부에서 eval을 쓰므로 이 검사를 통과한 문자열만 파싱
+    """
+    return (0 < len(text) <= MAX_SYMBOLIC_LENGTH
+            and MATH_PREFIX.fullmatch(text) is not None
+            and re.search(r'[0-9a-z]', text) is not None
+            and HUGE_POWER.search(text) is None)
+
+
+@functools.lru_cache(maxsize=512)
+def parse_symbolic(text: str):
+    """
+    식 문자열 → SymPy 식 (파싱할 수 없으면 None, 같은 식은 캐시)
+    """
+    if not is_symbolic_text(text):
+        return None
+    sym = load_sympy()
+    if sym is None:
+        return None
+    try:
+        return sym['parse_expr'](text, local_dict=dict(sym['symbols']), transformations=sym['transformations'])
+    except Exception:
+        return None
+
+
+@functools.lru_cache(maxsize=512)
+def symbolic_equivalent(a: str, b: str):
+    """
+    두 식이 같은지 (1/2 = 0.5 = 2/4, 2(x + 1) = 2x + 2), 판단할 수 없으면 None
+    """
+    left, right = parse_symbolic(normalize_symbolic(a)), parse_symbolic(normalize_symbolic(b))
+    if left is None or right is None:
+        return None
+    symbolic_stats['checks'] += 1
+    try:
+        return bool(_sympy['sympy'].simplify(left - right) == 0)
+    except Exception:
+        return None
+
+
+@functools.lru_cache(maxsize=256)
+def solve_symbolic(lhs: str, rhs: str, variable: str):
+    """
+    일차/이차 방정식의 해 (튜플), 풀 수 없거나 3차 이상이면 None
+    """
+    left, right = parse_symbolic(lhs), parse_symbolic(rhs)
+    if left is None or right is None:
+        return None
+    sympy = _sympy['sympy']
+    symbol = _sympy['symbols'][variable]
+    symbolic_stats['checks'] += 1
+    try:
+        expression = sympy.expand(left - right)
+        if expression.free_symbols != {symbol} or sympy.Poly(expression, symbol).degree() > 2:
+            return None
+        return tuple(sympy.solve(expression, symbol))
+    except Exception:
+        return None
+
+
+def algebra_statement(text: str):
+    """
+    문항 하나에서 검증할 대수 문제 추출
+    - 풀이: 변수가 있는 방정식 + 학생이 쓴 "x = 값" (여러 해는 "x = 2, 3" / "x = 2 또는 x = 3")
+    - 식 정리: 간단히/전개/인수분해 문항의 "식 = 식 (= 식 ...)"
+    """
+    problem, chain, variable, roots = None, None, None, []
+    for piece in ALGEBRA_SEPARATORS.split(normalize_symbolic(text)):
+        sides = piece.split('=')
+        if len(sides) == 1:
+            # "x = 2, 3"의 두 번째 해
+            value = piece.strip()
+            if roots and value and is_symbolic_text(value) and not SYMBOLIC_VARIABLE.search(value):
+                roots.append(value)
+            continue
+        
+        sides = [MATH_SUFFIX.search(sides[0]).group().strip()] + [side.strip() for side in sides[1:-1]] \
+            + [MATH_PREFIX.match(sides[-1]).group().strip()]
+        if not all(is_symbolic_text(side) for side in sides):
+            continue
+        
+        if len(sides) == 2 and SYMBOLIC_VARIABLE.fullmatch(sides[0]) and not SYMBOLIC_VARIABLE.search(sides[1]):
+            if problem is not None and sides[0] in SYMBOLIC_VARIABLE.findall(problem[0] + problem[1]) \
+                    and variable in (None, sides[0]):
+                variable = sides[0]
+                roots.append(sides[1])
+            continue
+        
+        if problem is None and SYMBOLIC_VARIABLE.search(piece):
+            problem, chain = (sides[0], sides[1]), sides
+    
+    if problem is not None and roots:
+        return {'mode': 'solve', 'problem': problem, 'variable': variable, 'roots': roots}
+    if chain is not None and SIMPLIFY_KEYWORDS.search(text):
+        return {'mode': 'identity', 'chain': chain}
+    return None
+
+
+def verify_statement(statement: dict) -> dict:
+    """
+    대수 문제 검증 결과 (calculation 항목과 같은 형식), 검증할 수 없으면 None
+    """
+    if statement['mode'] == 'identity':
+        chain = statement['chain']
+        verdicts = [symbolic_equivalent(chain[0], side) for side in chain[1:]]
+        if None in verdicts:
+            return None
+        return {
+            'studentAnswer': chain[-1],
+            'correctAnswer': str(_sympy['sympy'].expand(parse_symbolic(chain[0]))),
+            'isCorrect': all(verdicts),
+            'method': 'symbolic',
+        }
+    
+    variable = statement['variable']
+    solutions = solve_symbolic(*statement['problem'], variable)
+    if solutions is None:
+        return None
+    roots = [parse_symbolic(root) for root in statement['roots']]
+    if None in roots:
+        return None
+    sympy = _sympy['sympy']
+    matched = all(any(sympy.simplify(root - solution) == 0 for solution in solutions) for root in roots)
+    return {
+        'studentAnswer': ', '.join(f"{variable} = {root}" for root in statement['roots']),
+        'correctAnswer': ', '.join(f"{variable} = {solution}" for solution in solutions) or '해 없음',
+        'isCorrect': matched and len(set(roots)) == len(solutions),
+        'method': 'symbolic',
+    }
+
+
+def verify_algebra(text: str) -> dict:
+    """
+    페이지의 대수 문항(방정식 풀이, 식 정리)을 SymPy로 검증
+    문항 번호가 있으면 문항 단위, 없으면 줄 단위로 보고, 키는 문항(줄) 텍스트
+    """
+    units = split_questions(text)
+    bodies = [QUESTION_START.sub('', unit['text'], count=1) for unit in units] if units else text.splitlines()
+    
+    verified = {}
+    for body in bodies:
+        if len(verified) >= MAX_SYMBOLIC_ITEMS:
+            break
+        if '=' not in body and '＝' not in body:
+            continue
+        statement = algebra_statement(body)
+        if statement is None or load_sympy() is None:
+            continue
+        result = verify_statement(statement)
+        if result is not None:
+            verified[body.strip()] = result
+    return verified
+
+
+# 영어 어법 검증 (규칙 기반): 빈칸/선택형은 정답을 구해 비교하고, 문장형 답은 틀린 곳만 찾음
+# 동사 변화 (원형: 3인칭 단수, 과거, 과거분사), 규칙 동사는 regular_verb_forms로 생성
+IRREGULAR_VERBS = {
+    'be': ('is', 'was', 'been'), 'have': ('has', 'had', 'had'), 'do': ('does', 'did', 'done'),
+    'go': ('goes', 'went', 'gone'), 'eat': ('eats', 'ate', 'eaten'), 'come': ('comes', 'came', 'come'),
+    'make': ('makes', 'made', 'made'), 'see': ('sees', 'saw', 'seen'), 'take': ('takes', 'took', 'taken'),
+    'get': ('gets', 'got', 'gotten'), 'buy': ('buys', 'bought', 'bought'), 'write': ('writes', 'wrote', 'written'),
+    'run': ('runs', 'ran', 'run'), 'swim': ('swims', 'swam', 'swum'), 'sleep': ('sleeps', 'slept', 'slept'),
+    'meet': ('meets', 'met', 'met'), 'know': ('knows', 'knew', 'known'), 'give': ('gives', 'gave', 'given'),
+    'teach': ('teaches', 'taught', 'taught'), 'lose': ('loses', 'lost', 'lost'), 'find': ('finds', 'found', 'found'),
+    'leave': ('leaves', 'left', 'left'), 'say': ('says', 'said', 'said'), 'tell': ('tells', 'told', 'told'),
+    'sing': ('sings', 'sang', 'sung'), 'drink': ('drinks', 'drank', 'drunk'), 'speak': ('speaks', 'spoke', 'spoken'),
+    'ride': ('rides', 'rode', 'ridden'), 'fly': ('flies', 'flew', 'flown'), 'think': ('thinks', 'thought', 'thought'),
+    'bring': ('brings', 'brought', 'brought'), 'sit': ('sits', 'sat', 'sat'), 'wear': ('wears', 'wore', 'worn'),
+    'become': ('becomes', 'became', 'become'), 'begin': ('begins', 'began', 'begun'), 'feel': ('feels', 'felt', 'felt'),
+}
+REGULAR_VERBS = (
+    'play', 'like', 'want', 'watch', 'study', 'live', 'love', 'need', 'work', 'walk', 'visit', 'help', 'clean',
+    'cook', 'finish', 'start', 'stay', 'talk', 'listen', 'wash', 'learn', 'move', 'try', 'dance', 'enjoy', 'plan',
+    'stop', 'carry', 'arrive', 'hope', 'live', 'practice', 'travel', 'wait', 'climb', 'rain', 'snow', 'smile',
+)
+# 자음 하나로 끝나 과거/-ing에서 겹치는 동사
+DOUBLED_VERBS = ('plan', 'stop', 'run', 'swim', 'sit', 'get', 'begin')
+
+BE_FORMS = {'i': ('am', 'was'), 'third': ('is', 'was'), 'plural': ('are', 'were')}
+SUBJECT_PRONOUNS = {'i': 'i', 'you': 'plural', 'we': 'plural', 'they': 'plural', 'he': 'third', 'she': 'third', 'it': 'third'}
+AUXILIARIES = ('do', 'does', 'did', "don't", "doesn't", "didn't", 'can', 'could', 'will', 'would', 'should',
+               'must', 'may', 'might', "can't", "won't", 'shall', 'to')
+# 주어와 동사 사이에 와도 수 일치에 영향 없는 부사
+FREQUENCY_ADVERBS = ('always', 'usually', 'often', 'sometimes', 'never', 'also', 'really', 'still', 'just', 'seldom')
+# 목적어로도 쓰이는 you/it은 절 첫머리일 때만 주어로 봄
+CLAUSE_STARTERS = ('', 'and', 'but', 'so', 'or', 'because', 'when', 'if', 'that', 'then', 'after', 'before', 'while')
+DETERMINERS = ('the', 'a', 'an', 'my', 'your', 'his', 'her', 'our', 'their', 'this', 'that', 'its', 'every', 'each')
+PLURAL_DETERMINERS = ('these', 'those', 'many', 'some', 'two', 'three', 'four', 'five', 'both', 'all')
+IRREGULAR_PLURALS = ('children', 'people', 'men', 'women', 'mice', 'feet', 'teeth', 'geese', 'police')
+SILENT_H_WORDS = ('hour', 'honest', 'honor', 'honour', 'heir')
+# 모음 글자로 시작하지만 자음 소리 (a university, a one-way)
+CONSONANT_SOUND_PREFIXES = ('uni', 'use', 'usu', 'uti', 'eu', 'one', 'once', 'ewe', 'ufo')
+
+PAST_MARKER = re.compile(r'\b(?:yesterday|ago|last\s+(?:night|week|month|year|weekend|sunday|monday|tuesday|'
+                         r'wednesday|thursday|friday|saturday|summer|winter)|in\s+(?:19|20)\d\d)\b', re.IGNORECASE)
+PRESENT_MARKER = re.compile(r'\b(?:every\s+(?:day|morning|night|week|weekend|year)|now|usually|always|often|'
+                            r'sometimes|never)\b', re.IGNORECASE)
+ENGLISH_WORD = re.compile(r"[A-Za-z][A-Za-z']*")
+# 학생 답 표시 (문장 변형/영작은 화살표가 흔함)
+ENGLISH_ANSWER = re.compile(r'(?:→|->|=>|⇒|(?:정답|답|answer|ans)\s*[:：)])\s*(.+)$', re.IGNORECASE | re.MULTILINE)
+ENGLISH_BLANK = re.compile(r'\(\s*\)|\[\s*\]|_{2,}|\(\s*(?P<first>[A-Za-z\']+)\s*/\s*(?P<second>[A-Za-z\']+)\s*\)')
+CIRCLED_NUMBERS = '①②③④⑤⑥⑦⑧⑨'
+CIRCLED_OPTION = re.compile(f'([{CIRCLED_NUMBERS}])([^{CIRCLED_NUMBERS}]+)')
+# 문장형 답 검사를 시작하기 위한 최소 영어 단어 수
+MIN_SENTENCE_WORDS = 3
+
+
+def regular_verb_forms(verb: str) -> tuple:
+    """
+    규칙 동사의 (3인칭 단수, 과거, 과거분사)
+    """
+    if verb.endswith(('s', 'sh', 'ch', 'x', 'o', 'z')):
+        third = verb + 'es'
+    elif verb.endswith('y') and verb[-2] not in 'aeiou':
+        third = verb[:-1] + 'ies'
+    else:
+        third = verb + 's'
+    if verb.endswith('e'):
+        past = verb + 'd'
+    elif verb.endswith('y') and verb[-2] not in 'aeiou':
+        past = verb[:-1] + 'ied'
+    elif verb in DOUBLED_VERBS:
+        past = verb + verb[-1] + 'ed'
+    else:
+        past = verb + 'ed'
+    return third, past, past
+
+
+def ing_form(verb: str) -> str:
+    if verb.endswith('ie'):
+        return verb[:-2] + 'ying'
+    if verb.endswith('e') and not verb.endswith('ee') and verb != 'be':
+        return verb[:-1] + 'ing'
+    if verb in DOUBLED_VERBS:
+        return verb + verb[-1] + 'ing'
+    return verb + 'ing'
+
+
+def build_verb_table() -> tuple:
+    """
+    원형 → 변화형, 변화형 → 원형 사전 (과거형과 원형이 같은 read/put 같은 동사는 넣지 않음)
+    """
+    verbs = {verb: dict(zip(('third', 'past', 'participle'), regular_verb_forms(verb))) for verb in REGULAR_VERBS}
+    verbs.update({verb: dict(zip(('third', 'past', 'participle'), forms)) for verb, forms in IRREGULAR_VERBS.items()})
+    for verb, forms in verbs.items():
+        forms['base'] = verb
+    lemmas = {form: verb for verb, forms in verbs.items() for form in forms.values() if verb != 'be'}
+    return verbs, lemmas
+
+
+VERB_FORMS, VERB_LEMMAS = build_verb_table()
+
+
+def word_alternation(words) -> str:
+    return '|'.join(sorted((re.escape(word) for word in set(words)), key=len, reverse=True))
+
+
+PRESENT_VERBS = word_alternation(
+    form for verb, forms in VERB_FORMS.items() if verb != 'be' for form in (forms['base'], forms['third']))
+NON_BASE_VERBS = word_alternation(
+    form for verb, forms in VERB_FORMS.items() if verb != 'be'
+    for form in (forms['third'], forms['past'], forms['participle']) if form != verb)
+PAST_ONLY_VERBS = word_alternation(
+    forms['past'] for forms in VERB_FORMS.values() if forms['past'] != forms['participle'])
+BASE_VERBS = word_alternation(verb for verb in VERB_FORMS if verb != 'be')
+COMPARATIVES = word_alternation((
+    'bigger', 'taller', 'faster', 'smaller', 'older', 'younger', 'longer', 'shorter', 'higher', 'cheaper', 'easier',
+    'happier', 'better', 'worse', 'larger', 'stronger', 'smarter', 'colder', 'hotter', 'prettier', 'heavier',
+    'busier', 'nicer', 'warmer', 'cooler', 'slower', 'kinder', 'wiser'))
+SUPERLATIVES = word_alternation((
+    'biggest', 'tallest', 'fastest', 'smallest', 'oldest', 'youngest', 'longest', 'shortest', 'highest', 'easiest',
+    'happiest', 'best', 'worst', 'largest', 'strongest', 'coldest', 'hottest', 'prettiest', 'heaviest', 'busiest'))
+
+
+def previous_word(match, group: str = None) -> str:
+    """
+    매치(또는 그룹) 바로 앞 단어 (소문자, 구두점이 있으면 절이 새로 시작한 것으로 보고 '')
+    """
+    before = match.string[:match.start(group) if group else match.start()].rstrip()
+    if not before or before[-1] in '.,;:!?"()[]→>' or not before[-1].isascii():
+        return ''
+    words = ENGLISH_WORD.findall(before[-20:])
+    return words[-1].lower() if words else ''
+
+
+def expected_verb(person: str, verb: str, past: bool) -> str:
+    forms = VERB_FORMS[verb]
+    if verb == 'be':
+        return BE_FORMS[person][1 if past else 0]
+    if past:
+        return forms['past']
+    return forms['third'] if person == 'third' else verb
+
+
+def fix_subject_verb(match, sentence_past: bool):
+    """
+    주어 대명사 + 동사: 수 일치와 (과거 표현이 있으면) 시제
+    """
+    subject, verb = match.group('s'), match.group('v')
+    person = SUBJECT_PRONOUNS[subject.lower()]
+    previous = previous_word(match)
+    if previous in AUXILIARIES or previous in ('if', 'wish', 'as'):
+        # "Does he like ...?" 의문문, "if I were" 가정법
+        return None
+    if previous in ('and', 'or', 'nor'):
+        # "He and I are" 처럼 대명사가 등위 주어의 일부면 동사는 주어 전체와 일치
+        return None
+    if subject.lower() in ('you', 'it') and previous not in CLAUSE_STARTERS:
+        return None
+    lower = verb.lower()
+    if lower in ('am', 'is', 'are', 'was', 'were'):
+        past = lower in ('was', 'were') or sentence_past
+        rule = '시제' if sentence_past and lower in ('am', 'is', 'are') else 'be동사 수 일치'
+        expected = expected_verb(person, 'be', past)
+    else:
+        lemma = VERB_LEMMAS[lower]
+        expected = expected_verb(person, lemma, sentence_past)
+        rule = '시제' if sentence_past else '주어-동사 수 일치'
+    if expected == lower:
+        return None
+    return f"{subject} {expected}", rule
+
+
+def fix_auxiliary(match, sentence_past: bool):
+    return f"{match.group('a')} {match.group('n') or ''}{VERB_LEMMAS[match.group('v').lower()]}", '조동사 + 동사원형'
+
+
+def fix_to_infinitive(match, sentence_past: bool):
+    return f"{match.group('w')} to {VERB_LEMMAS[match.group('v').lower()]}", 'to부정사'
+
+
+def fix_perfect(match, sentence_past: bool):
+    verb = VERB_LEMMAS[match.group('v').lower()]
+    return f"{match.group('h')} {match.group('adv') or ''}{VERB_FORMS[verb]['participle']}", '현재완료'
+
+
+def fix_article(match, sentence_past: bool):
+    article, word = match.group('art'), match.group('w')
+    lower = word.lower()
+    if not word[0].islower():
+        return None   # 약어/고유명사 (an MP3, a UFO)
+    vowel_sound = lower[0] in 'aeiou' and not lower.startswith(CONSONANT_SOUND_PREFIXES) \
+        or lower.startswith(SILENT_H_WORDS)
+    expected = 'an' if vowel_sound else 'a'
+    if article.lower() == expected:
+        return None
+    return f"{expected if article.islower() else expected.capitalize()} {word}", '관사 a/an'
+
+
+def fix_double_comparative(match, sentence_past: bool):
+    return match.group('w'), '비교급/최상급'
+
+
+def fix_there_be(match, sentence_past: bool):
+    expected = {'is': 'are', 'was': 'were', 'are': 'is', 'were': 'was'}[match.group('v').lower()]
+    return f"{match.group('t')} {expected} {match.group('q')}", 'there is/are'
+
+
+def fix_gerund(match, sentence_past: bool):
+    return f"{match.group('w')} {ing_form(match.group('v').lower())}", '동명사'
+
+
+# (정규식, 고친 표현과 규칙 이름을 돌려주는 함수 - 문제가 없으면 None) - 임포트할 때 한 번만 컴파일
+GRAMMAR_RULES = [
+    (re.compile(rf"\b(?P<s>I|you|we|they|he|she|it)\s+(?P<v>am|is|are|was|were|{PRESENT_VERBS})\b", re.IGNORECASE),
+     fix_subject_verb),
+    (re.compile(rf"\b(?P<a>do|does|did|don't|doesn't|didn't|can|could|will|would|should|must|may|might|can't|won't)"
+                rf"\s+(?P<n>not\s+)?(?P<v>{NON_BASE_VERBS})\b", re.IGNORECASE), fix_auxiliary),
+    (re.compile(rf"\b(?P<w>want|wants|wanted|need|needs|needed|hope|hopes|hoped|plan|plans|planned|decide|decided)"
+                rf"\s+to\s+(?P<v>{NON_BASE_VERBS})\b", re.IGNORECASE), fix_to_infinitive),
+    (re.compile(rf"\b(?P<h>have|has|had|haven't|hasn't)\s+(?P<adv>(?:not|never|already|just|ever)\s+)?"
+                rf"(?P<v>{PAST_ONLY_VERBS})\b", re.IGNORECASE), fix_perfect),
+    (re.compile(r"\b(?P<art>an?)\s+(?P<w>[A-Za-z][a-z]*)\b", re.IGNORECASE), fix_article),
+    (re.compile(rf"\b(?:more|most)\s+(?P<w>{COMPARATIVES}|{SUPERLATIVES})\b", re.IGNORECASE), fix_double_comparative),
+    (re.compile(r"\b(?P<t>there)\s+(?P<v>is|was)\s+(?P<q>(?:two|three|four|five|many|several|some|\d+)\s+[a-z]+s)\b",
+                re.IGNORECASE), fix_there_be),
+    (re.compile(r"\b(?P<t>there)\s+(?P<v>are|were)\s+(?P<q>(?:a|an|one)\s+[a-z]+)\b", re.IGNORECASE), fix_there_be),
+    (re.compile(rf"\b(?P<w>enjoy|enjoys|enjoyed|finish|finishes|finished|mind|minds|keep|keeps|kept|avoid|avoided)"
+                rf"\s+to\s+(?P<v>{BASE_VERBS})\b", re.IGNORECASE), fix_gerund),
+]
+# 문장에 과거형 동사가 이미 있으면 과거 표현이 있어도 시제 규칙은 적용하지 않음 ("He says he went yesterday")
+PAST_VERB = re.compile(rf"\b(?:was|were|{word_alternation(f['past'] for f in VERB_FORMS.values())})\b", re.IGNORECASE)
+
+
+def grammar_errors(sentence: str) -> list:
+    """
+    문장에서 규칙에 걸린 곳 [(시작, 끝, 고친 표현, 규칙), ...] (겹치면 앞의 것만)
+    """
+    sentence_past = bool(PAST_MARKER.search(sentence)) and not PAST_VERB.search(sentence)
+    errors = []
+    for pattern, fix in GRAMMAR_RULES:
+        for match in pattern.finditer(sentence):
+            fixed = fix(match, sentence_past)
+            if fixed is not None:
+                errors.append((match.start(), match.end()) + fixed)
+    errors.sort()
+    kept = []
+    for error in errors:
+        if not kept or error[0] >= kept[-1][1]:
+            kept.append(error)
+    return kept
+
+
+def apply_corrections(sentence: str, errors: list) -> str:
+    corrected, position = [], 0
+    for start, end, replacement, _ in errors:
+        corrected += [sentence[position:start], replacement]
+        position = end
+    return ''.join(corrected) + sentence[position:]
+
+
+def subject_person(words: list):
+    """
+    빈칸 앞 단어들로 주어의 인칭/수 ('i' / 'third' / 'plural'), 모르면 None
+    """
+    tokens = [word.lower() for word in words]
+    while tokens and tokens[-1] in FREQUENCY_ADVERBS:
+        tokens.pop()
+    if not tokens:
+        return None
+    last = tokens[-1]
+    previous = tokens[-2] if len(tokens) > 1 else ''
+    if last in SUBJECT_PRONOUNS:
+        return SUBJECT_PRONOUNS[last]
+    if 'and' in tokens[-4:-1] or last in IRREGULAR_PLURALS or previous in PLURAL_DETERMINERS:
+        return 'plural'
+    if previous in DETERMINERS or previous.endswith("'s"):
+        plural = last.endswith('s') and not last.endswith(('ss', 'us', 'is')) and previous not in (
+            'a', 'an', 'this', 'that', 'every', 'each')
+        return 'plural' if plural else 'third'
+    if len(tokens) == 1 and words[-1][0].isupper() and last not in AUXILIARIES:
+        return 'third'   # 이름 (Tom, Jane)
+    return None
 
 
-async def search_rag(text: str, academy_id: int, env) -> list:
+def english_sentence_around(text: str, start: int, end: int) -> tuple:
     """
-    Vectorize DB에서 관련 학원 자료 검색
+    빈칸이 들어 있는 영어 문장과 그 안에서의 빈칸 위치 (시작, 끝)
+    앞은 마침표/물음표/콜론/한글/줄바꿈 다음부터, 뒤는 문장 부호/한글/줄바꿈까지
     """
-    try:
-        if not hasattr(env, 'VECTORIZE'):
-            return []
-        
-        # Vectorize 검색
-        vectorize = env.VECTORIZE
-        
-        # 텍스트 임베딩 후 검색
-        results = await vectorize.query(text, topK=5)
-        
-        # academy_id로 필터링
-        filtered = [
-            r.get('metadata', {}).get('content', '')
-            for r in results.get('matches', [])
-            if r.get('metadata', {}).get('academyId') == academy_id
-        ]
-        
-        return filtered[:3]  # 상위 3개만 반환
-        
-    except Exception as e:
-        print(f"RAG 검색 오류: {str(e)}")
-        return []
+    left = start
+    while left > 0 and not (text[left - 1] in '.?!:\n' or '가' <= text[left - 1] <= '힣'):
+        left -= 1
+    while left < start and text[left].isspace():
+        left += 1
+    right = end
+    while right < len(text) and not (text[right] in '.?!\n' or '가' <= text[right] <= '힣'):
+        right += 1
+    return text[left:right + 1].rstrip(), start - left, end - left
 
 
-def detect_subject(text: str) -> str:
+def acceptable_forms(sentence: str, start: int, end: int, lemma: str) -> set:
     """
-    과목 자동 감지
+    빈칸에 들어갈 수 있는 lemma의 형태 (주어와 시간 표현으로 결정, 주어를 모르면 빈 집합)
     """
-    # 수학 키워드
-    math_keywords = ['=', '+', '-', '×', '÷', '/', '*', '방정식', '함수', '미분', '적분', 
-                     '기하', '대수', '삼각', 'sin', 'cos', 'tan', '²', '³', '√']
-    
-    # 영어 키워드
-    english_keywords = ['be동사', '조동사', '시제', '문법', '어법', 'grammar', 
-                        'the', 'is', 'are', 'was', 'were', 'have', 'has']
+    words_before = ENGLISH_WORD.findall(sentence[:start])
+    while words_before and words_before[-1].lower() in FREQUENCY_ADVERBS:
+        words_before.pop()
+    if words_before and words_before[-1].lower() in AUXILIARIES:
+        return {lemma}
+    # "( ) you happy?" 처럼 빈칸이 문장 앞이면 뒤의 주어로 판단
+    person = subject_person(words_before) if words_before else subject_person(ENGLISH_WORD.findall(sentence[end:])[:1])
+    if person is None:
+        return set()
+    if PAST_MARKER.search(sentence):
+        return {expected_verb(person, lemma, True)}
+    if PRESENT_MARKER.search(sentence):
+        return {expected_verb(person, lemma, False)}
+    return {expected_verb(person, lemma, False), expected_verb(person, lemma, True)}
+
+
+def verb_lemma(word: str):
+    return 'be' if word in ('am', 'is', 'are', 'was', 'were') else VERB_LEMMAS.get(word)
+
+
+def check_english_item(question: str, answer: str):
+    """
+    영어 문항 하나 판정: {'studentAnswer', 'correctAnswer', 'isCorrect', 'rule'} 또는 판단 불가 None
+    """
+    # 1. "어법상 틀린 것을 고르시오 ① ... ② ..." - 규칙에 걸리는 보기가 하나뿐일 때
+    options = CIRCLED_OPTION.findall(question)
+    if len(options) >= 2 and ('틀린' in question or '어색한' in question):
+        flagged = [mark for mark, option in options if grammar_errors(option)]
+        chosen = re.search(rf'[{CIRCLED_NUMBERS}]|[1-9]', answer)
+        if len(flagged) != 1 or not chosen:
+            return None
+        mark = chosen.group(0)
+        mark = mark if mark in CIRCLED_NUMBERS else CIRCLED_NUMBERS[int(mark) - 1]
+        return {'studentAnswer': answer, 'correctAnswer': flagged[0], 'isCorrect': mark == flagged[0], 'rule': '어법 선택'}
     
-    math_score = sum(1 for keyword in math_keywords if keyword in text)
-    english_score = sum(1 for keyword in english_keywords if keyword.lower() in text.lower())
+    # 2. 빈칸 채우기 / (go / goes) 고르기
+    blank = ENGLISH_BLANK.search(question)
+    words = ENGLISH_WORD.findall(answer)
+    if blank and 1 <= len(words) <= 2:
+        sentence, start, end = english_sentence_around(question, blank.start(), blank.end())
+        student = words[-1].lower()
+        if blank.group('first'):
+            choices = [blank.group('first').lower(), blank.group('second').lower()]
+            lemma = verb_lemma(choices[0])
+            if lemma is None or verb_lemma(choices[1]) != lemma or student not in choices:
+                return None
+            valid = [choice for choice in choices if choice in acceptable_forms(sentence, start, end, lemma)]
+            if len(valid) != 1:
+                return None
+            return {'studentAnswer': answer, 'correctAnswer': valid[0], 'isCorrect': student == valid[0],
+                    'rule': '동사 형태 선택'}
+        lemma = verb_lemma(student)
+        acceptable = acceptable_forms(sentence, start, end, lemma) if lemma else set()
+        if not acceptable:
+            return None
+        return {'studentAnswer': answer, 'correctAnswer': answer if student in acceptable else sorted(acceptable)[0],
+                'isCorrect': student in acceptable, 'rule': 'be동사 빈칸' if lemma == 'be' else '동사 빈칸'}
     
-    if math_score > english_score:
-        return 'math'
-    elif english_score > math_score:
-        return 'english'
-    else:
-        return 'other'
+    # 3. 문장으로 쓴 답 (문장 바꿔 쓰기, 영작) - 규칙에 걸리면 오답, 안 걸리면 LLM이 판단
+    if len(words) >= MIN_SENTENCE_WORDS:
+        errors = grammar_errors(answer)
+        if errors:
+            return {'studentAnswer': answer, 'correctAnswer': apply_corrections(answer, errors), 'isCorrect': False,
+                    'rule': ', '.join(dict.fromkeys(error[3] for error in errors))}
+    return None
 
 
-def calculate_math_simple(text: str) -> dict:
+def check_english_grammar(text: str) -> dict:
     """
-    간단한 수학 계산 (Python 내장 함수 사용)
-    실제 환경에서는 SymPy 사용 권장
+    영어 페이지의 문항별 어법 판정 (확실한 것만), 키는 문항 번호 ("3번", 번호가 없으면 "2번째 줄")
+    같은 답 줄이 여러 문항에 있어도 덮어쓰지 않도록 줄이 아니라 문항 단위로 저장하고, 줄은 line에 둠
+    문항 번호가 있으면 questionNumber를 함께 넣어 문항 단위 로컬 채점에 사용
     """
-    try:
-        calculations = {}
-        
-        # 간단한 수식 찾기 (예: "2 + 2 = 4")
-        patterns = [
-            r'(\d+)\s*\+\s*(\d+)\s*=\s*(\d+)',  # 덧셈
-            r'(\d+)\s*-\s*(\d+)\s*=\s*(\d+)',   # 뺄셈
-            r'(\d+)\s*×\s*(\d+)\s*=\s*(\d+)',   # 곱셈
-            r'(\d+)\s*÷\s*(\d+)\s*=\s*(\d+)',   # 나눗셈
-        ]
-        
-        for pattern in patterns:
-            matches = re.finditer(pattern, text)
-            for match in matches:
-                a, b, student_answer = match.groups()
-                a, b, student_answer = int(a), int(b), int(student_answer)
-                
-                # 연산 수행
-                if '+' in match.group():
-                    correct_answer = a + b
-                elif '-' in match.group():
-                    correct_answer = a - b
-                elif '×' in match.group():
-                    correct_answer = a * b
-                elif '÷' in match.group():
-                    correct_answer = a // b if b != 0 else 0
-                else:
-                    continue
-                
-                calculations[match.group()] = {
-                    'studentAnswer': student_answer,
-                    'correctAnswer': correct_answer,
-                    'isCorrect': student_answer == correct_answer
-                }
-        
-        return calculations if calculations else None
-        
-    except Exception as e:
-        print(f"수학 계산 오류: {str(e)}")
-        return None
+    units = split_questions(text)
+    if not units:
+        units = [{'number': None, 'text': line.strip()} for line in text.splitlines() if line.strip()]
+    
+    verdicts = {}
+    for index, unit in enumerate(units, start=1):
+        body = QUESTION_START.sub('', unit['text'], count=1) if unit['number'] is not None else unit['text']
+        answers = list(ENGLISH_ANSWER.finditer(body))
+        if len(answers) != 1:
+            continue
+        answer = answers[0].group(1).strip()
+        verdict = check_english_item(body[:answers[0].start()], answer)
+        if verdict is None:
+            continue
+        line = next((line.strip() for line in unit['text'].splitlines() if answer in line), answer)
+        verdict['line'] = line
+        if unit['number'] is not None:
+            verdict['questionNumber'] = unit['number']
+        verdict['method'] = 'grammar'
+        verdicts[f"{unit['number']}번" if unit['number'] is not None else f"{index}번째 줄"] = verdict
+    return verdicts or None
 
 
-async def final_grading(
-    ocr_text: str,
-    calculation_result: dict,
-    rag_context: list,
-    system_prompt: str,
-    model: str,
-    temperature: float,
-    env
-) -> dict:
+def build_grading_context(ocr_text: str, calculation_result: dict, rag_context: list) -> str:
     """
-    최종 채점 결과 생성 - 설정된 모델 사용
+    채점 프롬프트에 들어갈 페이지 컨텍스트 (OCR 텍스트 + 계산 검증 + RAG 자료)
     """
-    try:
-        # 컨텍스트 구성
-        context = f"""
+    context = f"""
 이미지에서 읽은 내용:
 {ocr_text}
 
 """
-        
-        if calculation_result:
-            context += f"""
-수학 계산 검증 결과:
+    
+    if calculation_result:
+        # 영어 페이지는 어법 규칙 판정, 그 외는 수식 계산 결과
+        label = '영어 어법 검증 결과' if all(result.get('method') == 'grammar' for result in calculation_result.values()) \
+            else '수학 계산 검증 결과'
+        context += f"""
+{label}:
 {json.dumps(calculation_result, ensure_ascii=False, indent=2)}
 
 """
-        
-        if rag_context:
-            context += f"""
+    
+    if rag_context:
+        context += f"""
 학원 지식 베이스 참고 자료:
 {chr(10).join(f"- {item}" for item in rag_context)}
 
 """
-        
-        # DeepSeek 모델 사용
-        if model == 'deepseek-ocr-2' or model.startswith('deepseek'):
-            print(f"🤖 DeepSeek 모델 사용: {model}")
-            # Novita_AI_API 우선, 없으면 ALL_AI_API_KEY 사용
-            api_key = None
-            if hasattr(env, 'Novita_AI_API') and env.Novita_AI_API:
-                api_key = env.Novita_AI_API
-                print("✅ Novita_AI_API 키 사용")
-            elif hasattr(env, 'ALL_AI_API_KEY') and env.ALL_AI_API_KEY:
-                api_key = env.ALL_AI_API_KEY
-                print("✅ ALL_AI_API_KEY 키 사용")
-            
-            if not api_key:
-                print("⚠️ DeepSeek API 키 없음, Gemini로 폴백")
-                return await grade_with_gemini(context, system_prompt, temperature, env)
-            
-            url = "https://api.deepseek.com/v1/chat/completions"
-            
-            grading_prompt = f"""숙제 채점 (한국어):
+    
+    return context
+
+
+def build_grading_prompt(context: str) -> str:
+    """
+    간결한 채점 프롬프트 - 부족한 개념 중심, 문제 내용 제거
+    """
+    return f"""숙제 채점 (한국어):
 {context}
 
 다음 JSON으로만 응답 (부족한 개념 중심, 개선점 40토큰 제한):
@@ -414,53 +4538,91 @@ async def final_grading(
 }}
 
 중요: detailedResults에는 questionNumber와 isCorrect만, overallFeedback은 부족한 개념 중심, improvements는 40토큰 이내."""
+
+
+def empty_grading(feedback: str) -> dict:
+    """
+    채점하지 못했을 때의 기본 응답
+    """
+    return {
+        'totalQuestions': 0,
+        'correctAnswers': 0,
+        'detailedResults': [],
+        'overallFeedback': feedback,
+        'strengths': '',
+        'improvements': ''
+    }
+
+
+async def final_grading(
+    ocr_text: str,
+    calculation_result: dict,
+    rag_context: list,
+    system_prompt: str,
+    model: str,
+    temperature: float,
+    env,
+    deadline: Deadline = None
+) -> dict:
+    """
+    최종 채점 결과 생성 - 설정된 모델 사용
+    deadline이 있으면 남은 시간 안에서만 호출하고, 폴백할 시간이 없으면 DeadlineExceeded
+    """
+    try:
+        # 컨텍스트 구성
+        context = build_grading_context(ocr_text, calculation_result, rag_context)
+        
+        # DeepSeek 모델 사용
+        if model == 'deepseek-ocr-2' or model.startswith('deepseek'):
+            print(f"🤖 DeepSeek 모델 사용: {model}")
+            api_key = get_deepseek_api_key(env)
             
-            payload = {
-                "model": "deepseek-chat",
-                "messages": [
-                    {"role": "user", "content": grading_prompt}
-                ],
-                "temperature": temperature,
-                "max_tokens": 400,
-                "response_format": {"type": "json_object"}
-            }
-            
-            headers = Headers.new({
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {api_key}'
-            }.items())
+            if not api_key:
+                print("⚠️ DeepSeek API 키 없음, Gemini로 폴백")
+                return await grade_with_gemini(context, system_prompt, temperature, env, deadline=deadline)
             
-            response = await fetch(url,
-                method='POST',
-                headers=headers,
-                body=json.dumps(payload)
-            )
+            breaker = get_circuit_breaker('deepseek', 'grade', env)
+            if not breaker.allow():
+                print("⚡ DeepSeek 채점 회로 차단 중, Gemini로 바로 채점")
+                return await grade_with_gemini(context, system_prompt, temperature, env, deadline=deadline)
             
-            result = await response.json()
+            try:
+                response_text = await call_deepseek_chat(
+                    [{"role": "user", "content": build_grading_prompt(context)}],
+                    api_key, max_tokens=400, temperature=temperature, json_mode=True, breaker=breaker,
+                    deadline=fallback_deadline(deadline, env), env=env
+                )
+            except DeadlineExceeded:
+                print("⏱️ DeepSeek 채점 시간 초과")
+                response_text = None
             
-            if result.get('choices') and len(result['choices']) > 0:
-                response_text = result['choices'][0]['message']['content']
+            if response_text:
                 grading_result = json.loads(response_text)
                 print(f"✅ DeepSeek 채점 완료")
                 return grading_result
             
             print(f"⚠️ DeepSeek 응답 없음, Gemini로 폴백")
-            return await grade_with_gemini(context, system_prompt, temperature, env)
+            ensure_fallback_budget(deadline, env, '채점')
+            return await grade_with_gemini(context, system_prompt, temperature, env, deadline=deadline)
         
         # Gemini API 사용 (기본)
         else:
-            return await grade_with_gemini(context, system_prompt, temperature, env)
+            return await grade_with_gemini(context, system_prompt, temperature, env, deadline=deadline)
         
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"최종 채점 오류: {str(e)}, Gemini로 폴백")
-        return await grade_with_gemini(context, system_prompt, temperature, env)
+        ensure_fallback_budget(deadline, env, '채점')
+        return await grade_with_gemini(context, system_prompt, temperature, env, deadline=deadline)
 
 
 async def grade_with_gemini(
     context: str,
     system_prompt: str,
     temperature: float,
-    env
+    env,
+    deadline: Deadline = None
 ) -> dict:
     """
     Gemini로 채점 수행
@@ -469,93 +4631,382 @@ async def grade_with_gemini(
         api_key = env.GEMINI_API_KEY if hasattr(env, 'GEMINI_API_KEY') else None
         
         if not api_key:
-            return {
-                'totalQuestions': 0,
-                'correctAnswers': 0,
-                'detailedResults': [],
-                'overallFeedback': 'API 키가 설정되지 않았습니다.',
-                'strengths': '',
-                'improvements': ''
-            }
+            return empty_grading('API 키가 설정되지 않았습니다.')
+        
+        response_text = await call_gemini(
+            [{"text": build_grading_prompt(context)}],
+            api_key, max_output_tokens=400, temperature=temperature,
+            breaker=get_circuit_breaker('gemini', 'grade', env), deadline=deadline, env=env
+        )
+        
+        if response_text:
+            # JSON 파싱 (```json ... ``` 형식 처리, 에러 처리 추가)
+            try:
+                grading_result = parse_json_response(response_text)
+                print(f"✅ Gemini 채점 완료")
+                return grading_result
+            except json.JSONDecodeError as e:
+                print(f"⚠️ JSON 파싱 오류: {str(e)}")
+                print(f"응답 텍스트 일부: {response_text[:300]}")
+                # 기본 응답 반환
+                return empty_grading(f'AI 응답을 파싱할 수 없습니다. 원본 응답: {response_text[:100]}...')
         
-        url = f"https://generativelanguage.googleapis.com/v1/models/gemini-2.5-flash-lite:generateContent?key={api_key}"
+        return empty_grading('AI 응답을 받을 수 없습니다.')
         
-        # 간결한 채점 프롬프트 - 부족한 개념 중심, 문제 내용 제거
-        grading_prompt = f"""숙제 채점 (한국어):
-{context}
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        print(f"Gemini 채점 오류: {str(e)}")
+        return empty_grading(f'채점 오류: {str(e)}')
 
-다음 JSON으로만 응답 (부족한 개념 중심, 개선점 40토큰 제한):
-{{
-  "totalQuestions": 5,
-  "correctAnswers": 3,
-  "detailedResults": [{{"questionNumber": 1, "isCorrect": true}}, {{"questionNumber": 2, "isCorrect": false}}],
-  "overallFeedback": "부족한 개념: 분수 연산, 도형 기초. 반복 학습 필요.",
-  "improvements": "분수 곱셈 개념 재학습. 도형 특징 암기."
-}}
 
-중요: detailedResults에는 questionNumber와 isCorrect만, overallFeedback은 부족한 개념 중심, improvements는 40토큰 이내."""
+def estimate_tokens(text: str) -> int:
+    """
+    토큰 수 대략 추정 (한글은 글자당 1토큰 내외, 영문/숫자는 더 적음 → 보수적으로 글자 수 사용)
+    """
+    return len(text) if text else 0
+
+
+def get_deepseek_api_key(env):
+    """
+    DeepSeek API 키: Novita_AI_API 우선, 없으면 ALL_AI_API_KEY
+    """
+    if hasattr(env, 'Novita_AI_API') and env.Novita_AI_API:
+        return env.Novita_AI_API
+    if hasattr(env, 'ALL_AI_API_KEY') and env.ALL_AI_API_KEY:
+        return env.ALL_AI_API_KEY
+    return None
+
+
+def parse_json_response(response_text: str):
+    """
+    LLM 응답에서 JSON 추출 (```json ... ``` 형식 처리)
+    """
+    json_match = re.search(r'```json\s*(.*?)\s*```', response_text, re.DOTALL)
+    if json_match:
+        response_text = json_match.group(1)
+    return json.loads(response_text)
+
+
+# provider 호출 재시도 설정 (429 / 5xx / 네트워크 오류)
+PROVIDER_MAX_RETRIES = 2        # 첫 호출 이후 최대 재시도 횟수
+RETRY_BASE_DELAY_MS = 500       # 지수 백오프 기본값 (500ms → 1s → 2s ..., 0~상한 사이 무작위)
+RETRY_MAX_DELAY_MS = 8000       # 백오프 대기의 상한 (Retry-After가 이보다 길면 재시도하지 않음)
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+# fetch 자체가 실패한 JS 오류 이름 (연결 끊김은 TypeError, JSON 파싱 실패 SyntaxError 등은 재시도하지 않음)
+RETRYABLE_JS_ERRORS = {'TypeError', 'NetworkError', 'TimeoutError'}
+
+# isolate 전체 재시도 카운터
+provider_retry_stats = {
+    'retries': 0,          # 재시도한 횟수
+    'recovered': 0,        # 재시도 끝에 성공한 호출
+    'exhausted': 0,        # 재시도해도 실패한 호출 (재시도 횟수/마감 시간/회로 차단)
+}
+
+
+class ProviderError(Exception):
+    """
+    provider가 2xx가 아닌 HTTP 상태를 반환함
+    """
+    
+    def __init__(self, provider: str, status: int, message: str, retry_after: float = None):
+        super().__init__(f"{provider} HTTP {status}: {message}")
+        self.provider = provider
+        self.status = status
+        self.retry_after = retry_after
+    
+    @property
+    def retryable(self) -> bool:
+        return self.status in RETRYABLE_STATUS
+
+
+def parse_retry_after(value):
+    """
+    Retry-After 헤더 (초 또는 HTTP 날짜) → 대기 시간(초), 없거나 잘못된 값이면 None
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+async def raise_for_status(provider: str, response):
+    """
+    2xx가 아닌 응답이면 ProviderError (Retry-After 포함)
+    """
+    if response.ok:
+        return
+    try:
+        message = (await response.text())[:200]
+    except Exception:
+        message = ''
+    raise ProviderError(provider, response.status, message,
+                        retry_after=parse_retry_after(response.headers.get('Retry-After')))
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    재시도할 오류인지: 408/429/5xx 응답, 네트워크 오류, 시간 초과만 재시도
+    마감 시간 초과, 4xx, 응답 형식 오류(KeyError/TypeError/JSON 파싱 등)는 다시 보내도 같은 결과
+    """
+    if isinstance(error, DeadlineExceeded):
+        return False
+    if isinstance(error, ProviderError):
+        return error.retryable
+    if isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, JsException):
+        name = getattr(error, 'name', None) or str(error).split(':', 1)[0].strip()
+        return name in RETRYABLE_JS_ERRORS
+    return False
+
+
+def retry_delay(attempt: int, error: Exception, env):
+    """
+    재시도 대기 시간(초): Retry-After가 있으면 그 값, 없으면 지수 백오프 + full jitter (RETRY_MAX_DELAY_MS 이내)
+    Retry-After가 RETRY_MAX_DELAY_MS보다 길면 None → 재시도하지 않음 (서버가 요구한 시간보다 일찍 보내지 않음)
+    """
+    cap = get_env_int(env, 'RETRY_MAX_DELAY_MS', RETRY_MAX_DELAY_MS) / 1000
+    if isinstance(error, ProviderError) and error.retry_after is not None:
+        return error.retry_after if error.retry_after <= cap else None
+    base = get_env_int(env, 'RETRY_BASE_DELAY_MS', RETRY_BASE_DELAY_MS) / 1000
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+async def call_with_retry(call, breaker: CircuitBreaker, deadline: Deadline, env, what: str):
+    """
+    provider 호출 + 재시도 (LLM 생성 호출은 같은 요청을 다시 보내도 안전)
+    - 시도마다 마감 시간을 적용하고 회로 차단기에 결과를 기록
+    - Retry-After가 상한이나 남은 마감 시간보다 길거나 회로가 열리면 더 이상 재시도하지 않고 오류를 그대로 올림
+    """
+    max_retries = max(0, get_env_int(env, 'PROVIDER_MAX_RETRIES', PROVIDER_MAX_RETRIES))
+    attempt = 0
+    
+    while True:
+        try:
+            result = await call_with_breaker(lambda: with_deadline(call(), deadline, what), breaker)
+            if attempt > 0:
+                provider_retry_stats['recovered'] += 1
+            return result
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            
+            delay = retry_delay(attempt, e, env)
+            out_of_time = delay is None or (deadline is not None and delay >= deadline.remaining())
+            if attempt >= max_retries or out_of_time or (breaker is not None and breaker.state == 'open'):
+                provider_retry_stats['exhausted'] += 1
+                raise
+            
+            attempt += 1
+            provider_retry_stats['retries'] += 1
+            print(f"🔁 {what} 재시도 {attempt}/{max_retries} ({delay:.1f}초 후): {str(e)}")
+            await asyncio.sleep(delay)
+
+
+async def call_deepseek_chat(messages: list, api_key: str, max_tokens: int, temperature: float,
+                             json_mode: bool = False, breaker=None, deadline: Deadline = None, env=None):
+    """
+    DeepSeek chat completions 호출, 응답 텍스트 반환 (응답 없으면 None)
+    429/5xx/네트워크 오류는 재시도, breaker가 있으면 성공/실패와 지연 시간을 기록
+    deadline을 넘기면 DeadlineExceeded
+    """
+    payload = {
+        "model": "deepseek-chat",
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+    if json_mode:
+        payload["response_format"] = {"type": "json_object"}
+    
+    headers = Headers.new({
+        'Content-Type': 'application/json',
+        'Authorization': f'Bearer {api_key}'
+    }.items())
+    body = provider_body(payload)
+    
+    async def call():
+        response = await fetch(DEEPSEEK_API_URL,
+            method='POST',
+            headers=headers,
+            body=body
+        )
+        await raise_for_status('DeepSeek', response)
         
-        payload = {
-            "contents": [{
-                "parts": [{"text": grading_prompt}]
-            }],
-            "generationConfig": {
-                "temperature": temperature,
-                "maxOutputTokens": 400
-            }
-        }
+        result = await response.json()
         
-        headers = Headers.new({'Content-Type': 'application/json'}.items())
-        response = await fetch(url,
+        if result.get('choices') and len(result['choices']) > 0:
+            return result['choices'][0]['message']['content']
+        return None
+    
+    return await call_with_retry(call, breaker, deadline, env, 'DeepSeek 호출')
+
+
+async def call_gemini(parts: list, api_key: str, max_output_tokens: int, temperature: float = None,
+                      breaker=None, deadline: Deadline = None, env=None):
+    """
+    Gemini generateContent 호출, 응답 텍스트 반환 (응답 없으면 None)
+    429/5xx/네트워크 오류는 재시도, breaker가 있으면 성공/실패와 지연 시간을 기록
+    deadline을 넘기면 DeadlineExceeded
+    """
+    generation_config = {"maxOutputTokens": max_output_tokens}
+    if temperature is not None:
+        generation_config["temperature"] = temperature
+    
+    payload = {
+        "contents": [{"parts": parts}],
+        "generationConfig": generation_config
+    }
+    
+    headers = Headers.new({'Content-Type': 'application/json'}.items())
+    body = provider_body(payload)
+    
+    async def call():
+        response = await fetch(f"{GEMINI_API_URL}?key={api_key}",
             method='POST',
             headers=headers,
-            body=json.dumps(payload)
+            body=body
         )
+        await raise_for_status('Gemini', response)
         
         result = await response.json()
         
         if result.get('candidates') and len(result['candidates']) > 0:
-            response_text = result['candidates'][0]['content']['parts'][0]['text']
-            
-            # JSON 추출 (```json ... ``` 형식 처리)
-            json_match = re.search(r'```json\s*(.*?)\s*```', response_text, re.DOTALL)
-            if json_match:
-                response_text = json_match.group(1)
-            
-            # JSON 파싱 (에러 처리 추가)
-            try:
-                grading_result = json.loads(response_text)
-                print(f"✅ Gemini 채점 완료")
-                return grading_result
-            except json.JSONDecodeError as e:
-                print(f"⚠️ JSON 파싱 오류: {str(e)}")
-                print(f"응답 텍스트 일부: {response_text[:300]}")
-                # 기본 응답 반환
-                return {
-                    'totalQuestions': 0,
-                    'correctAnswers': 0,
-                    'detailedResults': [],
-                    'overallFeedback': f'AI 응답을 파싱할 수 없습니다. 원본 응답: {response_text[:100]}...',
-                    'strengths': '',
-                    'improvements': ''
-                }
+            return result['candidates'][0]['content']['parts'][0]['text']
+        return None
+    
+    return await call_with_retry(call, breaker, deadline, env, 'Gemini 호출')
+
+
+def build_batch_grading_prompt(contexts: list) -> str:
+    """
+    여러 페이지를 한 번에 채점하는 프롬프트 (채점 지시와 JSON 예시는 한 번만)
+    """
+    pages = "\n".join(
+        f"=== 페이지 {number} ===\n{context}"
+        for number, context in enumerate(contexts, start=1)
+    )
+    
+    return f"""숙제 채점 (한국어). 아래 {len(contexts)}개 페이지를 페이지별로 따로 채점:
+{pages}
+
+다음 JSON으로만 응답 (pages에 페이지마다 하나씩, 부족한 개념 중심, 개선점 40토큰 제한):
+{{
+  "pages": [
+    {{
+      "page": 1,
+      "totalQuestions": 5,
+      "correctAnswers": 3,
+      "detailedResults": [{{"questionNumber": 1, "isCorrect": true}}, {{"questionNumber": 2, "isCorrect": false}}],
+      "overallFeedback": "부족한 개념: 분수 연산, 도형 기초. 반복 학습 필요.",
+      "improvements": "분수 곱셈 개념 재학습. 도형 특징 암기."
+    }}
+  ]
+}}
+
+중요: page는 위 페이지 번호, detailedResults에는 questionNumber와 isCorrect만, overallFeedback은 부족한 개념 중심, improvements는 40토큰 이내."""
+
+
+def split_batch_grading(response_text: str, page_count: int) -> list:
+    """
+    배치 채점 응답을 페이지별 채점 결과로 분리
+    분리할 수 없는 페이지는 None
+    """
+    gradings = [None] * page_count
+    
+    try:
+        parsed = parse_json_response(response_text)
+    except (json.JSONDecodeError, TypeError) as e:
+        print(f"⚠️ 배치 채점 JSON 파싱 오류: {str(e)}")
+        return gradings
+    
+    entries = parsed.get('pages', []) if isinstance(parsed, dict) else parsed
+    if not isinstance(entries, list):
+        return gradings
+    
+    for position, entry in enumerate(entries):
+        if not isinstance(entry, dict) or 'totalQuestions' not in entry:
+            continue
+        grading = dict(entry)
+        try:
+            number = int(grading.pop('page', position + 1))
+        except (TypeError, ValueError):
+            number = position + 1
+        if 1 <= number <= page_count and gradings[number - 1] is None:
+            gradings[number - 1] = grading
+    
+    return gradings
+
+
+async def final_grading_batch(
+    pages: list,
+    system_prompt: str,
+    model: str,
+    temperature: float,
+    env,
+    deadline: Deadline = None
+) -> list:
+    """
+    여러 페이지를 한 번의 LLM 호출로 채점하고 페이지별 채점 결과 목록 반환
+    pages: [{'ocr_text', 'calculation_result', 'rag_context'}, ...]
+    응답에서 분리하지 못한 페이지만 final_grading으로 다시 채점
+    다시 채점하다가 마감 시간을 넘긴 페이지는 채점 결과 대신 DeadlineExceeded 객체
+    """
+    if len(pages) == 1:
+        return [await final_grading(**pages[0], system_prompt=system_prompt, model=model,
+                                    temperature=temperature, env=env, deadline=deadline)]
+    
+    contexts = [
+        build_grading_context(page['ocr_text'], page['calculation_result'], page['rag_context'])
+        for page in pages
+    ]
+    grading_prompt = build_batch_grading_prompt(contexts)
+    max_tokens = GRADING_OUTPUT_TOKENS_PER_PAGE * len(pages)
+    gradings = [None] * len(pages)
+    
+    try:
+        response_text = None
+        deepseek_key = get_deepseek_api_key(env) if model.startswith('deepseek') else None
+        deepseek_breaker = get_circuit_breaker('deepseek', 'grade', env)
         
-        return {
-            'totalQuestions': 0,
-            'correctAnswers': 0,
-            'detailedResults': [],
-            'overallFeedback': 'AI 응답을 받을 수 없습니다.',
-            'strengths': '',
-            'improvements': ''
-        }
+        if deepseek_key and deepseek_breaker.allow():
+            print(f"🤖 DeepSeek 배치 채점: {len(pages)}페이지")
+            response_text = await call_deepseek_chat(
+                [{"role": "user", "content": grading_prompt}],
+                deepseek_key, max_tokens, temperature, json_mode=True, breaker=deepseek_breaker,
+                deadline=fallback_deadline(deadline, env), env=env
+            )
+        
+        gemini_key = env.GEMINI_API_KEY if hasattr(env, 'GEMINI_API_KEY') else None
+        if response_text is None and gemini_key:
+            print(f"🤖 Gemini 배치 채점: {len(pages)}페이지")
+            response_text = await call_gemini([{"text": grading_prompt}], gemini_key, max_tokens, temperature,
+                                              breaker=get_circuit_breaker('gemini', 'grade', env),
+                                              deadline=fallback_deadline(deadline, env), env=env)
+        
+        if response_text:
+            gradings = split_batch_grading(response_text, len(pages))
         
     except Exception as e:
-        print(f"Gemini 채점 오류: {str(e)}")
-        return {
-            'totalQuestions': 0,
-            'correctAnswers': 0,
-            'detailedResults': [],
-            'overallFeedback': f'채점 오류: {str(e)}',
-            'strengths': '',
-            'improvements': ''
-        }
+        print(f"배치 채점 오류: {str(e)}, 페이지별 채점으로 폴백")
+    
+    missing = [i for i, grading in enumerate(gradings) if grading is None]
+    if missing:
+        print(f"⚠️ 배치 채점에서 {len(missing)}개 페이지 분리 실패, 페이지별 채점")
+        ensure_fallback_budget(deadline, env, '채점')
+        fallback = await asyncio.gather(*(
+            final_grading(**pages[i], system_prompt=system_prompt, model=model,
+                          temperature=temperature, env=env, deadline=deadline)
+            for i in missing
+        ), return_exceptions=True)
+        for i, grading in zip(missing, fallback):
+            gradings[i] = grading
+    
+    return gradings